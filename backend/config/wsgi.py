@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# Imported by WSGI servers only (gunicorn, runserver), never by management commands or tests.
+from stocks.suggest import warm_suggest_index  # noqa: E402
+
+warm_suggest_index()
@@ -0,0 +1,28 @@
+# Initial consonants (choseong) of precomposed Hangul syllables, as compatibility jamo:
+# what a keyboard produces when only the initials are typed (e.g. "ㅅㅅㅈㅈ" for 삼성전자).
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+
+_SYLLABLE_FIRST = 0xAC00  # 가
+_SYLLABLE_LAST = 0xD7A3  # 힣
+# Syllables per initial consonant: 21 vowels x 28 finals.
+_SYLLABLES_PER_CHOSEONG = 21 * 28
+
+
+def choseong(text: str) -> str:
+    """``text`` with every Hangul syllable replaced by its initial consonant.
+
+    Other characters are kept as they are, so "SK하이닉스" becomes "SKㅎㅇㄴㅅ".
+    """
+    chars = []
+    for char in text:
+        point = ord(char)
+        if _SYLLABLE_FIRST <= point <= _SYLLABLE_LAST:
+            chars.append(CHOSEONG[(point - _SYLLABLE_FIRST) // _SYLLABLES_PER_CHOSEONG])
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+def is_choseong(token: str) -> bool:
+    """True for a search token made only of initial consonants."""
+    return bool(token) and all(char in CHOSEONG for char in token)
@@ -0,0 +1,67 @@
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import UpsertIdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+# Responses are replayed for this long; expired keys are deleted by purge_expired_keys()
+# (the purge_idempotency_keys command), never on the request path.
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+_KEY_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,64}")
+
+
+def is_valid_key(key: str) -> bool:
+    return _KEY_PATTERN.fullmatch(key) is not None
+
+
+def stored_response(key: str) -> dict | None:
+    """Response of a committed request with ``key`` younger than IDEMPOTENCY_TTL, or None."""
+    return (
+        UpsertIdempotencyKey.objects.filter(
+            key=key,
+            created_at__gte=timezone.now() - IDEMPOTENCY_TTL,
+            response__isnull=False,
+        )
+        .values_list("response", flat=True)
+        .first()
+    )
+
+
+def claim_key(key: str) -> bool:
+    """Reserve ``key`` inside the caller's transaction; False if another request holds it.
+
+    A concurrent request with the same key waits on the primary key until the first one
+    commits (then gets False and can replay its response) or rolls back (then gets True).
+    Only an expired row of ``key`` itself is deleted first, so concurrent requests with
+    different keys never contend on the same rows.
+    """
+    table = UpsertIdempotencyKey._meta.db_table
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE key = %s AND created_at < %s",
+            [key, now - IDEMPOTENCY_TTL],
+        )
+        cursor.execute(
+            f"INSERT INTO {table} (key, response, created_at) VALUES (%s, NULL, %s) "
+            "ON CONFLICT (key) DO NOTHING RETURNING key",
+            [key, now],
+        )
+        return cursor.fetchone() is not None
+
+
+def store_response(key: str, response: dict) -> None:
+    UpsertIdempotencyKey.objects.filter(key=key).update(response=response)
+
+
+def purge_expired_keys() -> int:
+    """Delete keys older than IDEMPOTENCY_TTL; returns the number of rows deleted."""
+    deleted, _ = UpsertIdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - IDEMPOTENCY_TTL
+    ).delete()
+    return deleted
@@ -1,7 +1,8 @@
 from django.urls import path
 
-from .views import InternalStocksUpsertView
+from .views import InternalStocksManifestView, InternalStocksUpsertView
 
 urlpatterns = [
     path("stocks:upsert", InternalStocksUpsertView.as_view(), name="stocks-upsert"),
+    path("stocks:manifest", InternalStocksManifestView.as_view(), name="stocks-manifest"),
 ]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from stocks.idempotency import IDEMPOTENCY_TTL, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = f"Delete upsert Idempotency-Keys older than {IDEMPOTENCY_TTL}."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
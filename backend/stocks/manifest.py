@@ -0,0 +1,79 @@
+from django.db import connection
+
+from .models import StockMaster
+
+MANIFEST_ALGORITHM = "md5-v1"
+
+# Canonical row encoding shared with the bridge (bridge.snapshot.item_digest):
+# columns in this order, joined by U+001F, NULL encoded as U+001E, booleans as
+# true/false and dates as YYYY-MM-DD.
+MANIFEST_COLUMNS = [
+    "code",
+    "name_kr",
+    "name_en",
+    "market",
+    "security_type",
+    "mrkt_tp_raw",
+    "market_code_raw",
+    "category_l1",
+    "category_l2",
+    "is_active",
+    "listed_date",
+    "delisted_date",
+]
+
+
+def _column_text(name: str) -> str:
+    field = StockMaster._meta.get_field(name)
+    internal_type = field.get_internal_type()
+    if internal_type == "BooleanField":
+        return f"CASE WHEN {name} THEN 'true' ELSE 'false' END"
+    if internal_type == "DateField":
+        return f"to_char({name}, 'YYYY-MM-DD')"
+    return name
+
+
+ROW_HASH_SQL = "md5(array_to_string(ARRAY[{}]::text[], chr(31), chr(30)))".format(
+    ", ".join(_column_text(name) for name in MANIFEST_COLUMNS)
+)
+
+
+def _market_filter(markets: list[str] | None) -> tuple[str, list]:
+    if not markets:
+        return "", []
+    return " AND market = ANY(%s)", [list(markets)]
+
+
+def market_rollups(markets: list[str] | None = None) -> dict[str, dict]:
+    """Per-market ``count`` and roll-up hash of active rows, computed in one query.
+
+    The roll-up is md5 over the row hashes concatenated in byte order of ``code``.
+    """
+    where, params = _market_filter(markets)
+    sql = f"""
+SELECT market, count(*), md5(string_agg({ROW_HASH_SQL}, '' ORDER BY code COLLATE "C"))
+FROM {StockMaster._meta.db_table}
+WHERE is_active{where}
+GROUP BY market
+ORDER BY market
+"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {market: {"count": count, "hash": digest} for market, count, digest in cursor}
+
+
+def code_hashes(markets: list[str] | None = None) -> dict[str, dict[str, str]]:
+    """``market -> {code -> row hash}`` for active rows, optionally restricted to some markets."""
+    where, params = _market_filter(markets)
+    sql = f"""
+SELECT market, code, {ROW_HASH_SQL}
+FROM {StockMaster._meta.db_table}
+WHERE is_active{where}
+ORDER BY market, code COLLATE "C"
+"""
+    grouped: dict[str, dict[str, str]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for market, code, digest in cursor:
+            grouped.setdefault(market, {})[code] = digest
+    return grouped
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0004_security_type_and_raw_codes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UpsertIdempotencyKey",
+            fields=[
+                ("key", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("response", models.JSONField(null=True)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "upsert_idempotency_key",
+                "indexes": [
+                    models.Index(fields=["created_at"], name="idx_upsert_idem_created_at"),
+                ],
+            },
+        ),
+    ]
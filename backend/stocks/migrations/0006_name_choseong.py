@@ -0,0 +1,51 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import migrations, models
+
+from stocks.hangul import choseong
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_name_choseong(apps, schema_editor):
+    StockMaster = apps.get_model("stocks", "StockMaster")
+    rows = []
+    stocks = StockMaster.objects.only("code", "name_kr")
+    for stock in stocks.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        stock.name_choseong = choseong(stock.name_kr)
+        rows.append(stock)
+        if len(rows) >= BACKFILL_BATCH_SIZE:
+            StockMaster.objects.bulk_update(rows, ["name_choseong"])
+            rows.clear()
+    StockMaster.objects.bulk_update(rows, ["name_choseong"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0005_upsert_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stockmaster",
+            name="name_choseong",
+            field=models.CharField(blank=True, default="", editable=False, max_length=120),
+        ),
+        # Backfill before the indexes are built, so they are created once over final values.
+        migrations.RunPython(backfill_name_choseong, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="stockmaster",
+            index=GinIndex(
+                fields=["name_choseong"],
+                name="idx_stock_master_choseong_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmaster",
+            index=models.Index(
+                fields=["name_choseong"],
+                name="idx_stock_master_choseong_like",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0007_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        # Generation of the /api/stocks/suggest index, bumped after changing upserts.
+        migrations.RunSQL(
+            "CREATE SEQUENCE stock_master_generation",
+            "DROP SEQUENCE stock_master_generation",
+        ),
+    ]
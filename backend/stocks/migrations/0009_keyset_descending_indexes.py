@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0008_suggest_generation_sequence"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stockmaster",
+            index=models.Index(
+                fields=["-name_kr", "code"], name="idx_stock_master_name_kr_desc_code"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stockmaster",
+            index=models.Index(
+                fields=["-updated_at", "code"], name="idx_stock_master_updated_desc_code"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("stocks", "0009_keyset_descending_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stockmaster",
+            index=GinIndex(
+                OpClass(
+                    models.Func(
+                        "name_kr",
+                        Coalesce("name_en", models.Value("")),
+                        arg_joiner=" || ' ' || ",
+                        output_field=models.TextField(),
+                        template="(%(expressions)s)",
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="idx_stock_master_names_trgm",
+            ),
+        ),
+    ]
@@ -1,5 +1,19 @@
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Coalesce
+
+from .hangul import choseong
+
+# Both names as one text, so a ranked search probes one trigram index per token.
+# Plain || rather than Concat: Concat compiles differently inside CREATE INDEX, and the
+# planner only uses an expression index for a textually identical expression.
+SEARCH_NAMES = models.Func(
+    "name_kr",
+    Coalesce("name_en", models.Value("")),
+    arg_joiner=" || ' ' || ",
+    output_field=models.TextField(),
+    template="(%(expressions)s)",
+)
 
 
 class StockMaster(models.Model):
@@ -26,6 +40,8 @@ class StockMaster(models.Model):
     code = models.CharField(max_length=12, primary_key=True)
     name_kr = models.CharField(max_length=120)
     name_en = models.CharField(max_length=120, null=True, blank=True)
+    # Initials of name_kr for "ㅅㅅㅈㅈ"-style search; derived, kept in sync on every write.
+    name_choseong = models.CharField(max_length=120, blank=True, default="", editable=False)
     market = models.CharField(max_length=16, choices=Market.choices)
     security_type = models.CharField(
         max_length=24,
@@ -50,6 +66,12 @@ class StockMaster(models.Model):
             models.Index(fields=["category_l1"], name="idx_stock_master_category_l1"),
             models.Index(fields=["is_active"], name="idx_stock_master_is_active"),
             models.Index(fields=["updated_at"], name="idx_stock_master_updated_at"),
+            # Keyset pagination (stocks.pagination): one range scan per page.
+            models.Index(fields=["name_kr", "code"], name="idx_stock_master_name_kr_code"),
+            models.Index(fields=["updated_at", "code"], name="idx_stock_master_updated_code"),
+            # Descending orderings keep ``code`` ascending, so they need their own indexes.
+            models.Index(fields=["-name_kr", "code"], name="idx_stock_master_name_kr_desc_code"),
+            models.Index(fields=["-updated_at", "code"], name="idx_stock_master_updated_desc_code"),
             models.Index(
                 fields=["market", "category_l1"],
                 name="idx_stock_master_market_category_l1",
@@ -64,4 +86,39 @@ class StockMaster(models.Model):
                 name="idx_stock_master_name_en_trgm",
                 opclasses=["gin_trgm_ops"],
             ),
+            GinIndex(
+                OpClass(SEARCH_NAMES, name="gin_trgm_ops"),
+                name="idx_stock_master_names_trgm",
+            ),
+            GinIndex(
+                fields=["name_choseong"],
+                name="idx_stock_master_choseong_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            models.Index(
+                fields=["name_choseong"],
+                name="idx_stock_master_choseong_like",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.name_choseong = choseong(self.name_kr)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name_kr" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_choseong"}
+        super().save(*args, **kwargs)
+
+
+class UpsertIdempotencyKey(models.Model):
+    """Response of a committed bridge upsert, replayed for retries with the same key."""
+
+    key = models.CharField(max_length=64, primary_key=True)
+    response = models.JSONField(null=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "upsert_idempotency_key"
+        indexes = [
+            models.Index(fields=["created_at"], name="idx_upsert_idem_created_at"),
         ]
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+
+# Keyset columns per ordering field; ``code`` (the primary key) breaks ties, always
+# ascending like the offset pages (``order_by(ordering, "code")``).
+KEYSET_COLUMNS = {
+    "code": ["code"],
+    "name_kr": ["name_kr", "code"],
+    "updated_at": ["updated_at", "code"],
+}
+
+
+class InvalidCursor(ValueError):
+    """A cursor that was not issued for this ordering."""
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode_value(column: str, value):
+    if not isinstance(value, str):
+        raise InvalidCursor(column)
+    if column == "updated_at":
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError as exc:
+            raise InvalidCursor(column) from exc
+    return value
+
+
+def encode_cursor(ordering: str, direction: str, row) -> str:
+    columns = KEYSET_COLUMNS[ordering.lstrip("-")]
+    payload = {
+        "o": ordering,
+        "d": direction,
+        "k": [_encode_value(getattr(row, c)) for c in columns],
+    }
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, ordering: str) -> tuple[str, list]:
+    """Return ``(direction, key values)`` of a cursor issued for ``ordering``."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+    columns = KEYSET_COLUMNS[ordering.lstrip("-")]
+    if (
+        not isinstance(payload, dict)
+        or payload.get("o") != ordering
+        or payload.get("d") not in {"next", "prev"}
+        or not isinstance(payload.get("k"), list)
+        or len(payload["k"]) != len(columns)
+    ):
+        raise InvalidCursor(token)
+    return payload["d"], [_decode_value(c, v) for c, v in zip(columns, payload["k"])]
+
+
+def _after(columns: list[tuple[str, bool]], key: list) -> Q:
+    """Rows after ``key`` in the order of ``columns`` (``(column, ascending)`` pairs).
+
+    ``a >= x AND (a > x OR b > y)`` rather than a row comparison, which cannot mix
+    directions; the leading range is still an index condition.
+    """
+    (column, ascending), value = columns[0], key[0]
+    strict = Q(**{f"{column}__{'gt' if ascending else 'lt'}": value})
+    if len(columns) == 1:
+        return strict
+    inclusive = Q(**{f"{column}__{'gte' if ascending else 'lte'}": value})
+    return inclusive & (strict | _after(columns[1:], key[1:]))
+
+
+def keyset_page(queryset: QuerySet, ordering: str, page_size: int, cursor: str | None) -> dict:
+    """One page in keyset order, with opaque ``next``/``prev`` cursors (None at either end).
+
+    The page is the rows after the cursor key in ``(field, code)`` order (reversed going
+    back), so Postgres reads it as a range of the matching btree index (``(field, code)``
+    ascending, ``(field DESC, code)`` descending): the cost does not depend on how deep
+    the page is, and rows written between requests do not shift later pages.
+    """
+    descending = ordering.startswith("-")
+    field = ordering.lstrip("-")
+    direction, key = ("next", None) if not cursor else decode_cursor(cursor, ordering)
+    backwards = direction == "prev"
+
+    # Walk order: the ordering field in its direction, then ``code`` ascending; all
+    # flipped when going back.
+    columns = [
+        (column, (column != field or not descending) != backwards)
+        for column in KEYSET_COLUMNS[field]
+    ]
+    if key is not None:
+        queryset = queryset.filter(_after(columns, key))
+    order = [column if ascending else f"-{column}" for column, ascending in columns]
+    rows = list(queryset.order_by(*order)[: page_size + 1])
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    # Going forward, a previous page exists whenever we came from a cursor; going back,
+    # the page we came from is the next one.
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else key is not None
+    return {
+        "next": encode_cursor(ordering, "next", rows[-1]) if rows and has_next else None,
+        "prev": encode_cursor(ordering, "prev", rows[0]) if rows and has_prev else None,
+        "results": rows,
+    }
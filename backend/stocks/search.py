@@ -0,0 +1,131 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Q, QuerySet, Value, When
+from django.db.models.functions import Coalesce, Greatest, Length
+from django.db.models.lookups import PostgresOperatorLookup
+
+from .hangul import is_choseong
+from .models import SEARCH_NAMES
+
+# Default pg_trgm word_similarity threshold for ``ordering=relevance``.
+DEFAULT_SIMILARITY = 0.3
+# "Did you mean" suggestions: how many, and the lowest word similarity still offered.
+SUGGESTION_LIMIT = 5
+SUGGESTION_SIMILARITY = 0.2
+# Shorter tokens have no trigram of their own; they only match code prefixes and substrings.
+TRIGRAM_MIN_LENGTH = 3
+
+# Word similarity of a code match; names can reach 1.0 too, ties go to shorter names.
+CODE_EXACT_SCORE = 1.0
+CODE_PREFIX_SCORE = 0.9
+# Scores of an initials-only token ("ㅅㅅㅈㅈ") matching the start or the middle of name_kr.
+CHOSEONG_PREFIX_SCORE = 0.9
+CHOSEONG_INFIX_SCORE = 0.6
+
+
+class _ILike(PostgresOperatorLookup):
+    # Plain ILIKE, unlike ``icontains`` (UPPER(col) LIKE ...), can use the gin_trgm_ops indexes.
+    lookup_name = "ilike"
+    postgres_operator = "ILIKE"
+
+
+class _TrigramWordSimilar(PostgresOperatorLookup):
+    # ``trigram_word_similar`` for an expression (the lookup only registers on fields).
+    lookup_name = "trigram_word_similar"
+    postgres_operator = "%%>"
+
+
+def set_similarity_threshold(threshold: float) -> None:
+    """Set ``pg_trgm.word_similarity_threshold`` for the current transaction.
+
+    The ``%>`` operator (``trigram_word_similar``) compares against it; unlike a
+    ``word_similarity() >= x`` filter, the operator can use the trigram GIN index on
+    ``SEARCH_NAMES``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(threshold)]
+        )
+
+
+def choseong_filter(token: str) -> Q:
+    """Match an initials-only token against ``name_choseong``.
+
+    Fewer than three initials have no trigram, so they match the start of the name through
+    the ``varchar_pattern_ops`` index; longer ones match anywhere through the trigram index.
+    """
+    if len(token) < TRIGRAM_MIN_LENGTH:
+        return Q(name_choseong__startswith=token)
+    return Q(name_choseong__contains=token)
+
+
+def _token_filter(token: str) -> Q:
+    if is_choseong(token):
+        return choseong_filter(token)
+    # Candidates come from one probe of the SEARCH_NAMES trigram index per predicate; with
+    # one index per name the planner prices the BitmapOr above a seq scan on small tables.
+    # A token has no spaces, so it is a substring of the pair iff it is one of either name.
+    pattern = f"%{connection.ops.prep_for_like_query(token)}%"
+    token_filter = Q(code__startswith=token.upper()) | Q(_ILike(SEARCH_NAMES, pattern))
+    if len(token) >= TRIGRAM_MIN_LENGTH:
+        token_filter |= Q(_TrigramWordSimilar(SEARCH_NAMES, token))
+    return token_filter
+
+
+def _token_score(token: str):
+    if is_choseong(token):
+        return Case(
+            When(name_choseong__startswith=token, then=Value(CHOSEONG_PREFIX_SCORE)),
+            default=Value(CHOSEONG_INFIX_SCORE),
+            output_field=FloatField(),
+        )
+    code = token.upper()
+    return Greatest(
+        Case(
+            When(code=code, then=Value(CODE_EXACT_SCORE)),
+            When(code__startswith=code, then=Value(CODE_PREFIX_SCORE)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        TrigramWordSimilarity(token, "name_kr"),
+        Coalesce(TrigramWordSimilarity(token, "name_en"), Value(0.0)),
+    )
+
+
+def ranked_search(queryset: QuerySet, tokens: list[str], op: str) -> QuerySet:
+    """Filter ``queryset`` to rows matching the tokens and order them by ``score``.
+
+    A token matches a code prefix, a substring of either name, or a name whose
+    word similarity reaches the transaction's threshold (see ``set_similarity_threshold``);
+    an initials-only token matches through ``choseong_filter`` instead.
+    ``score`` is the mean over tokens of the best code or name match.
+    """
+    keyword_filter = Q()
+    for token in tokens:
+        if op == "and":
+            keyword_filter &= _token_filter(token)
+        else:
+            keyword_filter |= _token_filter(token)
+
+    score = sum((_token_score(token) for token in tokens), Value(0.0)) / len(tokens)
+    return (
+        queryset.filter(keyword_filter)
+        .annotate(score=score)
+        .order_by("-score", Length("name_kr"), "code")
+    )
+
+
+def suggestions(queryset: QuerySet, keywords: str) -> QuerySet:
+    """Closest names to the whole keywords, offered when a ranked search has no hits.
+
+    Runs under a threshold of ``SUGGESTION_SIMILARITY``; callers set it first.
+    """
+    score = Greatest(
+        TrigramWordSimilarity(keywords, "name_kr"),
+        Coalesce(TrigramWordSimilarity(keywords, "name_en"), Value(0.0)),
+    )
+    return (
+        queryset.filter(_TrigramWordSimilar(SEARCH_NAMES, keywords))
+        .annotate(score=score)
+        .order_by("-score", Length("name_kr"), "code")[:SUGGESTION_LIMIT]
+    )
@@ -19,6 +19,13 @@ class StockListSerializer(serializers.ModelSerializer):
         ]
 
 
+class RankedStockListSerializer(StockListSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(StockListSerializer.Meta):
+        fields = [*StockListSerializer.Meta.fields, "score"]
+
+
 class StockDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockMaster
@@ -71,3 +78,18 @@ class UpsertItemSerializer(serializers.Serializer):
 
 class UpsertRequestSerializer(serializers.Serializer):
     items = UpsertItemSerializer(many=True)
+    removed_codes = serializers.ListField(
+        child=serializers.CharField(max_length=12), required=False
+    )
+    # Full snapshot mode: market -> every code currently listed in it. An empty list is
+    # rejected because it would deactivate the whole market.
+    snapshot = serializers.DictField(
+        child=serializers.ListField(child=serializers.CharField(max_length=12), allow_empty=False),
+        required=False,
+    )
+
+    def validate_snapshot(self, value):
+        unknown = sorted(set(value) - set(StockMaster.Market.values))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown market: {', '.join(unknown)}")
+        return value
@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import DatabaseError, connection, connections, transaction
+
+from .hangul import choseong
+from .models import StockMaster
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUGGEST_LIMIT = 10
+MAX_SUGGEST_LIMIT = 50
+# How often a worker checks, off the request path, whether an upsert changed the table.
+STALE_CHECK_SECONDS = 5.0
+# A generation that keeps moving (a sync still pushing) is rebuilt after this long anyway.
+MAX_STALE_SECONDS = 60.0
+# Bumped after every committed upsert that changed active stocks (migration 0008).
+GENERATION_SEQUENCE = "stock_master_generation"
+
+SUGGEST_FIELDS = ["code", "name_kr", "name_en", "market", "security_type"]
+
+
+def normalize_key(text: str) -> str:
+    return "".join(text.split()).casefold()
+
+
+def _row_keys(row: dict) -> set[str]:
+    keys = {normalize_key(row["code"]), normalize_key(row["name_kr"])}
+    keys.add(normalize_key(choseong(row["name_kr"])))
+    if row["name_en"]:
+        # Every word start of the English name, so "elec" finds "Samsung Electronics".
+        words = row["name_en"].split()
+        keys.update(normalize_key(" ".join(words[index:])) for index in range(len(words)))
+    keys.discard("")
+    return keys
+
+
+class SuggestIndex:
+    """Prefix index over active stocks: one sorted array of (key, row) pairs.
+
+    Keys are the code, ``name_kr``, its initials and each word start of ``name_en``,
+    without whitespace and casefolded. A lookup is one bisect plus a scan of the matching
+    range, stopping at ``limit`` distinct rows. Rows come back in key order, so an exact
+    match precedes longer names with the same prefix.
+    """
+
+    def __init__(self, rows: list[dict], generation=None):
+        self.rows = rows
+        self.generation = generation
+        pairs = sorted((key, index) for index, row in enumerate(rows) for key in _row_keys(row))
+        self._keys = [key for key, _ in pairs]
+        self._row_ids = [index for _, index in pairs]
+
+    @classmethod
+    def from_db(cls) -> "SuggestIndex":
+        # The generation is bumped after commit, so rows read after it include every
+        # change it stands for.
+        generation = current_generation()
+        rows = list(
+            StockMaster.objects.filter(is_active=True).order_by("code").values(*SUGGEST_FIELDS)
+        )
+        return cls(rows, generation)
+
+    def search(self, query: str, limit: int = DEFAULT_SUGGEST_LIMIT) -> list[dict]:
+        prefix = normalize_key(query)
+        if not prefix:
+            return []
+        keys = self._keys
+        results: list[dict] = []
+        seen: set[int] = set()
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and keys[position].startswith(prefix):
+            row_id = self._row_ids[position]
+            if row_id not in seen:
+                seen.add(row_id)
+                results.append(self.rows[row_id])
+                if len(results) >= limit:
+                    break
+            position += 1
+        return results
+
+
+def current_generation() -> tuple:
+    """The sequence position: one row read, whatever the size of the table."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT last_value, is_called FROM {GENERATION_SEQUENCE}")
+        return cursor.fetchone()
+
+
+def bump_generation() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [GENERATION_SEQUENCE])
+
+
+def bump_generation_on_commit() -> None:
+    """Announce a change to every worker's index once the current transaction commits.
+
+    A sequence, unlike a counter row, never makes concurrent upserts wait on each other.
+    """
+    transaction.on_commit(bump_generation)
+
+
+_lock = threading.Lock()
+_index: SuggestIndex | None = None
+_checked_at = 0.0
+_refreshing = False
+# (generation, monotonic time of the last rebuild) while changes keep arriving; None once a
+# check finds the index current.
+_pending: tuple | None = None
+
+
+def warm_suggest_index() -> None:
+    """Build the index at worker start; without a database it is built on first use."""
+    try:
+        get_suggest_index()
+    except DatabaseError:
+        logger.warning("Suggest index not built at startup; it will be built on first use")
+    finally:
+        # Nothing holds a connection into the request cycle (or across a preload fork).
+        connections.close_all()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """This worker's index, built on first use.
+
+    Afterwards no request queries the database: at most every ``STALE_CHECK_SECONDS`` a
+    request starts a background refresh (``_refresh``) and is served the current index.
+    """
+    global _index, _checked_at, _refreshing
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = SuggestIndex.from_db()
+                _checked_at = time.monotonic()
+        return _index
+    if time.monotonic() - _checked_at >= STALE_CHECK_SECONDS:
+        with _lock:
+            start = not _refreshing and time.monotonic() - _checked_at >= STALE_CHECK_SECONDS
+            if start:
+                _refreshing = True
+                _checked_at = time.monotonic()
+        if start:
+            _refresh_in_background()
+    return _index
+
+
+def _refresh() -> None:
+    """Rebuild the index when a check finds a new generation.
+
+    The first change after a quiet check is rebuilt at once. A sync bumps the generation
+    once per chunk, so a change found by the check right after a rebuild waits until a
+    check finds it unchanged: one more rebuild for the rest of the sync, never later than
+    ``MAX_STALE_SECONDS`` after the previous one.
+    """
+    global _index, _refreshing, _pending
+    try:
+        generation = current_generation()
+        now = time.monotonic()
+        if _index is None or generation == _index.generation:
+            _pending = None
+        elif _pending is not None and (
+            _pending[0] != generation and now - _pending[1] < MAX_STALE_SECONDS
+        ):
+            _pending = (generation, _pending[1])
+        else:
+            index = SuggestIndex.from_db()
+            with _lock:
+                _index = index
+            _pending = (index.generation, now)
+    except DatabaseError:
+        logger.exception("Suggest index refresh failed; serving the previous index")
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def _refresh_in_background() -> None:
+    def run() -> None:
+        try:
+            _refresh()
+        finally:
+            # The thread's own connection; nothing else will close it.
+            connections.close_all()
+
+    threading.Thread(target=run, name="suggest-index-refresh", daemon=True).start()
+
+
+def reset_suggest_index() -> None:
+    global _index, _checked_at, _refreshing, _pending
+    with _lock:
+        _index = None
+        _checked_at = 0.0
+        _refreshing = False
+        _pending = None
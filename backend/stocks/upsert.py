@@ -0,0 +1,289 @@
+import gzip
+import json
+from collections.abc import Iterable, Iterator
+from datetime import date
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .hangul import choseong
+from .models import StockMaster
+from .serializers import UpsertItemSerializer, UpsertRequestSerializer
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+# Items validated and written per statement when a request body is streamed.
+STREAM_BATCH_SIZE = 500
+
+# (column, SQL type used when casting the staged JSON value)
+MUTABLE_COLUMNS = [
+    ("name_kr", "varchar"),
+    ("name_en", "varchar"),
+    ("name_choseong", "varchar"),
+    ("market", "varchar"),
+    ("security_type", "varchar"),
+    ("mrkt_tp_raw", "varchar"),
+    ("market_code_raw", "varchar"),
+    ("category_l1", "varchar"),
+    ("category_l2", "varchar"),
+    ("is_active", "boolean"),
+    ("listed_date", "date"),
+    ("delisted_date", "date"),
+]
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Unsupported value for upsert staging: {type(value).__name__}")
+
+
+def _build_upsert_sql() -> str:
+    table = StockMaster._meta.db_table
+    columns = [name for name, _ in MUTABLE_COLUMNS]
+
+    # Keys missing from an item keep the stored value, matching the old per-row
+    # setattr() semantics for optional serializer fields.
+    merged = ",\n        ".join(
+        f"CASE WHEN s.doc ? '{name}' THEN (s.doc->>'{name}')::{sql_type} "
+        f"ELSE m.{name} END AS {name}"
+        for name, sql_type in MUTABLE_COLUMNS
+    )
+    column_list = ", ".join(columns)
+    assignments = ",\n    ".join(f"{name} = EXCLUDED.{name}" for name in columns)
+    current_row = ", ".join(f"{table}.{name}" for name in columns)
+    incoming_row = ", ".join(f"EXCLUDED.{name}" for name in columns)
+
+    return f"""
+WITH staged AS (
+    SELECT doc->>'code' AS code, doc
+    FROM jsonb_array_elements(%s::jsonb) AS doc
+),
+merged AS (
+    SELECT
+        s.code,
+        {merged}
+    FROM staged s
+    LEFT JOIN {table} m ON m.code = s.code
+)
+INSERT INTO {table} (code, {column_list}, created_at, updated_at)
+SELECT code, {column_list}, now(), now() FROM merged
+ON CONFLICT (code) DO UPDATE SET
+    {assignments},
+    updated_at = EXCLUDED.updated_at
+WHERE ({current_row}) IS DISTINCT FROM ({incoming_row})
+RETURNING (xmax = 0) AS inserted
+"""
+
+
+UPSERT_SQL = _build_upsert_sql()
+
+
+def bulk_upsert_stocks(items: list[dict]) -> dict[str, int]:
+    """Upsert validated items with a single set-based statement.
+
+    Items sharing a code are merged in order (later fields win, fields sent only in an
+    earlier copy are kept) because ``ON CONFLICT`` cannot touch the same row twice; the
+    merged-away copies count as unchanged, so the counts always add up to ``received``.
+    Rows whose values already match are skipped by the ``IS DISTINCT FROM`` guard,
+    so ``updated_at`` only moves for real changes. ``name_choseong`` is derived here
+    from ``name_kr``, so it moves with the name.
+    """
+    by_code: dict[str, dict] = {}
+    for item in items:
+        code = item["code"].upper()
+        by_code[code] = {**by_code.get(code, {}), **item, "code": code}
+        if "name_kr" in item:
+            by_code[code]["name_choseong"] = choseong(item["name_kr"])
+
+    inserted = 0
+    updated = 0
+    if by_code:
+        document = json.dumps(list(by_code.values()), ensure_ascii=False, default=_json_default)
+        with connection.cursor() as cursor:
+            cursor.execute(UPSERT_SQL, [document])
+            for (was_inserted,) in cursor.fetchall():
+                if was_inserted:
+                    inserted += 1
+                else:
+                    updated += 1
+
+    return {
+        "received": len(items),
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(items) - inserted - updated,
+    }
+
+
+def deactivate_stocks(codes: list[str], keep: set[str] | None = None) -> int:
+    """Mark the given codes inactive in one UPDATE; returns the number of rows changed.
+
+    Codes in ``keep`` (e.g. items upserted in the same request) are never deactivated.
+    Already-inactive rows are left alone so their ``delisted_date`` is preserved.
+    """
+    targets = {code.upper() for code in codes} - (keep or set())
+    if not targets:
+        return 0
+    now = timezone.now()
+    return StockMaster.objects.filter(code__in=targets, is_active=True).update(
+        is_active=False,
+        delisted_date=Coalesce(F("delisted_date"), now.date()),
+        updated_at=now,
+    )
+
+
+def _build_deactivate_missing_sql() -> str:
+    table = StockMaster._meta.db_table
+    # Anti-join against the listed codes, so the cost stays linear in the market size.
+    return f"""
+UPDATE {table} AS m
+SET is_active = false, delisted_date = COALESCE(m.delisted_date, %s), updated_at = %s
+WHERE m.is_active
+  AND m.market = ANY(%s)
+  AND NOT EXISTS (
+      SELECT 1 FROM unnest(%s::varchar[]) AS listed(code) WHERE listed.code = m.code
+  )
+RETURNING m.market
+"""
+
+
+DEACTIVATE_MISSING_SQL = _build_deactivate_missing_sql()
+
+
+def deactivate_missing(
+    snapshot: dict[str, list[str]], keep: set[str] | None = None
+) -> dict[str, dict[str, int]]:
+    """Full snapshot mode: deactivate every active code of the snapshot's markets it omits.
+
+    ``snapshot`` maps a market to all codes currently listed in it. One set-based UPDATE
+    covers every market; codes in ``keep`` (items upserted in the same request) count as
+    listed. Returns ``{market: {"listed": n, "deactivated": n}}``.
+    """
+    listed = {market: {code.upper() for code in codes} for market, codes in snapshot.items()}
+    counts = {market: {"listed": len(codes), "deactivated": 0} for market, codes in listed.items()}
+    if not listed:
+        return counts
+    all_codes = set().union(*listed.values()) | (keep or set())
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(DEACTIVATE_MISSING_SQL, [now.date(), now, sorted(listed), sorted(all_codes)])
+        for (market,) in cursor.fetchall():
+            counts[market]["deactivated"] += 1
+    return counts
+
+
+def apply_removals(
+    result: dict,
+    upserted: set[str],
+    removed_codes: list[str] | None = None,
+    snapshot: dict[str, list[str]] | None = None,
+) -> dict:
+    """Apply ``removed_codes`` and a full ``snapshot`` after the items of one request.
+
+    Adds ``deactivated`` (rows deactivated by either) and, for a snapshot, the per-market
+    ``snapshot`` counts to ``result``.
+    """
+    if removed_codes is None and snapshot is None:
+        return result
+    deactivated = 0
+    if removed_codes is not None:
+        deactivated += deactivate_stocks(removed_codes, keep=upserted)
+    if snapshot is not None:
+        result["snapshot"] = deactivate_missing(snapshot, keep=upserted)
+        deactivated += sum(counts["deactivated"] for counts in result["snapshot"].values())
+    result["deactivated"] = deactivated
+    return result
+
+
+class StreamUpsertError(ValueError):
+    """A streamed upsert line could not be parsed or validated."""
+
+    def __init__(self, line: int, detail: str, errors=None):
+        super().__init__(detail)
+        self.line = line
+        self.detail = detail
+        self.errors = errors
+
+
+def iter_ndjson(stream, *, gzipped: bool = False) -> Iterator[tuple[int, dict]]:
+    """Yield ``(line_number, object)`` from an NDJSON byte stream, one line at a time.
+
+    ``stream`` only needs ``read``/``readline``; with ``gzipped`` it is decompressed on
+    the fly, so neither the compressed nor the decompressed body is ever held whole.
+    """
+    source = gzip.GzipFile(fileobj=stream, mode="rb") if gzipped else stream
+    for line_number, raw in enumerate(iter(source.readline, b""), start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            raise StreamUpsertError(line_number, f"Invalid JSON: {exc}") from exc
+        if not isinstance(record, dict):
+            raise StreamUpsertError(line_number, "Expected a JSON object")
+        yield line_number, record
+
+
+def stream_upsert_stocks(
+    records: Iterable[tuple[int, dict]], batch_size: int | None = None
+) -> dict[str, int]:
+    """Validate and upsert streamed records in batches of ``batch_size``.
+
+    Each record is an upsert item, except ``{"removed_codes": [...]}`` and
+    ``{"snapshot": {...}}`` records which are collected and applied once after all items
+    (same semantics as the JSON body). Only
+    the current batch and the set of upserted codes are kept in memory. Raises
+    ``StreamUpsertError`` with the offending line; callers run this inside a transaction
+    so a bad line rolls back earlier batches.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    totals = {"received": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    upserted: set[str] = set()
+    removed_codes: list[str] | None = None
+    snapshot: dict[str, list[str]] | None = None
+    batch: list[dict] = []
+    lines: list[int] = []
+
+    def flush() -> None:
+        if not batch:
+            return
+        serializer = UpsertItemSerializer(data=batch, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            # Depending on the DRF version, ``many=True`` errors are a list or an index dict.
+            if isinstance(errors, dict):
+                index = min(errors)
+            else:
+                index = next(i for i, item_errors in enumerate(errors) if item_errors)
+            raise StreamUpsertError(lines[index], "Invalid item", errors[index])
+        counts = bulk_upsert_stocks(serializer.validated_data)
+        for key in totals:
+            totals[key] += counts[key]
+        upserted.update(item["code"].upper() for item in serializer.validated_data)
+        batch.clear()
+        lines.clear()
+
+    for line_number, record in records:
+        if set(record) == {"removed_codes"}:
+            serializer = UpsertRequestSerializer(data={"items": [], **record})
+            if not serializer.is_valid():
+                raise StreamUpsertError(line_number, "Invalid removed_codes", serializer.errors)
+            removed_codes = (removed_codes or []) + serializer.validated_data["removed_codes"]
+            continue
+        if set(record) == {"snapshot"}:
+            serializer = UpsertRequestSerializer(data={"items": [], **record})
+            if not serializer.is_valid():
+                raise StreamUpsertError(line_number, "Invalid snapshot", serializer.errors)
+            snapshot = snapshot or {}
+            for market, codes in serializer.validated_data["snapshot"].items():
+                snapshot.setdefault(market, []).extend(codes)
+            continue
+        batch.append(record)
+        lines.append(line_number)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return apply_removals(dict(totals), upserted, removed_codes, snapshot)
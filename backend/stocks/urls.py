@@ -1,9 +1,10 @@
 from django.urls import path
 
-from .views import StockDetailView, StockListView, StockStatsView
+from .views import StockDetailView, StockListView, StockStatsView, StockSuggestView
 
 urlpatterns = [
     path("stocks", StockListView.as_view(), name="stock-list"),
     path("stocks/stats", StockStatsView.as_view(), name="stock-stats"),
+    path("stocks/suggest", StockSuggestView.as_view(), name="stock-suggest"),
     path("stocks/<str:code>", StockDetailView.as_view(), name="stock-detail"),
 ]
@@ -1,5 +1,6 @@
 import hmac
 import os
+import zlib
 
 from django.db import transaction
 from django.db.models import Count, Q
@@ -8,12 +9,46 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .hangul import is_choseong
+from .idempotency import (
+    IDEMPOTENCY_HEADER,
+    REPLAYED_HEADER,
+    claim_key,
+    is_valid_key,
+    store_response,
+    stored_response,
+)
+from .manifest import MANIFEST_ALGORITHM, code_hashes, market_rollups
 from .models import StockMaster
+from .pagination import InvalidCursor, keyset_page
+from .search import (
+    DEFAULT_SIMILARITY,
+    SUGGESTION_SIMILARITY,
+    choseong_filter,
+    ranked_search,
+    set_similarity_threshold,
+    suggestions,
+)
 from .serializers import (
+    RankedStockListSerializer,
     StockDetailSerializer,
     StockListSerializer,
     UpsertRequestSerializer,
 )
+from .suggest import (
+    DEFAULT_SUGGEST_LIMIT,
+    MAX_SUGGEST_LIMIT,
+    bump_generation_on_commit,
+    get_suggest_index,
+)
+from .upsert import (
+    NDJSON_CONTENT_TYPE,
+    StreamUpsertError,
+    apply_removals,
+    bulk_upsert_stocks,
+    iter_ndjson,
+    stream_upsert_stocks,
+)
 
 
 class StockListView(APIView):
@@ -24,6 +59,7 @@ class StockListView(APIView):
         "-name_kr",
         "updated_at",
         "-updated_at",
+        "relevance",
     }
 
     def get(self, request):
@@ -64,24 +100,32 @@ class StockListView(APIView):
 
         keywords = request.query_params.get("keywords", "").strip()
         tokens = [token for token in keywords.split() if token]
-        if tokens:
-            if op == "and":
-                keyword_filter = Q()
-                for token in tokens:
+        ranked = ordering == "relevance" and bool(tokens)
+        similarity = DEFAULT_SIMILARITY
+        if ranked:
+            # Only a ranked search reads the threshold; other requests ignore it.
+            try:
+                similarity = float(request.query_params.get("similarity", DEFAULT_SIMILARITY))
+            except ValueError:
+                similarity = -1.0
+            if not 0 < similarity <= 1:
+                return Response(
+                    {"detail": "Invalid similarity"}, status=status.HTTP_400_BAD_REQUEST
+                )
+        if tokens and not ranked:
+            keyword_filter = Q()
+            for token in tokens:
+                if is_choseong(token):
+                    token_filter = choseong_filter(token)
+                else:
                     token_filter = (
                         Q(code__icontains=token)
                         | Q(name_kr__icontains=token)
                         | Q(name_en__icontains=token)
                     )
+                if op == "and":
                     keyword_filter &= token_filter
-            else:
-                keyword_filter = Q()
-                for token in tokens:
-                    token_filter = (
-                        Q(code__icontains=token)
-                        | Q(name_kr__icontains=token)
-                        | Q(name_en__icontains=token)
-                    )
+                else:
                     keyword_filter |= token_filter
             queryset = queryset.filter(keyword_filter)
 
@@ -101,13 +145,22 @@ class StockListView(APIView):
         if security_types:
             queryset = queryset.filter(security_type__in=security_types)
 
-        if ordering in {"code", "-code"}:
-            queryset = queryset.order_by(ordering)
+        cursor = request.query_params.get("cursor")
+        if cursor is not None:
+            return self._keyset_response(queryset, ordering, page_size, cursor)
+
+        start = (page - 1) * page_size
+        end = start + page_size
+        if ranked:
+            return self._ranked_response(
+                queryset, keywords, tokens, op, similarity, page, start, end
+            )
+
+        if ordering in {"code", "-code", "relevance"}:
+            queryset = queryset.order_by("-code" if ordering == "-code" else "code")
         else:
             queryset = queryset.order_by(ordering, "code")
         count = queryset.count()
-        start = (page - 1) * page_size
-        end = start + page_size
         serializer = StockListSerializer(queryset[start:end], many=True)
 
         return Response(
@@ -119,6 +172,57 @@ class StockListView(APIView):
             }
         )
 
+    def _keyset_response(self, queryset, ordering, page_size, cursor):
+        if ordering == "relevance":
+            return Response(
+                {"detail": "Cursor pagination does not support relevance ordering"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            page = keyset_page(queryset, ordering, page_size, cursor or None)
+        except InvalidCursor:
+            return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "page_size": page_size,
+                "next": page["next"],
+                "prev": page["prev"],
+                "results": StockListSerializer(page["results"], many=True).data,
+            }
+        )
+
+    def _ranked_response(self, queryset, keywords, tokens, op, similarity, page, start, end):
+        # The similarity threshold is a transaction-local setting of pg_trgm.
+        with transaction.atomic():
+            set_similarity_threshold(similarity)
+            ranked = ranked_search(queryset, tokens, op)
+            count = ranked.count()
+            payload = {
+                "count": count,
+                "page": page,
+                "page_size": end - start,
+                "results": RankedStockListSerializer(ranked[start:end], many=True).data,
+            }
+            if count == 0:
+                set_similarity_threshold(SUGGESTION_SIMILARITY)
+                payload["suggestions"] = RankedStockListSerializer(
+                    suggestions(queryset, keywords), many=True
+                ).data
+        return Response(payload)
+
+
+class StockSuggestView(APIView):
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get("limit", DEFAULT_SUGGEST_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_SUGGEST_LIMIT:
+            return Response({"detail": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+        query = request.query_params.get("q", "")
+        return Response({"q": query, "results": get_suggest_index().search(query, limit)})
+
 
 class StockDetailView(APIView):
     def get(self, request, code):
@@ -150,51 +254,122 @@ class StockStatsView(APIView):
         )
 
 
-class InternalStocksUpsertView(APIView):
-    @staticmethod
-    def _is_authorized(request) -> bool:
-        provided_key = request.headers.get("X-Bridge-Key", "")
-        expected_key = os.getenv("BRIDGE_API_KEY", "")
-        if not provided_key or not expected_key:
-            return False
-        return hmac.compare_digest(provided_key, expected_key)
+def _is_bridge_authorized(request) -> bool:
+    provided_key = request.headers.get("X-Bridge-Key", "")
+    expected_key = os.getenv("BRIDGE_API_KEY", "")
+    if not provided_key or not expected_key:
+        return False
+    return hmac.compare_digest(provided_key, expected_key)
+
+
+def _replayed_response(result):
+    return Response(result, headers={REPLAYED_HEADER: "true"})
+
+
+def _run_idempotent(key, apply):
+    """Run ``apply`` in one transaction and store its result under ``key`` (if any).
+
+    The key is claimed in the same transaction, so a failed request leaves no key behind
+    and can be retried. A request that loses the claim to a concurrent one with the same
+    key gets that request's stored response instead of applying the batch twice.
+    """
+    with transaction.atomic():
+        claimed = key is None or claim_key(key)
+        if claimed:
+            result = apply()
+            if key is not None:
+                store_response(key, result)
+            if result["inserted"] or result["updated"] or result.get("deactivated"):
+                bump_generation_on_commit()
+    if claimed:
+        return Response(result)
 
+    replay = stored_response(key)
+    if replay is None:
+        return Response(
+            {"detail": "A request with this Idempotency-Key is in progress"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return _replayed_response(replay)
+
+
+class InternalStocksUpsertView(APIView):
     def post(self, request):
-        if not self._is_authorized(request):
+        if not _is_bridge_authorized(request):
             return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is not None:
+            key = key.strip()
+            if not is_valid_key(key):
+                return Response(
+                    {"detail": "Invalid Idempotency-Key"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            # A retried batch is answered from the stored response without parsing its body.
+            replay = stored_response(key)
+            if replay is not None:
+                return _replayed_response(replay)
+
+        if request.content_type.split(";")[0].strip().lower() == NDJSON_CONTENT_TYPE:
+            return self._post_ndjson(request, key)
+
         serializer = UpsertRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         items = serializer.validated_data["items"]
 
-        inserted = 0
-        updated = 0
-        unchanged = 0
+        return _run_idempotent(
+            key,
+            lambda: apply_removals(
+                bulk_upsert_stocks(items),
+                {item["code"].upper() for item in items},
+                serializer.validated_data.get("removed_codes"),
+                serializer.validated_data.get("snapshot"),
+            ),
+        )
 
-        with transaction.atomic():
-            for item in items:
-                code = item["code"].upper()
-                defaults = {key: value for key, value in item.items() if key != "code"}
-                stock = StockMaster.objects.filter(code=code).first()
-
-                if stock is None:
-                    StockMaster.objects.create(code=code, **defaults)
-                    inserted += 1
-                else:
-                    changed = any(getattr(stock, key) != value for key, value in defaults.items())
-                    if changed:
-                        for key, value in defaults.items():
-                            setattr(stock, key, value)
-                        stock.save()
-                        updated += 1
-                    else:
-                        unchanged += 1
+    def _post_ndjson(self, request, key):
+        # Streamed body: never touch request.data, which would buffer and parse it whole.
+        encoding = request.headers.get("Content-Encoding", "").strip().lower()
+        if encoding not in {"", "identity", "gzip"}:
+            return Response(
+                {"detail": "Unsupported Content-Encoding"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
 
-        return Response(
-            {
-                "received": len(items),
-                "inserted": inserted,
-                "updated": updated,
-                "unchanged": unchanged,
-            }
-        )
+        stream = request.stream
+        try:
+            return _run_idempotent(
+                key,
+                lambda: stream_upsert_stocks(
+                    iter_ndjson(stream, gzipped=encoding == "gzip") if stream is not None else []
+                ),
+            )
+        except StreamUpsertError as exc:
+            payload = {"detail": exc.detail, "line": exc.line}
+            if exc.errors is not None:
+                payload["errors"] = exc.errors
+            return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+        except (OSError, EOFError, zlib.error):
+            return Response({"detail": "Invalid gzip body"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class InternalStocksManifestView(APIView):
+    def get(self, request):
+        if not _is_bridge_authorized(request):
+            return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        markets = [value for value in request.query_params.getlist("markets") if value]
+        if any(market not in StockMaster.Market.values for market in markets):
+            return Response({"detail": "Invalid market"}, status=status.HTTP_400_BAD_REQUEST)
+
+        include_codes = request.query_params.get("codes", "0")
+        if include_codes not in {"0", "1"}:
+            return Response({"detail": "Invalid codes"}, status=status.HTTP_400_BAD_REQUEST)
+
+        payload = {
+            "algorithm": MANIFEST_ALGORITHM,
+            "markets": market_rollups(markets),
+        }
+        if include_codes == "1":
+            payload["codes"] = code_hashes(markets)
+        return Response(payload)
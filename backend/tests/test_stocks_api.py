@@ -1,3 +1,9 @@
+import datetime
+import gzip
+import hashlib
+import io
+import json
+
 import pytest
 from rest_framework.test import APIClient
 from stocks.models import StockMaster
@@ -325,3 +331,845 @@ def test_stats_endpoint_returns_market_and_top_category_counts(client):
     assert payload["by_market"]["KOSDAQ"] == 1
     assert payload["by_market"]["KONEX"] == 1
     assert payload["top_category_l1"][0] == {"category_l1": "반도체", "count": 2}
+
+
+@pytest.mark.django_db
+def test_upsert_preserves_omitted_fields_and_skips_noop_writes(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930", name_en="Samsung Electronics", category_l2="대형주")
+    before = StockMaster.objects.get(code="005930").updated_at
+
+    payload = {
+        "items": [
+            {
+                "code": "005930",
+                "name_kr": "삼성전자",
+                "market": "KOSPI",
+                "security_type": "COMMON_STOCK",
+                "category_l1": "반도체",
+                "is_active": True,
+            }
+        ]
+    }
+    response = client.post(
+        "/api/internal/stocks:upsert",
+        payload,
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+    assert response.status_code == 200
+    assert response.json() == {"received": 1, "inserted": 0, "updated": 0, "unchanged": 1}
+
+    stock = StockMaster.objects.get(code="005930")
+    assert stock.name_en == "Samsung Electronics"
+    assert stock.category_l2 == "대형주"
+    assert stock.updated_at == before
+
+
+@pytest.mark.django_db
+def test_upsert_merges_duplicate_codes_within_batch(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    payload = {
+        "items": [
+            {"code": "a00001", "name_kr": "첫번째", "market": "KOSPI", "name_en": "First"},
+            {
+                "code": "A00001",
+                "name_kr": "두번째",
+                "market": "KOSDAQ",
+                "listed_date": "2020-01-02",
+            },
+        ]
+    }
+    response = client.post(
+        "/api/internal/stocks:upsert",
+        payload,
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+    assert response.status_code == 200
+    assert response.json() == {"received": 2, "inserted": 1, "updated": 0, "unchanged": 1}
+
+    stock = StockMaster.objects.get(code="A00001")
+    assert stock.name_kr == "두번째"
+    assert stock.name_choseong == "ㄷㅂㅉ"
+    assert stock.market == "KOSDAQ"
+    assert stock.listed_date.isoformat() == "2020-01-02"
+    # Sent only by the first copy, so the merge keeps it.
+    assert stock.name_en == "First"
+
+
+@pytest.mark.django_db
+def test_upsert_large_batch_uses_constant_queries(
+    client, monkeypatch, django_assert_max_num_queries
+):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="100000", name_kr="이전종목")
+    payload = {
+        "items": [
+            {"code": f"{100000 + i}", "name_kr": f"종목{i:03d}", "market": "KOSPI"}
+            for i in range(300)
+        ]
+    }
+
+    with django_assert_max_num_queries(3):
+        response = client.post(
+            "/api/internal/stocks:upsert",
+            payload,
+            format="json",
+            HTTP_X_BRIDGE_KEY="valid-key",
+        )
+
+    assert response.status_code == 200
+    assert response.json() == {"received": 300, "inserted": 299, "updated": 1, "unchanged": 0}
+    assert StockMaster.objects.count() == 300
+
+
+@pytest.mark.django_db
+def test_upsert_removed_codes_deactivates_once(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930")
+    create_stock(code="000660", name_kr="SK하이닉스")
+    create_stock(code="035420", name_kr="NAVER", is_active=False)
+
+    payload = {
+        "items": [{"code": "000660", "name_kr": "SK하이닉스", "market": "KOSPI"}],
+        "removed_codes": ["005930", "000660", "035420", "999999"],
+    }
+    response = client.post(
+        "/api/internal/stocks:upsert",
+        payload,
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+    assert response.status_code == 200
+    assert response.json()["deactivated"] == 1
+
+    removed = StockMaster.objects.get(code="005930")
+    assert removed.is_active is False
+    assert removed.delisted_date is not None
+    assert StockMaster.objects.get(code="000660").is_active is True
+    assert StockMaster.objects.get(code="035420").delisted_date is None
+
+
+@pytest.mark.django_db
+def test_upsert_full_snapshot_deactivates_missing_codes_in_one_statement(
+    client, monkeypatch, django_assert_max_num_queries
+):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930")
+    create_stock(code="000660", name_kr="SK하이닉스")
+    create_stock(code="000020", name_kr="동화약품")
+    create_stock(code="035420", name_kr="NAVER", is_active=False)
+    create_stock(code="035720", name_kr="카카오", market="KOSDAQ")
+
+    payload = {
+        "items": [{"code": "005380", "name_kr": "현대차", "market": "KOSPI"}],
+        "snapshot": {"KOSPI": ["005930"]},
+    }
+    # Upsert plus one UPDATE for the snapshot (and the transaction savepoints).
+    with django_assert_max_num_queries(4):
+        response = client.post(
+            "/api/internal/stocks:upsert", payload, format="json", HTTP_X_BRIDGE_KEY="valid-key"
+        )
+
+    assert response.status_code == 200
+    assert response.json()["deactivated"] == 2
+    assert response.json()["snapshot"] == {"KOSPI": {"listed": 1, "deactivated": 2}}
+    active = set(StockMaster.objects.filter(is_active=True).values_list("code", flat=True))
+    # Listed and just-upserted codes stay, other markets are untouched.
+    assert active == {"005930", "005380", "035720"}
+    assert StockMaster.objects.get(code="000660").delisted_date is not None
+    assert StockMaster.objects.get(code="035420").delisted_date is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "snapshot",
+    [{"KOSPI": []}, {"NYSE": ["005930"]}, ["005930"]],
+)
+def test_upsert_rejects_unsafe_or_invalid_snapshots(client, monkeypatch, snapshot):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930")
+
+    response = client.post(
+        "/api/internal/stocks:upsert",
+        {"items": [], "snapshot": snapshot},
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+
+    assert response.status_code == 400
+    assert "snapshot" in response.json()
+    assert StockMaster.objects.get(code="005930").is_active is True
+
+
+def _ndjson_body(records):
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    return gzip.compress(lines.encode("utf-8"))
+
+
+def _post_ndjson(client, body, encoding="gzip"):
+    return client.generic(
+        "POST",
+        "/api/internal/stocks:upsert",
+        body,
+        content_type="application/x-ndjson",
+        HTTP_CONTENT_ENCODING=encoding,
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+
+
+@pytest.mark.django_db
+def test_upsert_gzip_ndjson_stream_writes_in_batches(
+    client, monkeypatch, django_assert_max_num_queries
+):
+    from stocks import upsert
+
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    monkeypatch.setattr(upsert, "STREAM_BATCH_SIZE", 2)
+    create_stock(code="005930", name_kr="이전이름")
+    create_stock(code="000660", name_kr="SK하이닉스")
+    records = [
+        {"code": "005930", "name_kr": "삼성전자", "market": "KOSPI"},
+        {"code": "035420", "name_kr": "NAVER", "market": "KOSDAQ"},
+        {"code": "035720", "name_kr": "카카오", "market": "KOSPI", "listed_date": "1999-11-11"},
+        {"removed_codes": ["000660"]},
+        {"snapshot": {"KOSDAQ": ["035420"]}},
+    ]
+    create_stock(code="091990", name_kr="셀트리온헬스케어", market="KOSDAQ")
+    body = _ndjson_body(records)
+    assert len(body) < len(json.dumps({"items": records[:3]}).encode("utf-8"))
+
+    # Two batched upserts and two deactivations, inside a single transaction.
+    with django_assert_max_num_queries(6):
+        response = _post_ndjson(client, body)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "received": 3,
+        "inserted": 2,
+        "updated": 1,
+        "unchanged": 0,
+        "deactivated": 2,
+        "snapshot": {"KOSDAQ": {"listed": 1, "deactivated": 1}},
+    }
+    assert StockMaster.objects.get(code="091990").is_active is False
+    assert StockMaster.objects.get(code="005930").name_kr == "삼성전자"
+    assert StockMaster.objects.get(code="035720").listed_date == datetime.date(1999, 11, 11)
+    assert StockMaster.objects.get(code="000660").is_active is False
+
+
+@pytest.mark.django_db
+def test_upsert_ndjson_applies_duplicate_codes_across_batches_in_order(client, monkeypatch):
+    from stocks import upsert
+
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    monkeypatch.setattr(upsert, "STREAM_BATCH_SIZE", 1)
+    body = _ndjson_body(
+        [
+            {"code": "005930", "name_kr": "삼성", "market": "KOSPI", "name_en": "Samsung"},
+            {"code": "005930", "name_kr": "삼성전자", "market": "KOSPI"},
+        ]
+    )
+
+    response = _post_ndjson(client, body)
+
+    assert response.json() == {"received": 2, "inserted": 1, "updated": 1, "unchanged": 0}
+    stock = StockMaster.objects.get(code="005930")
+    assert (stock.name_kr, stock.name_en) == ("삼성전자", "Samsung")
+
+
+@pytest.mark.django_db
+def test_upsert_ndjson_invalid_line_rolls_back_and_reports_line(client, monkeypatch):
+    from stocks import upsert
+
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    monkeypatch.setattr(upsert, "STREAM_BATCH_SIZE", 1)
+    body = _ndjson_body(
+        [
+            {"code": "005930", "name_kr": "삼성전자", "market": "KOSPI"},
+            {"code": "035420", "name_kr": "NAVER", "market": "NYSE"},
+        ]
+    )
+
+    response = _post_ndjson(client, body)
+
+    assert response.status_code == 400
+    assert response.json()["line"] == 2
+    assert "market" in response.json()["errors"]
+    assert StockMaster.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_upsert_ndjson_rejects_bad_encoding_and_body(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+
+    plain = client.generic(
+        "POST",
+        "/api/internal/stocks:upsert",
+        b'{"code": "005930", "name_kr": "\xec\x82\xbc\xec\x84\xb1", "market": "KOSPI"}\n',
+        content_type="application/x-ndjson",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+    assert plain.status_code == 200
+    assert plain.json()["inserted"] == 1
+
+    assert _post_ndjson(client, b"not gzip").json() == {"detail": "Invalid gzip body"}
+    assert _post_ndjson(client, gzip.compress(b"[1]\n")).json()["line"] == 1
+    brotli = _post_ndjson(client, b"", encoding="br")
+    assert brotli.status_code == 415
+
+
+def _post_upsert(client, payload, key):
+    return client.post(
+        "/api/internal/stocks:upsert",
+        payload,
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+        HTTP_IDEMPOTENCY_KEY=key,
+    )
+
+
+@pytest.mark.django_db
+def test_upsert_idempotency_key_replays_stored_response(
+    client, monkeypatch, django_assert_max_num_queries
+):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    payload = {"items": [{"code": "005930", "name_kr": "삼성전자", "market": "KOSPI"}]}
+
+    first = _post_upsert(client, payload, "batch-1")
+    assert first.status_code == 200
+    assert first.json()["inserted"] == 1
+    assert "Idempotent-Replayed" not in first
+
+    StockMaster.objects.filter(code="005930").update(name_kr="수정됨")
+    # A retry is answered by one primary-key lookup and never re-applied.
+    with django_assert_max_num_queries(1):
+        replay = _post_upsert(client, payload, "batch-1")
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay["Idempotent-Replayed"] == "true"
+    assert StockMaster.objects.get(code="005930").name_kr == "수정됨"
+
+    fresh = _post_upsert(client, payload, "batch-2")
+    assert fresh.json()["updated"] == 1
+    assert StockMaster.objects.get(code="005930").name_kr == "삼성전자"
+
+    invalid = _post_upsert(client, payload, "not a key!")
+    assert invalid.status_code == 400
+    assert invalid.json() == {"detail": "Invalid Idempotency-Key"}
+
+
+@pytest.mark.django_db
+def test_upsert_idempotency_key_is_released_on_failure_and_expires(client, monkeypatch):
+    from django.core.management import call_command
+    from django.utils import timezone
+    from stocks.idempotency import IDEMPOTENCY_TTL
+    from stocks.models import UpsertIdempotencyKey
+
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    bad = {"items": [{"code": "005930", "name_kr": "삼성전자", "market": "NYSE"}]}
+    good = {"items": [{"code": "005930", "name_kr": "삼성전자", "market": "KOSPI"}]}
+
+    assert _post_upsert(client, bad, "batch-1").status_code == 400
+    assert _post_upsert(client, good, "batch-1").json()["inserted"] == 1
+
+    ndjson_bad = _ndjson_body([{"code": "035420", "name_kr": "NAVER", "market": "NYSE"}])
+    response = client.generic(
+        "POST",
+        "/api/internal/stocks:upsert",
+        ndjson_bad,
+        content_type="application/x-ndjson",
+        HTTP_CONTENT_ENCODING="gzip",
+        HTTP_X_BRIDGE_KEY="valid-key",
+        HTTP_IDEMPOTENCY_KEY="batch-2",
+    )
+    assert response.status_code == 400
+    assert not UpsertIdempotencyKey.objects.filter(key="batch-2").exists()
+
+    ndjson_good = _ndjson_body([{"code": "035420", "name_kr": "NAVER", "market": "KOSDAQ"}])
+    for expected_replay in (False, True):
+        response = client.generic(
+            "POST",
+            "/api/internal/stocks:upsert",
+            ndjson_good,
+            content_type="application/x-ndjson",
+            HTTP_CONTENT_ENCODING="gzip",
+            HTTP_X_BRIDGE_KEY="valid-key",
+            HTTP_IDEMPOTENCY_KEY="batch-2",
+        )
+        assert response.json()["inserted"] == 1
+        assert ("Idempotent-Replayed" in response) is expected_replay
+
+    # An expired key is not replayed; claiming it again only replaces its own row.
+    UpsertIdempotencyKey.objects.update(created_at=timezone.now() - IDEMPOTENCY_TTL * 2)
+    again = _post_upsert(client, good, "batch-1")
+    assert "Idempotent-Replayed" not in again
+    assert again.json()["unchanged"] == 1
+    assert sorted(UpsertIdempotencyKey.objects.values_list("key", flat=True)) == [
+        "batch-1",
+        "batch-2",
+    ]
+
+    # Other expired keys are left to the purge command.
+    out = io.StringIO()
+    call_command("purge_idempotency_keys", stdout=out)
+    assert out.getvalue().strip() == "Deleted 1 expired idempotency keys"
+    assert list(UpsertIdempotencyKey.objects.values_list("key", flat=True)) == ["batch-1"]
+
+
+def _manifest_row_hash(values):
+    encoded = "\x1f".join(
+        "\x1e"
+        if value is None
+        else ("true" if value is True else "false" if value is False else str(value))
+        for value in values
+    )
+    return hashlib.md5(encoded.encode("utf-8")).hexdigest()
+
+
+@pytest.mark.django_db
+def test_manifest_returns_sql_row_hashes_and_market_rollups(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930", listed_date=datetime.date(1975, 6, 11))
+    create_stock(code="000660", name_kr="SK하이닉스", name_en=None, category_l1=None)
+    create_stock(code="035420", name_kr="NAVER", market="KOSDAQ")
+    create_stock(code="999999", name_kr="상폐", is_active=False)
+
+    unauthorized = client.get("/api/internal/stocks:manifest")
+    assert unauthorized.status_code == 401
+
+    response = client.get(
+        "/api/internal/stocks:manifest", {"codes": "1"}, HTTP_X_BRIDGE_KEY="valid-key"
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["algorithm"] == "md5-v1"
+
+    samsung = _manifest_row_hash(
+        ["005930", "삼성전자", "Samsung Electronics", "KOSPI", "COMMON_STOCK", None, None]
+        + ["반도체", None, True, "1975-06-11", None]
+    )
+    hynix = _manifest_row_hash(
+        ["000660", "SK하이닉스", None, "KOSPI", "COMMON_STOCK", None, None]
+        + [None, None, True, None, None]
+    )
+    assert payload["codes"]["KOSPI"] == {"000660": hynix, "005930": samsung}
+    assert set(payload["codes"]["KOSDAQ"]) == {"035420"}
+    assert payload["markets"]["KOSPI"] == {
+        "count": 2,
+        "hash": hashlib.md5((hynix + samsung).encode("ascii")).hexdigest(),
+    }
+
+    kosdaq_only = client.get(
+        "/api/internal/stocks:manifest", {"markets": "KOSDAQ"}, HTTP_X_BRIDGE_KEY="valid-key"
+    ).json()
+    assert set(kosdaq_only["markets"]) == {"KOSDAQ"}
+    assert "codes" not in kosdaq_only
+
+    invalid = client.get(
+        "/api/internal/stocks:manifest", {"markets": "NYSE"}, HTTP_X_BRIDGE_KEY="valid-key"
+    )
+    assert invalid.status_code == 400
+
+
+@pytest.mark.django_db
+def test_relevance_ordering_ranks_typos_and_code_matches_first(
+    client, django_assert_max_num_queries
+):
+    create_stock(code="005930", name_kr="삼성전자", name_en="Samsung Electronics")
+    create_stock(code="005935", name_kr="삼성전자우", name_en="Samsung Electronics Pref")
+    create_stock(code="028260", name_kr="삼성물산", name_en="Samsung C&T")
+    create_stock(code="035720", name_kr="카카오", name_en="Kakao")
+    create_stock(code="323410", name_kr="카카오뱅크", name_en="KakaoBank")
+    create_stock(code="066570", name_kr="LG전자", name_en="LG Electronics")
+
+    # Search settings, count and page, plus the savepoint pair inside the test transaction.
+    with django_assert_max_num_queries(5):
+        typo = client.get(
+            "/api/stocks", {"keywords": "samsng electronics", "ordering": "relevance"}
+        )
+    assert typo.status_code == 200
+    results = typo.json()["results"]
+    assert [item["code"] for item in results[:2]] == ["005930", "005935"]
+    assert results[0]["score"] >= results[-1]["score"]
+    assert "suggestions" not in typo.json()
+
+    # Shorter names win ties, so the exact name comes before its longer variants.
+    kakao = client.get("/api/stocks", {"keywords": "카카오", "ordering": "relevance"}).json()
+    assert [item["code"] for item in kakao["results"]] == ["035720", "323410"]
+
+    by_code = client.get("/api/stocks", {"keywords": "0059", "ordering": "relevance"}).json()
+    assert {item["code"] for item in by_code["results"]} == {"005930", "005935"}
+
+    # Infix substrings still match, whatever their trigram similarity.
+    infix = client.get("/api/stocks", {"keywords": "전자", "ordering": "relevance"}).json()
+    assert {item["code"] for item in infix["results"]} == {"005930", "005935", "066570"}
+
+    plain = client.get("/api/stocks", {"keywords": "samsng"}).json()
+    assert plain["count"] == 0 and "score" not in str(plain)
+
+
+@pytest.mark.django_db
+def test_relevance_threshold_and_did_you_mean_suggestions(client):
+    create_stock(code="005930", name_kr="삼성전자", name_en="Samsung Electronics")
+    create_stock(code="035420", name_kr="NAVER", name_en="NAVER", market="KOSDAQ")
+
+    loose = client.get(
+        "/api/stocks", {"keywords": "samsong", "ordering": "relevance", "similarity": "0.3"}
+    ).json()
+    assert [item["code"] for item in loose["results"]] == ["005930"]
+
+    strict = client.get(
+        "/api/stocks", {"keywords": "samsong", "ordering": "relevance", "similarity": "0.9"}
+    ).json()
+    assert strict["count"] == 0
+    assert [item["code"] for item in strict["suggestions"]] == ["005930"]
+    assert 0 < strict["suggestions"][0]["score"] < 0.9
+
+    filtered = client.get(
+        "/api/stocks",
+        {"keywords": "samsong", "ordering": "relevance", "similarity": "0.9", "markets": "KOSDAQ"},
+    ).json()
+    assert filtered["suggestions"] == []
+
+    for value in ("0", "1.5", "abc"):
+        response = client.get(
+            "/api/stocks", {"keywords": "samsung", "ordering": "relevance", "similarity": value}
+        )
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid similarity"}
+
+    no_keywords = client.get("/api/stocks", {"ordering": "relevance"}).json()
+    assert [item["code"] for item in no_keywords["results"]] == ["005930", "035420"]
+
+    # Without a ranked search the threshold is not read, so it is not validated either.
+    for params in ({"keywords": "samsung"}, {"ordering": "relevance"}):
+        response = client.get("/api/stocks", {**params, "similarity": "abc"})
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_ranked_search_reads_the_names_trigram_index():
+    from django.db import connection, transaction
+    from stocks.search import ranked_search, set_similarity_threshold
+
+    StockMaster.objects.bulk_create(
+        StockMaster(
+            code=f"{i:06d}",
+            name_kr=f"가상종목{i}호",
+            name_en=f"Listed Company {i}",
+            market="KOSPI",
+            security_type="COMMON_STOCK",
+        )
+        for i in range(1, 3000)
+    )
+    create_stock(code="005930", name_kr="삼성전자", name_en="Samsung Electronics")
+    with connection.cursor() as cursor:
+        # What (auto)vacuum leaves behind: the bulk insert sits in the GIN pending list until
+        # flushed, and the planner prices pending entries far above indexed ones.
+        cursor.execute("SELECT gin_clean_pending_list('idx_stock_master_names_trgm'::regclass)")
+        cursor.execute(f"ANALYZE {StockMaster._meta.db_table}")
+
+    # ILIKE and %> against the combined-names trigram index under a transaction-local
+    # threshold: the planner picks the index plan without any cost tuning.
+    with transaction.atomic():
+        set_similarity_threshold(0.3)
+        ranked = ranked_search(StockMaster.objects.all(), ["samsng", "electronic"], "and")
+        plan = ranked.explain()
+        codes = [stock.code for stock in ranked]
+
+    assert codes == ["005930"]
+    assert "Seq Scan" not in plan
+    assert "idx_stock_master_names_trgm" in plan
+
+
+@pytest.mark.django_db
+def test_choseong_keywords_match_name_initials(client, monkeypatch):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    create_stock(code="005930", name_kr="삼성전자")
+    create_stock(code="028260", name_kr="삼성물산")
+    create_stock(code="000660", name_kr="SK하이닉스")
+    assert StockMaster.objects.get(code="000660").name_choseong == "SKㅎㅇㄴㅅ"
+
+    def codes(params):
+        response = client.get("/api/stocks", params)
+        assert response.status_code == 200
+        return [item["code"] for item in response.json()["results"]]
+
+    assert codes({"keywords": "ㅅㅅㅈㅈ"}) == ["005930"]
+    # One or two initials match the start of the name, three or more anywhere in it.
+    assert codes({"keywords": "ㅅㅅ"}) == ["005930", "028260"]
+    assert codes({"keywords": "ㅎㅇ"}) == []
+    assert codes({"keywords": "ㅎㅇㄴ"}) == ["000660"]
+    assert codes({"keywords": "ㅅㅅ 물산"}) == ["028260"]
+    assert codes({"keywords": "ㅅㅅ", "ordering": "relevance"}) == ["005930", "028260"]
+    assert codes({"keywords": "ㅇㄴㅅ", "ordering": "relevance"}) == ["000660"]
+
+    # The upsert path keeps the initials in step with name_kr.
+    client.post(
+        "/api/internal/stocks:upsert",
+        {"items": [{"code": "028260", "name_kr": "물산", "market": "KOSPI"}]},
+        format="json",
+        HTTP_X_BRIDGE_KEY="valid-key",
+    )
+    assert codes({"keywords": "ㅅㅅ"}) == ["005930"]
+    assert StockMaster.objects.get(code="028260").name_choseong == "ㅁㅅ"
+
+
+@pytest.mark.django_db
+def test_name_choseong_migration_backfills_existing_rows():
+    import importlib
+
+    from django.apps import apps
+
+    migration = importlib.import_module("stocks.migrations.0006_name_choseong")
+    create_stock(code="005930", name_kr="삼성전자")
+    create_stock(code="035720", name_kr="카카오")
+    StockMaster.objects.update(name_choseong="")
+
+    migration.backfill_name_choseong(apps, None)
+
+    assert dict(StockMaster.objects.values_list("code", "name_choseong")) == {
+        "005930": "ㅅㅅㅈㅈ",
+        "035720": "ㅋㅋㅇ",
+    }
+
+
+@pytest.fixture
+def suggest_index():
+    from stocks import suggest
+
+    suggest.reset_suggest_index()
+    yield suggest
+    suggest.reset_suggest_index()
+
+
+@pytest.mark.django_db
+def test_suggest_matches_code_name_english_words_and_initials(
+    client, suggest_index, django_assert_num_queries
+):
+    create_stock(code="005930", name_kr="삼성전자", name_en="Samsung Electronics")
+    create_stock(code="005935", name_kr="삼성전자우", name_en="Samsung Electronics Pref")
+    create_stock(code="028260", name_kr="삼성물산", name_en="Samsung C&T")
+    create_stock(code="066570", name_kr="LG전자", name_en="LG Electronics")
+    create_stock(code="000000", name_kr="삼성폐지", is_active=False)
+
+    def codes(params):
+        response = client.get("/api/stocks/suggest", params)
+        assert response.status_code == 200
+        return [item["code"] for item in response.json()["results"]]
+
+    # One generation check and one load on first use; later lookups stay in memory.
+    with django_assert_num_queries(2):
+        assert codes({"q": "삼성"}) == ["028260", "005930", "005935"]
+    with django_assert_num_queries(0):
+        assert codes({"q": "삼성전자"}) == ["005930", "005935"]
+        assert codes({"q": "0059"}) == ["005930", "005935"]
+        assert codes({"q": "ELEC"}) == ["005930", "066570", "005935"]
+        assert codes({"q": "samsung elec"}) == ["005930", "005935"]
+        assert codes({"q": "ㅅㅅㅈ"}) == ["005930", "005935"]
+        assert codes({"q": "삼성", "limit": "1"}) == ["028260"]
+        assert codes({"q": " "}) == []
+
+    item = client.get("/api/stocks/suggest", {"q": "LG"}).json()["results"][0]
+    assert item == {
+        "code": "066570",
+        "name_kr": "LG전자",
+        "name_en": "LG Electronics",
+        "market": "KOSPI",
+        "security_type": "COMMON_STOCK",
+    }
+    for limit in ("0", "51", "x"):
+        response = client.get("/api/stocks/suggest", {"q": "삼성", "limit": limit})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_suggest_index_refreshes_off_the_request_path_once_upserts_settle(
+    client,
+    monkeypatch,
+    suggest_index,
+    django_capture_on_commit_callbacks,
+    django_assert_num_queries,
+):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    # Run the refresh inline: another thread would not see this test's transaction.
+    monkeypatch.setattr(suggest_index, "_refresh_in_background", suggest_index._refresh)
+    create_stock(code="005930", name_kr="삼성전자")
+
+    def codes():
+        return [
+            item["code"]
+            for item in client.get("/api/stocks/suggest", {"q": "카카"}).json()["results"]
+        ]
+
+    assert codes() == []
+
+    def upsert(code, name_kr):
+        client.post(
+            "/api/internal/stocks:upsert",
+            {"items": [{"code": code, "name_kr": name_kr, "market": "KOSPI"}]},
+            format="json",
+            HTTP_X_BRIDGE_KEY="valid-key",
+        )
+
+    # A changing upsert only bumps the generation after commit; an unchanged one does not.
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        upsert("035720", "카카오")
+    assert len(callbacks) == 1
+    with django_capture_on_commit_callbacks() as callbacks:
+        upsert("035720", "카카오")
+    assert callbacks == []
+
+    # Between checks requests never query the database.
+    with django_assert_num_queries(0):
+        assert codes() == []
+
+    monkeypatch.setattr(suggest_index, "STALE_CHECK_SECONDS", 0.0)
+    # The first check that sees the new generation rebuilds at once...
+    assert codes() == ["035720"]
+    # ...a change right after that rebuild (a sync still pushing) waits for a quiet check...
+    with django_capture_on_commit_callbacks(execute=True):
+        upsert("323410", "카카오뱅크")
+    assert codes() == ["035720"]
+    with django_capture_on_commit_callbacks(execute=True):
+        upsert("377300", "카카오페이")
+    assert codes() == ["035720"]
+    # ...and the check that finds it settled rebuilds once for both chunks.
+    assert codes() == ["035720", "323410", "377300"]
+    with django_assert_num_queries(1):
+        assert codes() == ["035720", "323410", "377300"]
+
+    # A generation that keeps moving is rebuilt after MAX_STALE_SECONDS anyway.
+    monkeypatch.setattr(suggest_index, "MAX_STALE_SECONDS", 0.0)
+    with django_capture_on_commit_callbacks(execute=True):
+        upsert("293490", "카카오게임즈")
+    assert codes() == ["035720", "293490", "323410", "377300"]
+    with django_capture_on_commit_callbacks(execute=True):
+        upsert("089000", "카카오엔터")
+    assert codes() == ["035720", "293490", "323410", "089000", "377300"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_start_builds_the_suggest_index(
+    client, monkeypatch, suggest_index, django_assert_num_queries
+):
+    import importlib
+
+    from django.db import DatabaseError
+
+    def unavailable(cls):
+        raise DatabaseError("database unavailable")
+
+    create_stock(code="005930", name_kr="삼성전자")
+    # Without a database the worker still starts; the index is built on first use.
+    monkeypatch.setattr(suggest_index.SuggestIndex, "from_db", classmethod(unavailable))
+    from config import wsgi
+
+    importlib.reload(wsgi)
+    assert suggest_index._index is None
+    monkeypatch.undo()
+
+    importlib.reload(wsgi)
+    with django_assert_num_queries(0):
+        response = client.get("/api/stocks/suggest", {"q": "삼성"})
+    assert [item["code"] for item in response.json()["results"]] == ["005930"]
+
+
+@pytest.mark.django_db
+def test_suggest_index_shows_an_upsert_on_the_first_check_after_it(
+    client, monkeypatch, suggest_index, django_capture_on_commit_callbacks
+):
+    monkeypatch.setenv("BRIDGE_API_KEY", "valid-key")
+    monkeypatch.setattr(suggest_index, "_refresh_in_background", suggest_index._refresh)
+    create_stock(code="005930", name_kr="삼성전자")
+    assert client.get("/api/stocks/suggest", {"q": "카카"}).json()["results"] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(
+            "/api/internal/stocks:upsert",
+            {"items": [{"code": "035720", "name_kr": "카카오", "market": "KOSPI"}]},
+            format="json",
+            HTTP_X_BRIDGE_KEY="valid-key",
+        )
+    # One request within the check interval is served the index it has...
+    assert client.get("/api/stocks/suggest", {"q": "카카"}).json()["results"] == []
+    # ...and the next one after the interval sees the new code, however idle the worker was.
+    suggest_index._checked_at -= suggest_index.STALE_CHECK_SECONDS
+    results = client.get("/api/stocks/suggest", {"q": "카카"}).json()["results"]
+    assert [item["code"] for item in results] == ["035720"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "ordering", ["code", "-code", "name_kr", "-name_kr", "updated_at", "-updated_at"]
+)
+def test_cursor_pagination_walks_every_ordering_both_ways(client, ordering):
+    names = ["가", "나", "나", "다", "라", "라", "라", "마"]
+    for index, name in enumerate(names):
+        create_stock(code=f"{index:06d}", name_kr=name)
+    # Ties on updated_at too, so the code tiebreaker is exercised for every ordering.
+    StockMaster.objects.filter(code__in=["000002", "000003", "000004"]).update(
+        updated_at=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    )
+    # Same order as the offset pages: ties on the field go to the lower code either way.
+    offset = client.get("/api/stocks", {"ordering": ordering, "page_size": 100}).json()
+    expected = [item["code"] for item in offset["results"]]
+    if ordering == "-name_kr":
+        assert expected == [
+            "000007",
+            "000004",
+            "000005",
+            "000006",
+            "000003",
+            "000001",
+            "000002",
+            "000000",
+        ]
+
+    pages = []
+    params = {"ordering": ordering, "page_size": 3, "cursor": ""}
+    while True:
+        response = client.get("/api/stocks", params)
+        assert response.status_code == 200
+        payload = response.json()
+        assert "count" not in payload
+        pages.append(payload)
+        if payload["next"] is None:
+            break
+        params["cursor"] = payload["next"]
+
+    assert [item["code"] for page in pages for item in page["results"]] == expected
+    assert [len(page["results"]) for page in pages] == [3, 3, 2]
+    assert pages[0]["prev"] is None
+
+    # Walking back from the last page returns the same pages.
+    back = client.get("/api/stocks", {**params, "cursor": pages[-1]["prev"]}).json()
+    assert back["results"] == pages[1]["results"]
+    first = client.get("/api/stocks", {**params, "cursor": back["prev"]}).json()
+    assert first["results"] == pages[0]["results"]
+    assert first["prev"] is None
+
+
+@pytest.mark.django_db
+def test_cursor_pages_do_not_shift_and_reject_bad_cursors(client):
+    for code in ["000010", "000020", "000030", "000040"]:
+        create_stock(code=code, name_kr=code)
+
+    first = client.get("/api/stocks", {"page_size": 2, "cursor": ""}).json()
+    assert [item["code"] for item in first["results"]] == ["000010", "000020"]
+    # A sync inserting rows before the cursor does not move the next page.
+    create_stock(code="000005", name_kr="new")
+    second = client.get("/api/stocks", {"page_size": 2, "cursor": first["next"]}).json()
+    assert [item["code"] for item in second["results"]] == ["000030", "000040"]
+    assert second["next"] is None
+
+    wrong_ordering = client.get(
+        "/api/stocks", {"page_size": 2, "cursor": first["next"], "ordering": "-code"}
+    )
+    assert wrong_ordering.status_code == 400
+    assert wrong_ordering.json() == {"detail": "Invalid cursor"}
+    assert client.get("/api/stocks", {"cursor": "not-a-cursor"}).status_code == 400
+    relevance = client.get("/api/stocks", {"cursor": "", "ordering": "relevance"})
+    assert relevance.status_code == 400
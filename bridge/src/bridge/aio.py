@@ -0,0 +1,860 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Iterable, Mapping
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable
+
+import aiohttp
+
+from .archive import ArchiveReader, ArchiveWriter, resolve_archive_dir
+from .batch import StockBatch
+from .config import load_bridge_env_files, resolve_bridge_cache_dir, resolve_kiwoom_config
+from .enrich import Enricher, resolve_detail_fields
+from .jsonstream import iter_list_records
+from .kiwoom import (
+    LIST_KEYS,
+    RETRY_STATUSES,
+    TOKEN_HEADERS,
+    KiwoomClient,
+    PageStats,
+    PoolSettings,
+    cached_token_data,
+    continuation_key,
+    safe_response_snippet,
+    stock_info_from_data,
+    token_expiry,
+    token_from_response,
+    token_is_fresh,
+    token_now,
+    token_payload,
+)
+from .push import PushTotals, UpsertCheckpoint, chunk_digest, result_counts
+from .ratelimit import RateLimiter, shared_rate_limiter
+from .snapshot import MANIFEST_ALGORITHM, SnapshotStore, merge_backend_codes, reconcile_entries
+from .sync import (
+    BACKEND_RETRY_STATUSES,
+    MARKET_TYPES,
+    NDJSON_HEADERS,
+    BackendTarget,
+    KiwoomFetchError,
+    MarketStats,
+    RunReport,
+    commit_push,
+    encode_json_body,
+    encode_ndjson,
+    health_ok,
+    load_enricher,
+    normalize_page,
+    open_checkpoint,
+    open_replay,
+    plan_removals,
+    pool_settings,
+    with_idempotency_key,
+)
+from .token_cache import TokenCache
+
+# Same policy as ``create_session``: connection errors and ``RETRY_STATUSES`` (plus 409
+# for backend calls) are retried with exponential backoff; 429 is left to the rate limiter.
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+# Everything a failed request can raise: connection errors, timeouts and HTTPStatusError.
+# aiohttp raises asyncio.TimeoutError, which is not the builtin TimeoutError before 3.11.
+HTTP_ERRORS: tuple[type[BaseException], ...] = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+@dataclass
+class Response:
+    """A fully read response with the ``requests.Response`` attributes the bridge uses."""
+
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+    url: str
+    elapsed: timedelta
+    request: aiohttp.RequestInfo | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+@contextlib.asynccontextmanager
+async def _aclosing(agen: AsyncGenerator[Any, None]) -> AsyncIterator[AsyncGenerator[Any, None]]:
+    # ``contextlib.aclosing`` is 3.10+.
+    try:
+        yield agen
+    finally:
+        await agen.aclose()
+
+
+class HTTPStatusError(aiohttp.ClientError):
+    """A 4xx/5xx response, like ``requests.HTTPError`` with its ``response``."""
+
+    def __init__(self, message: str, response: Response) -> None:
+        super().__init__(message)
+        self.response = response
+
+
+def _raise_for_status(response: Response, message: str) -> None:
+    if not response.ok:
+        raise HTTPStatusError(f"{message} body={safe_response_snippet(response)}", response)
+
+
+def _connector(pool: PoolSettings) -> aiohttp.TCPConnector:
+    # Unlike urllib3, aiohttp keeps every opened connection alive (until its keep-alive
+    # timeout), so only a blocking pool needs limits: per host, and hosts x per host overall.
+    if not pool.block:
+        return aiohttp.TCPConnector(limit=0)
+    return aiohttp.TCPConnector(limit=pool.hosts * pool.per_host, limit_per_host=pool.per_host)
+
+
+class AsyncSession:
+    """Pooled keep-alive ``aiohttp.ClientSession`` with the bridge retry policy.
+
+    ``request`` returns a fully read ``Response``; ``send`` is a single attempt. ``hooks["response"]`` callables get every
+    final response plus ``retries=<n>``, so ``SyncMetrics.attach`` works on it as on a
+    ``requests.Session``. Create it inside the event loop that uses it.
+    """
+
+    def __init__(self, pool: PoolSettings | None = None) -> None:
+        self.client = aiohttp.ClientSession(connector=_connector(pool or PoolSettings()))
+        self.hooks: dict[str, list[Callable[..., Any]]] = {"response": []}
+
+    async def __aenter__(self) -> AsyncSession:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.client.close()
+
+    async def send(self, method: str, url: str, timeout: float, **kwargs: Any) -> Response:
+        """One attempt: no retries, and the response hooks are not called."""
+        started = time.perf_counter()
+        async with self.client.request(
+            method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+        ) as raw:
+            content = await raw.read()
+        return Response(
+            raw.status,
+            raw.headers,
+            content,
+            str(raw.url),
+            timedelta(seconds=time.perf_counter() - started),
+            raw.request_info,
+        )
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        timeout: float,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        **kwargs: Any,
+    ) -> Response:
+        retries = 0
+        while True:
+            try:
+                response = await self.send(method, url, timeout, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if retries >= MAX_RETRIES:
+                    raise
+            else:
+                if response.status_code not in retry_statuses or retries >= MAX_RETRIES:
+                    for hook in self.hooks["response"]:
+                        hook(response, retries=retries)
+                    return response
+            retries += 1
+            # urllib3's schedule: retry at once, then back off exponentially.
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** (retries - 1) if retries > 1 else 0)
+
+
+class AsyncKiwoomClient:
+    """``KiwoomClient`` for the asyncio engine: same token lifecycle, list and detail calls.
+
+    Requests go through one ``AsyncSession`` and are paced by the same (thread-safe)
+    ``RateLimiter`` buckets; tokens come from, and are stored in, the same ``TokenCache``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        app_key: str,
+        app_secret: str,
+        session: AsyncSession,
+        timeout: int = 20,
+        token_cache: TokenCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.session = session
+        self.timeout = timeout
+        self.token_cache = token_cache
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self._token_lock = asyncio.Lock()
+        self._token: tuple[str, str] | None = None
+        self._token_expires_at: Any = None
+
+    @classmethod
+    def from_env(cls, session: AsyncSession) -> AsyncKiwoomClient:
+        """Client for the configured mode (like ``create_kiwoom_client``); ValueError if unset."""
+        kiwoom = resolve_kiwoom_config()
+        return cls(
+            kiwoom.host_url,
+            kiwoom.app_key,
+            kiwoom.app_secret,
+            session,
+            token_cache=TokenCache.from_env(kiwoom.mode, kiwoom.app_key),
+        )
+
+    @classmethod
+    def from_client(cls, client: KiwoomClient, session: AsyncSession) -> AsyncKiwoomClient:
+        """Share a (warm) ``KiwoomClient``'s settings, limiter, token cache and token."""
+        async_client = cls(
+            client.base_url,
+            client.app_key,
+            client.app_secret,
+            session,
+            timeout=client.timeout,
+            token_cache=client.token_cache,
+            rate_limiter=client.rate_limiter,
+        )
+        async_client._token, async_client._token_expires_at = client.token_state()
+        return async_client
+
+    async def issue_token(self) -> dict[str, Any]:
+        cached = cached_token_data(self.token_cache)
+        if cached is not None:
+            return cached
+        url = f"{self.base_url}/oauth2/token"
+        payload = token_payload(self.app_key, self.app_secret)
+        response = await self.rate_limiter.send_async(
+            "au10001",
+            lambda: self.session.request(
+                "POST", url, headers=dict(TOKEN_HEADERS), json=payload, timeout=self.timeout
+            ),
+        )
+        return token_from_response(response, self.token_cache)
+
+    async def token(self) -> tuple[str, str]:
+        async with self._token_lock:
+            now = token_now(self.token_cache)
+            if self._token is not None and token_is_fresh(self._token_expires_at, now):
+                return self._token
+            data = await self.issue_token()
+            self._token = (data["token_type"], data["token"])
+            self._token_expires_at = token_expiry(data, now)
+            return self._token
+
+    async def refresh_token(self, rejected: tuple[str, str] | None = None) -> tuple[str, str]:
+        async with self._token_lock:
+            if rejected is None or self._token in (None, rejected):
+                self._token = None
+                if self.token_cache is not None:
+                    self.token_cache.invalidate()
+        return await self.token()
+
+    async def _post(
+        self, api_id: str, payload: dict[str, str], extra_headers: dict[str, str] | None = None
+    ) -> Response:
+        """POST an authorized Kiwoom call, retried once with a fresh token on 401."""
+        url = f"{self.base_url}/api/dostk/stkinfo"
+
+        async def post(token: tuple[str, str]) -> Response:
+            headers = {
+                "Content-Type": "application/json;charset=UTF-8",
+                "api-id": api_id,
+                "authorization": f"{token[0]} {token[1]}",
+                **(extra_headers or {}),
+            }
+            return await self.rate_limiter.send_async(
+                api_id,
+                lambda: self.session.request(
+                    "POST", url, headers=headers, json=payload, timeout=self.timeout
+                ),
+            )
+
+        token = await self.token()
+        response = await post(token)
+        if response.status_code == 401:
+            response = await post(await self.refresh_token(rejected=token))
+        return response
+
+    async def fetch_stock_info(self, code: str) -> dict[str, Any]:
+        response = await self._post("ka10001", {"stk_cd": str(code)})
+        _raise_for_status(
+            response, f"Kiwoom ka10001 HTTP error status={response.status_code} code={code}"
+        )
+        return stock_info_from_data(response.json(), code)
+
+    async def _fetch_page(
+        self, mrkt_tp: str, next_key: str | None
+    ) -> tuple[list[dict[str, Any]], str | None, bytes]:
+        extra = {"cont-yn": "Y", "next-key": next_key} if next_key else None
+        response = await self._post("ka10099", {"mrkt_tp": str(mrkt_tp)}, extra)
+        _raise_for_status(
+            response,
+            f"Kiwoom list HTTP error status={response.status_code} url={response.url}",
+        )
+        body = response.content
+        return list(iter_list_records([body], LIST_KEYS)), continuation_key(response.headers), body
+
+    async def iter_stock_list_pages(
+        self,
+        mrkt_tp: str,
+        stats: PageStats | None = None,
+        on_body: Callable[[bytes, str | None], Any] | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """Async ``KiwoomClient.iter_stock_list_pages``, with the same one-page prefetch."""
+        seen_keys: set[str] = set()
+        pending: asyncio.Task | None = asyncio.ensure_future(self._fetch_page(mrkt_tp, None))
+        try:
+            while pending is not None:
+                records, next_key, body = await pending
+                pending = None
+                if on_body is not None:
+                    on_body(body, next_key)
+                if next_key:
+                    if next_key in seen_keys:
+                        raise RuntimeError(
+                            f"Kiwoom continuation key repeated mrkt_tp={mrkt_tp} "
+                            f"next_key={next_key}"
+                        )
+                    seen_keys.add(next_key)
+                    pending = asyncio.ensure_future(self._fetch_page(mrkt_tp, next_key))
+                if stats is not None:
+                    stats.pages += 1
+                    stats.bytes += len(body)
+                yield records
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+
+async def _replayed_pages(
+    reader: ArchiveReader, mrkt_tp: str, stats: PageStats
+) -> AsyncIterator[list[dict[str, Any]]]:
+    for page in reader.iter_stock_list_pages(mrkt_tp, stats=stats):
+        yield page
+
+
+class AsyncMarketStream:
+    """``MarketStream`` for the asyncio engine.
+
+    Every market is fetched by its own task (at most ``workers`` at a time) into a bounded
+    queue, and ``pages()`` drains the queues in MARKET_TYPES order. Producer failures are
+    raised from ``pages()`` as ``KiwoomFetchError``. ``aclose()`` cancels the producers.
+    """
+
+    def __init__(
+        self,
+        source: AsyncKiwoomClient | ArchiveReader,
+        workers: int = 1,
+        max_buffered_pages: int = 4,
+        on_market_done: Callable[[MarketStats], None] | None = None,
+        archive: ArchiveWriter | None = None,
+    ) -> None:
+        self._source = source
+        self._archive = archive
+        self._on_market_done = on_market_done
+        self._slots = asyncio.Semaphore(max(1, workers))
+        self._queues: dict[str, asyncio.Queue] = {
+            mrkt_tp: asyncio.Queue(maxsize=max(1, max_buffered_pages)) for mrkt_tp in MARKET_TYPES
+        }
+        self.markets: dict[str, MarketStats] = {}
+        self._tasks = [asyncio.ensure_future(self._produce(mrkt_tp)) for mrkt_tp in MARKET_TYPES]
+
+    def _market_pages(
+        self, mrkt_tp: str, page_stats: PageStats
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        if isinstance(self._source, ArchiveReader):
+            return _replayed_pages(self._source, mrkt_tp, page_stats)
+        on_body = (
+            functools.partial(self._archive.add_page, mrkt_tp)
+            if self._archive is not None
+            else None
+        )
+        return self._source.iter_stock_list_pages(mrkt_tp, stats=page_stats, on_body=on_body)
+
+    async def _produce(self, mrkt_tp: str) -> None:
+        target = self._queues[mrkt_tp]
+        stats = MarketStats(mrkt_tp)
+        page_stats = PageStats()
+        try:
+            async with self._slots:
+                started = time.perf_counter()
+                pages = self._market_pages(mrkt_tp, page_stats)
+                try:
+                    async for page in pages:
+                        stats.raw_count += len(page)
+                        stats.pages = page_stats.pages
+                        stats.bytes = page_stats.bytes
+                        await target.put(("page", page))
+                finally:
+                    await pages.aclose()
+                    stats.elapsed = time.perf_counter() - started
+        except Exception as exc:
+            await target.put(("error", exc))
+            return
+        await target.put(("done", stats))
+
+    async def pages(self) -> AsyncIterator[tuple[str, list[dict[str, Any]]]]:
+        for mrkt_tp in MARKET_TYPES:
+            while True:
+                kind, payload = await self._queues[mrkt_tp].get()
+                if kind == "page":
+                    yield mrkt_tp, payload
+                elif kind == "done":
+                    self.markets[mrkt_tp] = payload
+                    if self._on_market_done is not None:
+                        self._on_market_done(payload)
+                    break
+                else:
+                    raise KiwoomFetchError(str(payload)) from payload
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class AsyncChunkPusher:
+    """``push_in_chunks`` for the asyncio engine, fed page by page through ``add``.
+
+    Items are collected into ``StockBatch`` chunks of ``chunk_size`` and each full chunk is
+    posted by its own task, at most ``max_in_flight`` at once. Chunks already acknowledged
+    in ``checkpoint`` are skipped. After the first failure no new chunk starts (``add``
+    returns False); ``finish`` waits for the chunks in flight, which are still
+    checkpointed, and re-raises the failure.
+    """
+
+    def __init__(
+        self,
+        post: Callable[[StockBatch], Awaitable[dict[str, Any]]],
+        chunk_size: int,
+        max_in_flight: int = 1,
+        checkpoint: UpsertCheckpoint | None = None,
+        on_chunk: Callable[[int, int, dict[str, int], float, bool], None] | None = None,
+    ) -> None:
+        self.post = post
+        self.chunk_size = chunk_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.checkpoint = checkpoint
+        self.totals = PushTotals(on_chunk)
+        self.error: BaseException | None = None
+        self._chunk = StockBatch()
+        self._index = 0
+        self._pending: dict[asyncio.Task, tuple[int, int, str]] = {}
+
+    async def add(self, items: Iterable[dict[str, Any]]) -> bool:
+        for item in items:
+            self._chunk.append(item)
+            if len(self._chunk) >= self.chunk_size:
+                await self._submit()
+            if self.error is not None:
+                return False
+        return True
+
+    async def _send(self, chunk: StockBatch) -> tuple[dict[str, int], float]:
+        started = time.perf_counter()
+        result = await self.post(chunk)
+        return result_counts(result), time.perf_counter() - started
+
+    async def _submit(self) -> None:
+        chunk, self._chunk = self._chunk, StockBatch()
+        self._index += 1
+        digest = chunk_digest(chunk)
+        if self.checkpoint is not None and digest in self.checkpoint.acked:
+            self.totals.record(self._index, len(chunk), self.checkpoint.acked[digest], 0.0, True)
+            return
+        while len(self._pending) >= self.max_in_flight:
+            await self._drain()
+        if self.error is None:
+            task = asyncio.ensure_future(self._send(chunk))
+            self._pending[task] = (self._index, len(chunk), digest)
+
+    async def _drain(self) -> None:
+        done, _ = await asyncio.wait(list(self._pending), return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            index, size, digest = self._pending.pop(task)
+            try:
+                counts, elapsed = task.result()
+            except Exception as exc:
+                if self.error is None:
+                    self.error = exc
+                continue
+            if self.checkpoint is not None:
+                self.checkpoint.ack(digest, counts)
+            self.totals.record(index, size, counts, elapsed, False)
+
+    async def wait(self) -> None:
+        """Let the chunks in flight finish (and be checkpointed)."""
+        while self._pending:
+            await self._drain()
+
+    async def finish(self) -> dict[str, int]:
+        """Send the last partial chunk, wait for all of them and return the totals."""
+        if self.error is None and len(self._chunk):
+            await self._submit()
+        await self.wait()
+        if self.error is not None:
+            raise self.error
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        return self.totals.totals
+
+
+async def _backend_json(
+    session: AsyncSession, method: str, url: str, timeout: int, **kwargs: Any
+) -> dict[str, Any]:
+    response = await session.request(
+        method, url, timeout=timeout, retry_statuses=BACKEND_RETRY_STATUSES, **kwargs
+    )
+    _raise_for_status(response, f"HTTP error status={response.status_code} url={url}")
+    data = response.json()
+    if not isinstance(data, dict):
+        return {}
+    return data
+
+
+async def _check_backend_health(session: AsyncSession, health_url: str) -> bool:
+    # Like the requests engine: one plain GET, no retries and not counted in the metrics.
+    try:
+        return health_ok(await session.send("GET", health_url, timeout=2))
+    except (*HTTP_ERRORS, ValueError):
+        return False
+
+
+async def _unique_pages(
+    stream: AsyncMarketStream,
+    limit: int | None,
+    report: RunReport,
+    enricher: Enricher | None,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """``_iter_unique_items`` (plus enrichment) for the asyncio engine, one page at a time."""
+    if limit is not None and limit < 1:
+        return
+    seen: set[str] = set()
+    async with _aclosing(stream.pages()) as pages:
+        async for mrkt_tp, records in pages:
+            page = normalize_page(mrkt_tp, records, seen, limit, report.stats, report.metrics)
+            if enricher is not None:
+                page = await enricher.enrich_async(page)
+            yield page
+            if limit is not None and len(seen) >= limit:
+                return
+
+
+def sync_stocks_async(
+    report: RunReport,
+    *,
+    limit: int | None,
+    workers: int,
+    chunk_size: int,
+    push_concurrency: int,
+    resume: bool,
+    reconcile: bool,
+    wire: str,
+    full_snapshot: bool,
+    client: KiwoomClient | None,
+    archive: bool,
+    from_archive: str | None,
+    enrich: bool,
+    enrich_concurrency: int,
+    enrich_ttl_hours: float,
+    enrich_budget: float,
+) -> int:
+    """``sync_stocks(engine="asyncio")``: the same flow on one event loop and aiohttp session.
+
+    Market fetches, detail lookups and upsert chunks are tasks instead of threads, so
+    ``--enrich-concurrency`` and ``--push-concurrency`` cost a coroutine each, not a
+    thread. A warm ``client`` (``serve``) lends its token, rate limiter and token cache.
+    """
+    return asyncio.run(
+        _sync_stocks(
+            report,
+            limit=limit,
+            workers=workers,
+            chunk_size=chunk_size,
+            push_concurrency=push_concurrency,
+            resume=resume,
+            reconcile=reconcile,
+            wire=wire,
+            full_snapshot=full_snapshot,
+            client=client,
+            archive=archive,
+            from_archive=from_archive,
+            enrich=enrich,
+            enrich_concurrency=enrich_concurrency,
+            enrich_ttl_hours=enrich_ttl_hours,
+            enrich_budget=enrich_budget,
+        )
+    )
+
+
+async def _sync_stocks(
+    report: RunReport,
+    *,
+    limit: int | None,
+    workers: int,
+    chunk_size: int,
+    push_concurrency: int,
+    resume: bool,
+    reconcile: bool,
+    wire: str,
+    full_snapshot: bool,
+    client: KiwoomClient | None,
+    archive: bool,
+    from_archive: str | None,
+    enrich: bool,
+    enrich_concurrency: int,
+    enrich_ttl_hours: float,
+    enrich_budget: float,
+) -> int:
+    load_bridge_env_files()
+    backend = BackendTarget.from_env()
+
+    fetch_workers = max(1, min(workers, len(MARKET_TYPES)))
+    replay: ArchiveReader | None = None
+    if from_archive:
+        try:
+            replay = open_replay(from_archive)
+        except ValueError as exc:
+            return report.failed(2, str(exc))
+    try:
+        pool = pool_settings(fetch_workers, push_concurrency, enrich_concurrency if enrich else 0)
+        if replay is None and client is None:
+            resolve_kiwoom_config()
+        if enrich:
+            resolve_detail_fields()
+    except ValueError as exc:
+        return report.failed(2, str(exc))
+
+    async with AsyncSession(pool) as session:
+        kiwoom: AsyncKiwoomClient | None = None
+        archive_writer: ArchiveWriter | None = None
+        if replay is None:
+            if client is not None:
+                kiwoom = AsyncKiwoomClient.from_client(client, session)
+            else:
+                kiwoom = AsyncKiwoomClient.from_env(session)
+            report.watch_rate_limiter(kiwoom.rate_limiter)
+        report.metrics.attach(session)
+        if kiwoom is not None:
+            try:
+                with report.metrics.phase("token"):
+                    await kiwoom.token()
+            except Exception as e:
+                return report.failed(1, f"Failed to fetch Kiwoom token: {e}")
+            if archive:
+                archive_writer = ArchiveWriter(resolve_archive_dir(resolve_bridge_cache_dir()))
+        return await _run_pipeline(
+            report,
+            session,
+            kiwoom,
+            replay,
+            archive_writer,
+            backend=backend,
+            fetch_workers=fetch_workers,
+            limit=limit,
+            chunk_size=chunk_size,
+            push_concurrency=push_concurrency,
+            resume=resume,
+            reconcile=reconcile,
+            wire=wire,
+            full_snapshot=full_snapshot,
+            enrich=enrich,
+            enrich_concurrency=enrich_concurrency,
+            enrich_ttl_hours=enrich_ttl_hours,
+            enrich_budget=enrich_budget,
+        )
+
+
+async def _run_pipeline(
+    report: RunReport,
+    session: AsyncSession,
+    kiwoom: AsyncKiwoomClient | None,
+    replay: ArchiveReader | None,
+    archive_writer: ArchiveWriter | None,
+    *,
+    backend: BackendTarget,
+    fetch_workers: int,
+    limit: int | None,
+    chunk_size: int,
+    push_concurrency: int,
+    resume: bool,
+    reconcile: bool,
+    wire: str,
+    full_snapshot: bool,
+    enrich: bool,
+    enrich_concurrency: int,
+    enrich_ttl_hours: float,
+    enrich_budget: float,
+) -> int:
+    metrics = report.metrics
+
+    async def check_backend_health() -> bool:
+        with metrics.phase("health_check"):
+            return await _check_backend_health(session, backend.health_url)
+
+    # The health probe always overlaps the market fetches: a task costs nothing here.
+    health_task = None if report.dry_run else asyncio.ensure_future(check_backend_health())
+    report.start_fetch(fetch_workers)
+    source = replay if replay is not None else kiwoom
+    assert source is not None
+    stream = AsyncMarketStream(
+        source, fetch_workers, on_market_done=report.market_done, archive=archive_writer
+    )
+    enricher = load_enricher(
+        report,
+        enrich,
+        kiwoom.fetch_stock_info if kiwoom is not None else None,
+        enrich_concurrency,
+        enrich_ttl_hours,
+        enrich_budget,
+        fetch_errors=(*Enricher.FETCH_ERRORS, *HTTP_ERRORS),
+    )
+
+    try:
+        pages = _aclosing(_unique_pages(stream, limit, report, enricher))
+        if report.dry_run:
+            sample: list[dict[str, Any]] = []
+            async with pages as items_by_page:
+                async for items in items_by_page:
+                    sample.extend(items[: 3 - len(sample)])
+            return report.dry_run_done(sample)
+
+        assert health_task is not None
+        if not await health_task:
+            return report.backend_down(backend.api_base)
+
+        upsert_url = backend.upsert_url
+        upsert_headers = backend.upsert_headers()
+        cache_dir = resolve_bridge_cache_dir()
+        snapshot = SnapshotStore.for_target(cache_dir, upsert_url).load()
+        reconciled: StockBatch | None = None
+
+        if reconcile:
+            reconciled = StockBatch()
+            async with pages as items_by_page:
+                async for items in items_by_page:
+                    for item in items:
+                        reconciled.append(item)
+            manifest_url = backend.manifest_url
+            manifest_headers = backend.manifest_headers()
+            try:
+                manifest = await _backend_json(
+                    session, "GET", manifest_url, 30, headers=manifest_headers
+                )
+                if manifest.get("algorithm") != MANIFEST_ALGORITHM:
+                    return report.manifest_mismatch(manifest.get("algorithm"))
+                entries, differing = reconcile_entries(
+                    reconciled, manifest.get("markets") or {}, None
+                )
+                if differing:
+                    detail = await _backend_json(
+                        session,
+                        "GET",
+                        manifest_url,
+                        30,
+                        headers=manifest_headers,
+                        params=[*(("markets", market) for market in differing), ("codes", "1")],
+                    )
+                    merge_backend_codes(entries, detail.get("codes") or {})
+            except HTTP_ERRORS as exc:
+                status_code = getattr(getattr(exc, "response", None), "status_code", None)
+                return report.manifest_failed(manifest_url, status_code)
+            # The backend is the source of truth: replace the local snapshot entirely.
+            snapshot.entries = entries
+            report.reconciled(differing)
+
+        delta = snapshot.stream_diff((), full=report.full)
+
+        checkpoint = open_checkpoint(cache_dir, upsert_url, resume)
+
+        async def post_chunk(chunk: StockBatch) -> dict[str, Any]:
+            headers = with_idempotency_key(upsert_headers)
+            if wire == "ndjson":
+                headers.update(NDJSON_HEADERS)
+                return await _backend_json(
+                    session, "POST", upsert_url, 30, headers=headers, data=encode_ndjson(chunk)
+                )
+            return await _backend_json(
+                session,
+                "POST",
+                upsert_url,
+                30,
+                headers=headers,
+                data=encode_json_body({"items": chunk}),
+            )
+
+        pusher = AsyncChunkPusher(
+            post_chunk,
+            chunk_size=chunk_size,
+            max_in_flight=push_concurrency,
+            checkpoint=checkpoint,
+            on_chunk=report.chunk_done,
+        )
+        try:
+            try:
+                if reconciled is not None:
+                    await pusher.add(delta.select(reconciled))
+                else:
+                    async with pages as items_by_page:
+                        async for items in items_by_page:
+                            if not await pusher.add(delta.select(items)):
+                                break
+            except BaseException:
+                # Like push_in_chunks: chunks in flight still finish and get checkpointed.
+                await pusher.wait()
+                raise
+            result: dict[str, Any] = await pusher.finish()
+            removed_codes, removal_body = plan_removals(
+                report,
+                delta,
+                result,
+                limit=limit,
+                markets=stream.markets.values(),
+                replay=replay,
+                full_snapshot=full_snapshot,
+            )
+            removal = None
+            if removal_body is not None:
+                with metrics.phase("upsert"):
+                    removal = await _backend_json(
+                        session,
+                        "POST",
+                        upsert_url,
+                        30,
+                        headers=with_idempotency_key(upsert_headers),
+                        data=encode_json_body(removal_body),
+                    )
+            commit_push(report, snapshot, delta, result, removed_codes, removal)
+        except HTTP_ERRORS as exc:
+            status_code = getattr(getattr(exc, "response", None), "status_code", None)
+            return report.upsert_failed(upsert_url, status_code, checkpoint)
+    except KiwoomFetchError as exc:
+        return report.failed(1, f"Failed to fetch Kiwoom stock list: {exc}", "fetch_failed")
+    finally:
+        await stream.aclose()
+        if health_task is not None and not health_task.done():
+            health_task.cancel()
+        if enricher is not None:
+            enricher.cache.save()
+        metrics.detach()
+        report.commit_archive(archive_writer)
+
+    return report.finish(0)
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from .jsonstream import iter_list_records
+from .kiwoom import LIST_KEYS, PageStats
+from .storage import read_json_file, write_private_file
+
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_VERSION = 1
+LATEST_RUN = "latest"
+
+
+def resolve_archive_dir(cache_dir: Path) -> Path:
+    return cache_dir / ARCHIVE_DIRNAME
+
+
+def _object_path(root: Path, digest: str) -> Path:
+    return root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+
+def _manifest_path(root: Path, run_id: str) -> Path:
+    return root / "runs" / f"{run_id}.json"
+
+
+def list_runs(root: Path) -> list[str]:
+    """Archived run ids, oldest first (ids are UTC timestamps)."""
+    return sorted(path.stem for path in (root / "runs").glob("*.json"))
+
+
+class ArchiveWriter:
+    """Store every raw ka10099 response body of one sync run.
+
+    Bodies are gzip-compressed and content-addressed by the SHA-256 of the raw bytes, so
+    pages that did not change since an earlier run are stored once. The run manifest
+    lists the page objects per ``mrkt_tp`` in fetch order and is written by ``commit``.
+    ``add_page`` is safe to call from concurrent market fetches.
+    """
+
+    def __init__(self, root: Path, run_id: str | None = None) -> None:
+        self.root = root
+        self.created_at = datetime.now(timezone.utc)
+        self.run_id = run_id or self._new_run_id()
+        self.markets: dict[str, list[dict[str, Any]]] = {}
+        self.pages = 0
+        self.bytes = 0
+        self.new_objects = 0
+        self._lock = threading.Lock()
+
+    def _new_run_id(self) -> str:
+        base = self.created_at.strftime("%Y%m%dT%H%M%SZ")
+        run_id, suffix = base, 1
+        while _manifest_path(self.root, run_id).exists():
+            suffix += 1
+            run_id = f"{base}-{suffix}"
+        return run_id
+
+    def add_page(self, mrkt_tp: str, body: bytes, next_key: str | None) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        path = _object_path(self.root, digest)
+        created = not path.exists()
+        if created:
+            write_private_file(path, gzip.compress(body, compresslevel=6, mtime=0))
+        with self._lock:
+            self.markets.setdefault(str(mrkt_tp), []).append(
+                {"object": digest, "bytes": len(body), "next_key": next_key}
+            )
+            self.pages += 1
+            self.bytes += len(body)
+            self.new_objects += int(created)
+        return digest
+
+    def commit(self) -> Path:
+        """Write the run manifest. A market is complete when its last page had no next key."""
+        with self._lock:
+            document = {
+                "version": ARCHIVE_VERSION,
+                "run_id": self.run_id,
+                "created_at": self.created_at.replace(microsecond=0).isoformat(),
+                "markets": {
+                    mrkt_tp: {"complete": pages[-1]["next_key"] is None, "pages": list(pages)}
+                    for mrkt_tp, pages in sorted(self.markets.items())
+                },
+            }
+        path = _manifest_path(self.root, self.run_id)
+        write_private_file(path, json.dumps(document, ensure_ascii=False, indent=2))
+        return path
+
+
+class ArchiveReader:
+    """Replay an archived run through the ``KiwoomClient.iter_stock_list_pages`` interface.
+
+    Pages are parsed exactly like live responses, so a replay is a reproducible,
+    network-free stand-in for the Kiwoom fetch.
+    """
+
+    def __init__(self, root: Path, manifest: dict[str, Any]) -> None:
+        self.root = root
+        self.run_id = str(manifest["run_id"])
+        self.markets: dict[str, dict[str, Any]] = manifest["markets"]
+
+    @classmethod
+    def open(cls, root: Path, run: str) -> ArchiveReader:
+        """Load run ``run`` (or the newest one for ``latest``); ValueError when unusable."""
+        run_id = run
+        if run == LATEST_RUN:
+            runs = list_runs(root)
+            if not runs:
+                raise ValueError(f"No archived runs in {root}. Archive one with sync --archive.")
+            run_id = runs[-1]
+        manifest = read_json_file(_manifest_path(root, run_id))
+        if not isinstance(manifest, dict) or not isinstance(manifest.get("markets"), dict):
+            raise ValueError(f"Archived run {run_id!r} not found in {root / 'runs'}")
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(
+                f"Archived run {run_id!r} has version={manifest.get('version')}, "
+                f"expected {ARCHIVE_VERSION}"
+            )
+        return cls(root, manifest)
+
+    def is_complete(self, mrkt_tp: str) -> bool:
+        return bool((self.markets.get(str(mrkt_tp)) or {}).get("complete"))
+
+    def read_body(self, digest: str) -> bytes:
+        try:
+            body = gzip.decompress(_object_path(self.root, digest).read_bytes())
+        except (OSError, EOFError) as exc:
+            raise ValueError(f"Archived page {digest} is unreadable: {exc}") from exc
+        if hashlib.sha256(body).hexdigest() != digest:
+            raise ValueError(f"Archived page {digest} does not match its hash")
+        return body
+
+    def iter_stock_list_pages(
+        self, mrkt_tp: str, stats: PageStats | None = None
+    ) -> Iterator[list[dict[str, Any]]]:
+        for page in (self.markets.get(str(mrkt_tp)) or {}).get("pages") or []:
+            body = self.read_body(page["object"])
+            records = list(iter_list_records([body], LIST_KEYS))
+            if stats is not None:
+                stats.pages += 1
+                stats.bytes += len(body)
+            yield records
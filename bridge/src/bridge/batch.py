@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import gzip
+import json
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, overload
+
+# Backend upsert item fields, in wire order.
+FIELDS = (
+    "code",
+    "name_kr",
+    "name_en",
+    "market",
+    "security_type",
+    "mrkt_tp_raw",
+    "market_code_raw",
+    "category_l1",
+    "category_l2",
+    "is_active",
+    "listed_date",
+    "delisted_date",
+)
+# Low-cardinality string fields stored as small integer codes into a shared vocabulary.
+CATEGORY_FIELDS = (
+    "market",
+    "security_type",
+    "mrkt_tp_raw",
+    "market_code_raw",
+    "category_l1",
+    "category_l2",
+)
+
+_encode_str = json.encoder.encode_basestring  # type: ignore[attr-defined]
+# One row of FIELDS as compact JSON; every argument is already JSON-encoded text.
+_ROW_FORMAT = (
+    "{{" + ",".join(f'"{name}":{{{position}}}' for position, name in enumerate(FIELDS)) + "}}"
+).format
+
+
+class Vocabulary:
+    """Append-only string table; code 0 is ``None``. Shared by batches sliced from each other."""
+
+    __slots__ = ("values", "encoded", "_codes")
+
+    def __init__(self) -> None:
+        self.values: list[str | None] = [None]
+        self.encoded: list[str] = ["null"]
+        self._codes: dict[str | None, int] = {None: 0}
+
+    def code(self, value: Any) -> int:
+        found = self._codes.get(value)
+        if found is not None:
+            return found
+        text = str(value)
+        found = self._codes.get(text)
+        if found is None:
+            found = len(self.values)
+            self.values.append(text)
+            self.encoded.append(_encode_str(text))
+            self._codes[text] = found
+        return found
+
+
+def _date_to_int(value: Any) -> int:
+    """``YYYY-MM-DD`` (or a date) -> ``YYYYMMDD``; 0 for None/unparseable."""
+    if value is None:
+        return 0
+    text = str(value)
+    if len(text) != 10 or text[4] != "-" or text[7] != "-":
+        return 0
+    try:
+        return int(text[0:4]) * 10000 + int(text[5:7]) * 100 + int(text[8:10])
+    except ValueError:
+        return 0
+
+
+def _int_to_date(value: int) -> str | None:
+    if not value:
+        return None
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+class StockBatch(Sequence):
+    """Columnar batch of normalized stock items.
+
+    Codes and names are kept as plain string columns, category fields as ``array('I')``
+    codes into interned vocabularies, ``is_active`` as a ``bytearray`` and dates as
+    ``array('I')`` of ``YYYYMMDD`` (0 = null). Indexing and iteration materialize item
+    dicts on demand, so a batch can stand in for a list of items; ``encode_json`` and
+    ``encode_ndjson`` write the wire formats straight from the columns.
+
+    It is a storage format for items held in memory (upsert chunks, the ``--reconcile``
+    buffer), not a pipeline type: normalization, enrichment and the delta still pass one
+    dict per item, ``append`` copies it into the columns, and iterating a batch (the
+    reconcile diff) builds the dicts again.
+    """
+
+    __slots__ = (
+        "codes",
+        "names_kr",
+        "names_en",
+        "categories",
+        "vocabularies",
+        "is_active",
+        "listed_dates",
+        "delisted_dates",
+        "_positions",
+    )
+
+    def __init__(
+        self,
+        items: Iterable[dict[str, Any]] = (),
+        vocabularies: dict[str, Vocabulary] | None = None,
+    ) -> None:
+        self.codes: list[str] = []
+        self.names_kr: list[str] = []
+        self.names_en: list[str | None] = []
+        self.vocabularies = vocabularies or {name: Vocabulary() for name in CATEGORY_FIELDS}
+        self.categories: dict[str, array] = {name: array("I") for name in CATEGORY_FIELDS}
+        self.is_active = bytearray()
+        self.listed_dates = array("I")
+        self.delisted_dates = array("I")
+        self._positions: dict[str, int] | None = None
+        for item in items:
+            self.append(item)
+
+    def append(self, item: dict[str, Any]) -> None:
+        code = str(item["code"])
+        if self._positions is not None:
+            self._positions.setdefault(code, len(self.codes))
+        self.codes.append(code)
+        self.names_kr.append(str(item["name_kr"]))
+        name_en = item.get("name_en")
+        self.names_en.append(None if name_en is None else str(name_en))
+        for name in CATEGORY_FIELDS:
+            self.categories[name].append(self.vocabularies[name].code(item.get(name)))
+        self.is_active.append(1 if item.get("is_active", True) else 0)
+        self.listed_dates.append(_date_to_int(item.get("listed_date")))
+        self.delisted_dates.append(_date_to_int(item.get("delisted_date")))
+
+    def _index(self) -> dict[str, int]:
+        if self._positions is None:
+            positions: dict[str, int] = {}
+            for position, code in enumerate(self.codes):
+                positions.setdefault(code, position)
+            self._positions = positions
+        return self._positions
+
+    def has_code(self, code: str) -> bool:
+        return code in self._index()
+
+    def add_unique(self, item: dict[str, Any]) -> bool:
+        """Append unless the code is already present (first seen wins)."""
+        if str(item["code"]) in self._index():
+            return False
+        self.append(item)
+        return True
+
+    def clear(self) -> None:
+        self.codes.clear()
+        self.names_kr.clear()
+        self.names_en.clear()
+        for column in self.categories.values():
+            del column[:]
+        self.is_active.clear()
+        del self.listed_dates[:]
+        del self.delisted_dates[:]
+        self._positions = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _row(self, position: int) -> dict[str, Any]:
+        def category(name: str) -> str | None:
+            return self.vocabularies[name].values[self.categories[name][position]]
+
+        return {
+            "code": self.codes[position],
+            "name_kr": self.names_kr[position],
+            "name_en": self.names_en[position],
+            "market": category("market"),
+            "security_type": category("security_type"),
+            "mrkt_tp_raw": category("mrkt_tp_raw"),
+            "market_code_raw": category("market_code_raw"),
+            "category_l1": category("category_l1"),
+            "category_l2": category("category_l2"),
+            "is_active": bool(self.is_active[position]),
+            "listed_date": _int_to_date(self.listed_dates[position]),
+            "delisted_date": _int_to_date(self.delisted_dates[position]),
+        }
+
+    @overload
+    def __getitem__(self, index: int) -> dict[str, Any]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> StockBatch: ...
+
+    def __getitem__(self, index: int | slice) -> dict[str, Any] | StockBatch:
+        if isinstance(index, slice):
+            part = StockBatch(vocabularies=self.vocabularies)
+            part.codes = self.codes[index]
+            part.names_kr = self.names_kr[index]
+            part.names_en = self.names_en[index]
+            part.categories = {name: column[index] for name, column in self.categories.items()}
+            part.is_active = self.is_active[index]
+            part.listed_dates = self.listed_dates[index]
+            part.delisted_dates = self.delisted_dates[index]
+            return part
+        position = range(len(self.codes))[index]
+        return self._row(position)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        for position in range(len(self.codes)):
+            yield self._row(position)
+
+    def _encoded_rows(self) -> Iterator[str]:
+        def strings(column: list[str]) -> Iterator[str]:
+            return map(_encode_str, column)
+
+        def nullable(column: list[str | None]) -> list[str]:
+            return ["null" if value is None else _encode_str(value) for value in column]
+
+        def category(name: str) -> list[str]:
+            encoded = self.vocabularies[name].encoded
+            return [encoded[code] for code in self.categories[name]]
+
+        def dates(column: array) -> list[str]:
+            return ["null" if not value else f'"{_int_to_date(value)}"' for value in column]
+
+        return map(
+            _ROW_FORMAT,
+            strings(self.codes),
+            strings(self.names_kr),
+            nullable(self.names_en),
+            *(category(name) for name in CATEGORY_FIELDS),
+            ["true" if flag else "false" for flag in self.is_active],
+            dates(self.listed_dates),
+            dates(self.delisted_dates),
+        )
+
+    def encode_json(self) -> str:
+        """The items as a compact JSON array (same text as ``json.dumps`` of the dicts)."""
+        return "[" + ",".join(self._encoded_rows()) + "]"
+
+    def encode_ndjson(self) -> bytes:
+        """Gzip-compressed NDJSON, one item per line."""
+        body = "".join(row + "\n" for row in self._encoded_rows())
+        return gzip.compress(body.encode("utf-8"))
+
+    def summary_counts(self) -> tuple[int, int, dict[str, int]]:
+        """``(listed_date_parsed, category_l1_missing, per_market_counts)`` from the columns."""
+        listed = len(self.listed_dates) - self.listed_dates.count(0)
+        category_missing = self.categories["category_l1"].count(0)
+        markets = self.vocabularies["market"].values
+        per_market = {
+            str(markets[code]): count for code, count in Counter(self.categories["market"]).items()
+        }
+        return listed, category_missing, per_market
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+import requests
+
+from .metrics import percentile, request_phase
+from .standin import StandInConfig, StandInServer
+
+
+def _summarize_ms(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+class PhaseRecorder:
+    """requests response hook collecting latency (time to response headers) per phase."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[int, int]] = {}
+        self.pushed = 0
+
+    def __call__(self, response: requests.Response, *args: Any, **kwargs: Any) -> None:
+        phase = request_phase(response)
+        pushed = 0
+        if phase == "backend_stocks:upsert" and response.ok:
+            try:
+                pushed = int(response.json().get("received", 0))
+            except (ValueError, AttributeError, TypeError):
+                pushed = 0
+        with self._lock:
+            self.latencies.setdefault(phase, []).append(response.elapsed.total_seconds())
+            counts = self.statuses.setdefault(phase, {})
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+            self.pushed += pushed
+
+    def phases(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {
+                phase: {
+                    **_summarize_ms(values),
+                    "status": {str(code): n for code, n in sorted(self.statuses[phase].items())},
+                }
+                for phase, values in sorted(self.latencies.items())
+            }
+
+
+@contextlib.contextmanager
+def _environ(overrides: Mapping[str, str]) -> Iterator[None]:
+    saved = {key: os.environ.get(key) for key in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def run_benchmark(
+    config: StandInConfig,
+    runs: int = 3,
+    dry_run: bool = False,
+    workers: int = 1,
+    chunk_size: int = 500,
+    push_concurrency: int = 1,
+    wire: str = "json",
+    verbose: bool = False,
+) -> dict[str, Any]:
+    """Run ``sync_stocks`` end to end against a local Kiwoom stand-in ``runs`` times.
+
+    Every run starts from an empty cache directory (no token cache, snapshot or
+    checkpoint), so each one fetches and pushes the whole synthetic universe. Pushes go
+    to ``BACKEND_API_BASE`` unless ``dry_run``.
+    """
+    from .kiwoom import create_session
+    from .sync import pool_settings, sync_stocks
+
+    recorder = PhaseRecorder()
+    run_seconds: list[float] = []
+    exit_codes: list[int] = []
+    records = sum(config.market_sizes.values())
+
+    with StandInServer(config) as server:
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory(prefix="bridge-bench-") as cache_dir:
+                overrides = {
+                    "KIWOOM_HOST_URL": server.url,
+                    "KIWOOM_APP_KEY": "standin-app-key",
+                    "KIWOOM_APP_SECRET": "standin-app-secret",
+                    "BRIDGE_CACHE_DIR": cache_dir,
+                    "KIWOOM_TOKEN_CACHE_DIR": cache_dir,
+                }
+                session = create_session(pool_settings(workers, push_concurrency))
+                session.hooks["response"].append(recorder)
+                output = sys.stdout if verbose else io.StringIO()
+                with _environ(overrides), contextlib.redirect_stdout(output):
+                    started = time.perf_counter()
+                    code = sync_stocks(
+                        dry_run=dry_run,
+                        limit=None,
+                        verbose=verbose,
+                        workers=workers,
+                        chunk_size=chunk_size,
+                        push_concurrency=push_concurrency,
+                        resume=False,
+                        full=True,
+                        wire=wire,
+                        session=session,
+                    )
+                    run_seconds.append(time.perf_counter() - started)
+                session.close()
+                exit_codes.append(int(code))
+        served = server.stats.as_dict()
+
+    throughput = [records / seconds for seconds in run_seconds if seconds > 0]
+    return {
+        "runs": runs,
+        "records": records,
+        "exit_codes": exit_codes,
+        "run": _summarize_ms(run_seconds),
+        "records_per_s": {
+            "p50": round(percentile(throughput, 50), 1),
+            "min": round(min(throughput), 1) if throughput else 0.0,
+        },
+        "phases": recorder.phases(),
+        "pushed": recorder.pushed,
+        "kiwoom": served,
+    }
@@ -5,6 +5,16 @@ from typing import Optional
 
 def _add_sync_subcommand(subparsers: argparse._SubParsersAction, name: str) -> None:
     sync_parser = subparsers.add_parser(name, help="Sync stock master data to backend")
+    _add_sync_options(sync_parser)
+    sync_parser.add_argument(
+        "--from-archive",
+        metavar="RUN",
+        default=None,
+        help="Replay an archived run (run id or 'latest') instead of calling Kiwoom",
+    )
+
+
+def _add_sync_options(sync_parser: argparse.ArgumentParser) -> None:
     sync_parser.add_argument(
         "--dry-run",
         "--no-push",
@@ -14,6 +24,195 @@ def _add_sync_subcommand(subparsers: argparse._SubParsersAction, name: str) -> N
     )
     sync_parser.add_argument("--limit", type=int, default=None, help="Limit normalized items")
     sync_parser.add_argument("--verbose", action="store_true", help="Verbose per-market logs")
+    sync_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Concurrent market fetches (1 = sequential; >1 also overlaps the health check)",
+    )
+    sync_parser.add_argument(
+        "--chunk-size", type=int, default=500, help="Items per backend upsert request"
+    )
+    sync_parser.add_argument(
+        "--push-concurrency",
+        type=int,
+        default=1,
+        help="Maximum concurrent in-flight upsert requests",
+    )
+    sync_parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="Discard the upsert checkpoint and push every chunk again",
+    )
+    sync_parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Push every record, ignoring the local snapshot of the last pushed state",
+    )
+    sync_parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="Rebuild the local snapshot from the backend hash manifest before diffing",
+    )
+    sync_parser.add_argument(
+        "--full-snapshot",
+        action="store_true",
+        help="Send every listed code of each fully fetched market; the backend deactivates "
+        "codes it no longer lists",
+    )
+    sync_parser.add_argument(
+        "--wire",
+        choices=["json", "ndjson"],
+        default="json",
+        help="Upsert body format: JSON object or gzip-compressed NDJSON stream",
+    )
+    sync_parser.add_argument(
+        "--engine",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="Concurrency engine: worker threads over requests, or one event loop over aiohttp "
+        "(needs the 'async' extra)",
+    )
+    sync_parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        default=None,
+        help="Write per-phase timings, HTTP counters and the summary as JSON after each run",
+    )
+    sync_parser.add_argument(
+        "--metrics-textfile",
+        metavar="PATH",
+        default=None,
+        help="Write the same metrics in Prometheus text format (node_exporter textfile, *.prom)",
+    )
+    sync_parser.add_argument(
+        "--enrich",
+        action="store_true",
+        help=(
+            "Fill missing name_en/category_l1 from per-code Kiwoom details (ka10001). "
+            "ka10001 documents no such fields, so KIWOOM_DETAIL_FIELDS must map each to "
+            "the response key to read (e.g. name_en=<key>)"
+        ),
+    )
+    sync_parser.add_argument(
+        "--enrich-concurrency",
+        type=int,
+        default=4,
+        help="Concurrent detail requests (also paced by the ka10001 rate limit)",
+    )
+    sync_parser.add_argument(
+        "--enrich-ttl-hours",
+        type=float,
+        default=168.0,
+        help="Refetch a code's cached details after this many hours",
+    )
+    sync_parser.add_argument(
+        "--enrich-budget",
+        type=float,
+        default=300.0,
+        help="Seconds after which no new detail requests start (0 = no limit)",
+    )
+    sync_parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Store every raw ka10099 response (gzip, content-addressed) for offline replay",
+    )
+
+
+def _add_serve_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    serve_parser = subparsers.add_parser(
+        "serve", help="Run sync on a schedule with a warm Kiwoom client and a status endpoint"
+    )
+    _add_sync_options(serve_parser)
+    serve_parser.add_argument(
+        "--interval",
+        type=float,
+        default=600.0,
+        help="Seconds between runs during market hours",
+    )
+    serve_parser.add_argument(
+        "--off-hours-interval",
+        type=float,
+        default=3600.0,
+        help="Seconds between runs outside market hours (0 = only at the next market open)",
+    )
+    serve_parser.add_argument(
+        "--market-hours", default="09:00-15:30", help="KRX market hours in KST, HH:MM-HH:MM"
+    )
+    serve_parser.add_argument("--status-host", default="127.0.0.1")
+    serve_parser.add_argument(
+        "--status-port", type=int, default=8901, help="Status endpoint port (0 = disabled)"
+    )
+    serve_parser.add_argument(
+        "--max-runs", type=int, default=None, help="Exit after this many runs (default: forever)"
+    )
+
+
+def _add_standin_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--universe",
+        default="0=2400,10=1800,50=120",
+        help="Synthetic records per market, as mrkt_tp=count pairs",
+    )
+    parser.add_argument("--page-size", type=int, default=500, help="Records per Kiwoom page")
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="Added latency per Kiwoom request"
+    )
+    parser.add_argument(
+        "--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429"
+    )
+    parser.add_argument(
+        "--rate-5xx", type=float, default=0.0, help="Fraction of requests answered with 503"
+    )
+    parser.add_argument("--retry-after", default="0", help="Retry-After header sent with 429s")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for fault injection")
+
+
+def _add_bench_subcommands(subparsers: argparse._SubParsersAction) -> None:
+    standin_parser = subparsers.add_parser(
+        "standin", help="Serve a local Kiwoom stand-in with a synthetic universe"
+    )
+    _add_standin_options(standin_parser)
+    standin_parser.add_argument("--host", default="127.0.0.1")
+    standin_parser.add_argument("--port", type=int, default=8900)
+
+    bench_parser = subparsers.add_parser(
+        "bench", help="Benchmark sync end to end against a local Kiwoom stand-in"
+    )
+    _add_standin_options(bench_parser)
+    bench_parser.add_argument("--runs", type=int, default=3, help="Number of sync runs")
+    bench_parser.add_argument(
+        "--dry-run", action="store_true", help="Skip the backend push (Kiwoom side only)"
+    )
+    bench_parser.add_argument("--workers", type=int, default=1)
+    bench_parser.add_argument("--chunk-size", type=int, default=500)
+    bench_parser.add_argument("--push-concurrency", type=int, default=1)
+    bench_parser.add_argument("--wire", choices=["json", "ndjson"], default="json")
+    bench_parser.add_argument("--verbose", action="store_true", help="Show sync output")
+
+
+def _add_microbench_subcommand(subparsers: argparse._SubParsersAction) -> None:
+    parser = subparsers.add_parser(
+        "microbench", help="Time normalization/dedup hot paths on synthetic ka10099 records"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000,10000,100000",
+        help="Comma-separated record counts (up to 1000000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of repetitions per case")
+    parser.add_argument(
+        "--case", action="append", dest="cases", help="Only run this case (repeatable)"
+    )
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--save", help="Write results JSON here (e.g. to refresh the baseline)")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown vs baseline before a case counts as regressed (0.25 = 25%%)",
+    )
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -21,26 +220,237 @@ def build_parser() -> argparse.ArgumentParser:
     subparsers = parser.add_subparsers(dest="command")
     _add_sync_subcommand(subparsers, "sync")
     _add_sync_subcommand(subparsers, "sync-stocks")
+    _add_serve_subcommand(subparsers)
+    _add_bench_subcommands(subparsers)
+    _add_microbench_subcommand(subparsers)
     return parser
 
 
+def _standin_config(args: argparse.Namespace) -> object:
+    from .standin import StandInConfig, parse_market_sizes
+
+    return StandInConfig(
+        market_sizes=parse_market_sizes(args.universe),
+        page_size=args.page_size,
+        latency=args.latency_ms / 1000,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def _sync_options_error(args: argparse.Namespace) -> Optional[str]:
+    if args.limit is not None and args.limit < 1:
+        return "--limit must be >= 1"
+    for flag, value in (
+        ("--workers", args.workers),
+        ("--chunk-size", args.chunk_size),
+        ("--push-concurrency", args.push_concurrency),
+        ("--enrich-concurrency", args.enrich_concurrency),
+    ):
+        if value < 1:
+            return f"{flag} must be >= 1"
+    if args.enrich_ttl_hours <= 0:
+        return "--enrich-ttl-hours must be > 0"
+    if args.enrich_budget < 0:
+        return "--enrich-budget must be >= 0"
+    if args.archive and getattr(args, "from_archive", None):
+        return "--archive cannot be combined with --from-archive"
+    return None
+
+
+def _sync_options(args: argparse.Namespace) -> dict:
+    return {
+        "dry_run": args.dry_run,
+        "limit": args.limit,
+        "verbose": args.verbose,
+        "workers": args.workers,
+        "chunk_size": args.chunk_size,
+        "push_concurrency": args.push_concurrency,
+        "resume": args.resume,
+        "full": args.full,
+        "reconcile": args.reconcile,
+        "wire": args.wire,
+        "full_snapshot": args.full_snapshot,
+        "engine": args.engine,
+        "metrics_json": args.metrics_json,
+        "metrics_textfile": args.metrics_textfile,
+        "archive": args.archive,
+        "from_archive": getattr(args, "from_archive", None),
+        "enrich": args.enrich,
+        "enrich_concurrency": args.enrich_concurrency,
+        "enrich_ttl_hours": args.enrich_ttl_hours,
+        "enrich_budget": args.enrich_budget,
+    }
+
+
+def _serve(args: argparse.Namespace) -> int:
+    import signal
+    import threading
+
+    from .daemon import Schedule, StatusServer, SyncDaemon, parse_market_hours
+    from .sync import create_kiwoom_client, sync_lock, sync_stocks
+
+    if args.interval <= 0:
+        print("--interval must be > 0")
+        return 2
+    if args.max_runs is not None and args.max_runs < 1:
+        print("--max-runs must be >= 1")
+        return 2
+    try:
+        market_open, market_close = parse_market_hours(args.market_hours)
+    except ValueError as exc:
+        print(str(exc))
+        return 2
+
+    schedule = Schedule(
+        market_interval=args.interval,
+        off_hours_interval=args.off_hours_interval,
+        market_open=market_open,
+        market_close=market_close,
+    )
+    fetch_workers = min(args.workers, 3)
+    enrich_concurrency = args.enrich_concurrency if args.enrich else 0
+    daemon = SyncDaemon(
+        schedule,
+        client_factory=lambda: create_kiwoom_client(
+            fetch_workers, args.push_concurrency, enrich_concurrency=enrich_concurrency
+        ),
+        run_sync=sync_stocks,
+        lock=sync_lock(),
+        sync_options=_sync_options(args),
+    )
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    status_server = None
+    if args.status_port:
+        status_server = StatusServer(daemon.status, args.status_host, args.status_port).start()
+        print(f"status endpoint {status_server.url}/status", flush=True)
+    try:
+        daemon.serve(stop, max_runs=args.max_runs)
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        if status_server is not None:
+            status_server.close()
+    last_run = daemon.status.last_run
+    return (last_run.exit_code or 0) if last_run is not None else 0
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
 
-    if args.command in {"sync", "sync-stocks"}:
-        if args.limit is not None and args.limit < 1:
-            print("--limit must be >= 1")
+    if args.command in {"sync", "sync-stocks", "serve"}:
+        error = _sync_options_error(args)
+        if error:
+            print(error)
             return 2
 
         from .config import load_bridge_env_files
 
         load_bridge_env_files()
 
+        if args.command == "serve":
+            return _serve(args)
+
         # Import lazily so --help never loads requests/dotenv/Kiwoom modules.
-        from .sync import sync_stocks
+        from .sync import sync_lock, sync_stocks
+
+        lock = sync_lock()
+        try:
+            acquired = lock.acquire()
+        except OSError as exc:
+            print(f"Cannot open sync lock {lock.path}: {exc}")
+            return 5
+        if not acquired:
+            print(f"Another sync is running (lock {lock.path}); not starting a second one")
+            return 5
+        try:
+            return int(sync_stocks(**_sync_options(args)))
+        finally:
+            lock.release()
+
+    if args.command in {"standin", "bench"}:
+        if args.page_size < 1:
+            print("--page-size must be >= 1")
+            return 2
+        try:
+            config = _standin_config(args)
+        except ValueError as exc:
+            print(str(exc))
+            return 2
+
+        if args.command == "standin":
+            from .standin import StandInServer
+
+            server = StandInServer(config, host=args.host, port=args.port)
+            print(f"Kiwoom stand-in listening on {server.url} (Ctrl+C to stop)")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.close()
+            return 0
+
+        if args.runs < 1:
+            print("--runs must be >= 1")
+            return 2
+        import json
+
+        from .bench import run_benchmark
+
+        report = run_benchmark(
+            config,
+            runs=args.runs,
+            dry_run=args.dry_run,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            push_concurrency=args.push_concurrency,
+            wire=args.wire,
+            verbose=args.verbose,
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if all(code == 0 for code in report["exit_codes"]) else 1
+
+    if args.command == "microbench":
+        try:
+            sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        except ValueError:
+            sizes = []
+        if not sizes or any(size < 1 or size > 1_000_000 for size in sizes):
+            print("--sizes must be comma-separated counts between 1 and 1000000")
+            return 2
+        if args.repeat < 1:
+            print("--repeat must be >= 1")
+            return 2
+
+        from pathlib import Path
+
+        from .microbench import (
+            compare_results,
+            format_rows,
+            load_baseline,
+            run_microbench,
+            save_results,
+        )
 
-        return int(sync_stocks(dry_run=args.dry_run, limit=args.limit, verbose=args.verbose))
+        baseline = None
+        if args.baseline:
+            baseline = load_baseline(Path(args.baseline))
+            if baseline is None:
+                print(f"Baseline not found or unreadable: {args.baseline}")
+                return 2
+        results = run_microbench(sizes, repeat=args.repeat, cases=args.cases)
+        rows = compare_results(results, baseline or {}, tolerance=args.tolerance)
+        for line in format_rows(rows):
+            print(line)
+        if args.save:
+            save_results(Path(args.save), results)
+            print(f"saved {len(results)} results to {args.save}")
+        return 1 if any(row.get("regressed") for row in rows) else 0
 
     parser.print_help()
     return 0
@@ -54,6 +54,19 @@ def load_bridge_env_files(
         load_dotenv(dotenv_path=bridge_path, override=False)
 
 
+def resolve_bridge_cache_dir(env: Mapping[str, str] | None = None) -> Path:
+    """Local state directory for bridge caches and checkpoints."""
+    source = os.environ if env is None else env
+
+    explicit = (source.get("BRIDGE_CACHE_DIR") or "").strip()
+    if explicit:
+        return Path(explicit).expanduser()
+
+    base = (source.get("XDG_CACHE_HOME") or "").strip()
+    root = Path(base).expanduser() if base else Path.home() / ".cache"
+    return root / "myquant-bridge"
+
+
 def resolve_kiwoom_config(env: Mapping[str, str] | None = None) -> KiwoomConfig:
     source = os.environ if env is None else env
 
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from datetime import time as dt_time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from .kiwoom import KiwoomClient
+from .storage import FileLock
+from .token_cache import KST
+
+# KRX regular session (KST, weekdays). Holidays are not modelled: a run on a closed day is a
+# cheap no-change sync.
+DEFAULT_MARKET_INTERVAL = 600.0
+DEFAULT_OFF_HOURS_INTERVAL = 3600.0
+
+
+def parse_market_hours(spec: str) -> tuple[dt_time, dt_time]:
+    """``HH:MM-HH:MM`` (KST) -> (open, close)."""
+    try:
+        start, end = (part.strip() for part in spec.split("-"))
+        market_open = dt_time.fromisoformat(start)
+        market_close = dt_time.fromisoformat(end)
+    except ValueError:
+        market_open = market_close = None
+    if market_open is None or market_close is None or market_open >= market_close:
+        raise ValueError(
+            f"Invalid market hours {spec!r}. Expected HH:MM-HH:MM with open before close."
+        )
+    return market_open, market_close
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """Run every ``market_interval`` seconds during market hours (KST, Monday to Friday).
+
+    Outside them, runs are ``off_hours_interval`` apart but never later than the next
+    market open. ``off_hours_interval <= 0`` waits for the open.
+    """
+
+    market_interval: float = DEFAULT_MARKET_INTERVAL
+    off_hours_interval: float = DEFAULT_OFF_HOURS_INTERVAL
+    market_open: dt_time = dt_time(9, 0)
+    market_close: dt_time = dt_time(15, 30)
+
+    def is_market_hours(self, now: datetime) -> bool:
+        local = now.astimezone(KST)
+        return local.weekday() < 5 and self.market_open <= local.time() < self.market_close
+
+    def next_open(self, now: datetime) -> datetime:
+        local = now.astimezone(KST)
+        candidate = datetime.combine(local.date(), self.market_open, tzinfo=KST)
+        if candidate <= local:
+            candidate += timedelta(days=1)
+        while candidate.weekday() >= 5:
+            candidate += timedelta(days=1)
+        return candidate
+
+    def next_delay(self, now: datetime) -> float:
+        """Seconds from ``now`` (aware) until the next run."""
+        if self.is_market_hours(now):
+            return self.market_interval
+        until_open = max(0.0, (self.next_open(now) - now).total_seconds())
+        if self.off_hours_interval <= 0:
+            return until_open
+        return min(self.off_hours_interval, until_open)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "market_hours": f"{self.market_open:%H:%M}-{self.market_close:%H:%M}",
+            "timezone": "Asia/Seoul",
+            "market_interval_s": self.market_interval,
+            "off_hours_interval_s": self.off_hours_interval,
+        }
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.replace(microsecond=0).isoformat() if value is not None else None
+
+
+@dataclass
+class RunRecord:
+    started_at: str
+    finished_at: str | None = None
+    elapsed_ms: int | None = None
+    exit_code: int | None = None
+    skipped: str | None = None
+    summary: dict[str, Any] | None = None
+
+
+class DaemonStatus:
+    """Thread-safe state served by the status endpoint."""
+
+    def __init__(self, schedule: Schedule, clock: Callable[[], datetime]) -> None:
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.schedule = schedule
+        self.state = "starting"
+        self.started_at = clock()
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run: RunRecord | None = None
+        self.last_success_at: datetime | None = None
+        self.next_run_at: datetime | None = None
+
+    def update(self, **fields: Any) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def record(self, run: RunRecord) -> None:
+        with self._lock:
+            self.last_run = run
+            if run.skipped:
+                self.skipped += 1
+                return
+            self.runs += 1
+            if run.exit_code == 0:
+                self.last_success_at = self._clock()
+            else:
+                self.failures += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "started_at": _isoformat(self.started_at),
+                "runs": self.runs,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "last_success_at": _isoformat(self.last_success_at),
+                "next_run_at": _isoformat(self.next_run_at),
+                "schedule": self.schedule.describe(),
+                "last_run": asdict(self.last_run) if self.last_run is not None else None,
+            }
+
+
+class SyncDaemon:
+    """Run ``run_sync`` on a schedule with a warm ``KiwoomClient`` and the sync lock held.
+
+    The client (pooled session, issued token) is created once by ``client_factory`` and
+    passed to every run, so runs skip configuration, token issuance and connection setup.
+    A run is skipped, not queued, while another process holds the lock.
+    """
+
+    def __init__(
+        self,
+        schedule: Schedule,
+        client_factory: Callable[[], KiwoomClient],
+        run_sync: Callable[..., int],
+        lock: FileLock,
+        sync_options: dict[str, Any] | None = None,
+        clock: Callable[[], datetime] | None = None,
+    ) -> None:
+        self.schedule = schedule
+        self.client_factory = client_factory
+        self.run_sync = run_sync
+        self.lock = lock
+        self.sync_options = dict(sync_options or {})
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+        self.status = DaemonStatus(schedule, self._clock)
+        self.client: KiwoomClient | None = None
+
+    def warm(self) -> None:
+        """Build the client and issue the token ahead of the first run (errors are logged)."""
+        try:
+            self.client = self.client_factory()
+            self.client.token()
+        except Exception as exc:
+            print(f"warm-up failed: {exc}", flush=True)
+
+    def run_once(self) -> RunRecord:
+        started = self._clock()
+        run = RunRecord(started_at=_isoformat(started) or "")
+        try:
+            acquired = self.lock.acquire()
+        except OSError as exc:
+            # An unusable lock file fails the run (exit code 5); the loop keeps going.
+            print(f"run failed: cannot open sync lock {self.lock.path}: {exc}", flush=True)
+            run.finished_at = run.started_at
+            run.exit_code = 5
+            self.status.record(run)
+            return run
+        if not acquired:
+            run.skipped = "locked"
+            self.status.record(run)
+            print(f"run skipped: another sync holds {self.lock.path}", flush=True)
+            return run
+
+        self.status.update(state="running")
+        began = time.perf_counter()
+        summary: dict[str, Any] = {}
+        try:
+            if self.client is None:
+                self.client = self.client_factory()
+            code = self.run_sync(**self.sync_options, client=self.client, on_summary=summary.update)
+        except ValueError as exc:
+            print(str(exc), flush=True)
+            code = 2
+        except Exception as exc:
+            print(f"sync crashed: {exc!r}", flush=True)
+            code = 1
+        finally:
+            self.lock.release()
+        run.finished_at = _isoformat(self._clock())
+        run.elapsed_ms = round((time.perf_counter() - began) * 1000)
+        run.exit_code = int(code)
+        run.summary = summary or None
+        self.status.record(run)
+        self.status.update(state="idle")
+        return run
+
+    def serve(self, stop: threading.Event, max_runs: int | None = None) -> None:
+        """Run until ``stop`` is set (or after ``max_runs`` runs, skipped ones included)."""
+        self.warm()
+        attempts = 0
+        while not stop.is_set():
+            run = self.run_once()
+            attempts += 1
+            print(f"run exit_code={run.exit_code} elapsed_ms={run.elapsed_ms}", flush=True)
+            if max_runs is not None and attempts >= max_runs:
+                break
+            now = self._clock()
+            delay = self.schedule.next_delay(now)
+            self.status.update(next_run_at=now + timedelta(seconds=delay))
+            stop.wait(delay)
+        self.status.update(state="stopped", next_run_at=None)
+        if self.client is not None:
+            self.client.close()
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    server: _StatusHTTPServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/status":
+            self._send_json(200, self.server.status.snapshot())
+        elif path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"detail": "not found"})
+
+
+class _StatusHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], status: DaemonStatus) -> None:
+        super().__init__(address, _StatusHandler)
+        self.status = status
+
+
+class StatusServer:
+    """Local JSON endpoint: ``GET /status`` (daemon state and last run) and ``GET /health``."""
+
+    def __init__(self, status: DaemonStatus, host: str = "127.0.0.1", port: int = 0) -> None:
+        self._server = _StatusHTTPServer((host, port), status)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> StatusServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> StatusServer:
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
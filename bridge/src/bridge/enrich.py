@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import requests
+
+from .storage import read_json_file, write_private_file
+
+ENRICH_API_ID = "ka10001"
+ENRICH_CACHE_VERSION = 1
+DEFAULT_ENRICH_CONCURRENCY = 4
+DEFAULT_ENRICH_TTL_HOURS = 168.0
+DEFAULT_ENRICH_BUDGET = 300.0
+# Consecutive detail failures after which no new calls are issued for the rest of the run.
+MAX_CONSECUTIVE_FAILURES = 20
+# ``enrich_async`` marker for a lookup skipped once the budget or failure limit was hit.
+DEFERRED = object()
+
+# Fields a detail lookup can fill. Kiwoom's published ka10001 response (stock basics:
+# stk_cd, stk_nm, cap, flo_stk, per, ...) has no English name or sector field, so the
+# response key for each is not guessed: operators map it in KIWOOM_DETAIL_FIELDS, e.g.
+# "name_en=<key>,category_l1=<key>", from payloads they have checked.
+ENRICH_FIELDS = ("name_en", "category_l1")
+DETAIL_FIELDS_ENV = "KIWOOM_DETAIL_FIELDS"
+
+
+def resolve_detail_fields(env: Mapping[str, str] | None = None) -> dict[str, str]:
+    """Parse ``KIWOOM_DETAIL_FIELDS`` into ``{field: detail response key}``.
+
+    Raises ValueError when it is unset (``--enrich`` needs it), malformed or names a
+    field outside ENRICH_FIELDS.
+    """
+    source = os.environ if env is None else env
+    raw = (source.get(DETAIL_FIELDS_ENV) or "").strip()
+    if not raw:
+        raise ValueError(
+            f"--enrich needs {DETAIL_FIELDS_ENV}: ka10001 has no documented field for "
+            f"{'/'.join(ENRICH_FIELDS)}. Map each field to the detail response key your "
+            "ka10001 payloads carry, e.g. name_en=<key>."
+        )
+    fields: dict[str, str] = {}
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        name, sep, key = (value.strip() for value in part.partition("="))
+        if not sep or name not in ENRICH_FIELDS or not key:
+            raise ValueError(
+                f"Invalid {DETAIL_FIELDS_ENV} entry {part.strip()!r}. Expected comma-separated "
+                f"field=response_key with field one of {', '.join(ENRICH_FIELDS)}."
+            )
+        fields[name] = key
+    return fields
+
+
+def extract_detail_fields(detail: Mapping[str, Any], fields: Mapping[str, str]) -> dict[str, str]:
+    """Non-empty enrichment fields found in one detail response (``fields``: field -> key)."""
+    values: dict[str, str] = {}
+    for name, key in fields.items():
+        value = str(detail.get(key) or "").strip()
+        if value:
+            values[name] = value
+    return values
+
+
+def missing_fields(item: Mapping[str, Any]) -> list[str]:
+    return [name for name in ENRICH_FIELDS if not item.get(name)]
+
+
+class EnrichmentCache:
+    """Per-code detail fields with their fetch time, kept across runs in one JSON file.
+
+    ``ttl`` only decides when a code is fetched again: expired entries are still
+    returned (``fresh=False``) so a run that cannot refetch keeps the last known values.
+    """
+
+    def __init__(self, path: Path, ttl: float, clock: Callable[[], float] = time.time) -> None:
+        self.path = path
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.dirty = False
+
+    @classmethod
+    def for_cache_dir(cls, cache_dir: Path, ttl: float) -> EnrichmentCache:
+        return cls(cache_dir / f"enrichment-{ENRICH_API_ID}.json", ttl)
+
+    def load(self) -> EnrichmentCache:
+        data = read_json_file(self.path)
+        if isinstance(data, dict) and data.get("version") == ENRICH_CACHE_VERSION:
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                self.entries = entries
+        return self
+
+    def get(self, code: str) -> tuple[dict[str, str], bool] | None:
+        """``(fields, fresh)`` for a cached code, or None."""
+        with self._lock:
+            entry = self.entries.get(code)
+        if not isinstance(entry, dict):
+            return None
+        fetched_at = float(entry.get("fetched_at") or 0)
+        return dict(entry.get("fields") or {}), self._clock() - fetched_at < self.ttl
+
+    def put(self, code: str, fields: dict[str, str]) -> None:
+        with self._lock:
+            self.entries[code] = {"fetched_at": round(self._clock(), 3), "fields": fields}
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        with self._lock:
+            payload = json.dumps(
+                {"version": ENRICH_CACHE_VERSION, "entries": self.entries},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            self.dirty = False
+        try:
+            write_private_file(self.path, payload)
+        except OSError:
+            pass
+
+
+@dataclass
+class EnrichStats:
+    candidates: int = 0
+    cached: int = 0
+    fetched: int = 0
+    failed: int = 0
+    deferred: int = 0
+    filled: Counter[str] = field(default_factory=Counter)
+
+    def as_line(self) -> str:
+        filled = " ".join(f"filled_{name}={self.filled[name]}" for name in ENRICH_FIELDS)
+        return (
+            f"enrich candidates={self.candidates} cached={self.cached} fetched={self.fetched} "
+            f"failed={self.failed} deferred={self.deferred} {filled}"
+        )
+
+
+class Enricher:
+    """Fill missing ``name_en``/``category_l1`` from per-code Kiwoom details (ka10001).
+
+    Only items with a missing field are looked up. A fresh cache entry is used as is;
+    otherwise ``fetch_detail`` runs on up to ``concurrency`` threads (paced by the
+    ka10001 rate limiter bucket). New calls stop once ``budget`` seconds have passed or
+    after MAX_CONSECUTIVE_FAILURES failures in a row. Codes left over are ``deferred`` to
+    the next run and keep any stale cached values. Without ``fetch_detail`` only the cache
+    is used. Values from Kiwoom's list response are never overwritten. ``detail_fields``
+    maps each field to its detail response key (see ``resolve_detail_fields``).
+
+    The asyncio engine calls ``enrich_async`` instead, with a coroutine ``fetch_detail``.
+    """
+
+    FETCH_ERRORS: tuple[type[BaseException], ...] = (
+        requests.RequestException,
+        RuntimeError,
+        ValueError,
+    )
+
+    def __init__(
+        self,
+        cache: EnrichmentCache,
+        fetch_detail: Callable[[str], Any] | None = None,
+        detail_fields: Mapping[str, str] | None = None,
+        concurrency: int = DEFAULT_ENRICH_CONCURRENCY,
+        budget: float | None = DEFAULT_ENRICH_BUDGET,
+        on_fetch: Callable[[float], None] | None = None,
+        on_filled: Callable[[list[str]], None] | None = None,
+        clock: Callable[[], float] = time.perf_counter,
+        fetch_errors: tuple[type[BaseException], ...] = FETCH_ERRORS,
+    ) -> None:
+        self.cache = cache
+        self.fetch_detail = fetch_detail
+        self.detail_fields = dict(detail_fields or {})
+        self.concurrency = max(1, concurrency)
+        self.budget = budget if budget and budget > 0 else None
+        self.on_fetch = on_fetch
+        self.on_filled = on_filled
+        self.fetch_errors = fetch_errors
+        self._clock = clock
+        self._deadline: float | None = None
+        self._consecutive_failures = 0
+        self._semaphore: asyncio.Semaphore | None = None
+        self.stats = EnrichStats()
+
+    def _can_fetch(self) -> bool:
+        if self.fetch_detail is None or self._consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            return False
+        return self._deadline is None or self._clock() < self._deadline
+
+    def _plan(self, item: Mapping[str, Any]) -> tuple[bool, dict[str, str] | None] | None:
+        """None when nothing is missing, else ``(fetch again?, cached fields or None)``."""
+        if not missing_fields(item):
+            return None
+        self.stats.candidates += 1
+        cached = self.cache.get(item["code"])
+        if cached is None:
+            return True, None
+        stale, fresh = cached
+        if fresh:
+            self.stats.cached += 1
+        return not fresh, stale
+
+    def _fetch(self, code: str) -> dict[str, str] | None:
+        assert self.fetch_detail is not None
+        started = self._clock()
+        try:
+            return extract_detail_fields(self.fetch_detail(code), self.detail_fields)
+        except self.fetch_errors:
+            return None
+        finally:
+            if self.on_fetch is not None:
+                self.on_fetch(self._clock() - started)
+
+    def _record(self, code: str, fetched: dict[str, str] | None) -> None:
+        if fetched is None:
+            self.stats.failed += 1
+            self._consecutive_failures += 1
+        else:
+            self.stats.fetched += 1
+            self._consecutive_failures = 0
+            self.cache.put(code, fetched)
+
+    def _merge(self, item: dict[str, Any], fields: Mapping[str, str] | None) -> dict[str, Any]:
+        values = fields or {}
+        filled = [name for name in missing_fields(item) if values.get(name)]
+        if not filled:
+            return item
+        for name in filled:
+            item[name] = values[name]
+        self.stats.filled.update(filled)
+        if self.on_filled is not None:
+            self.on_filled(filled)
+        return item
+
+    def _complete(
+        self,
+        item: dict[str, Any],
+        future: Future[dict[str, str] | None] | None,
+        stale: dict[str, str] | None,
+    ) -> dict[str, Any]:
+        if future is None:
+            return self._merge(item, stale)
+        fetched = future.result()
+        self._record(item["code"], fetched)
+        return self._merge(item, stale if fetched is None else fetched)
+
+    def enrich(self, items: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """Yield ``items`` in their original order, enriched, with a bounded lookahead."""
+        if self.budget is not None:
+            self._deadline = self._clock() + self.budget
+        max_pending = self.concurrency * 4
+        window: deque[tuple[dict[str, Any], Future | None, dict[str, str] | None]] = deque()
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            for item in items:
+                future: Future | None = None
+                plan = self._plan(item)
+                stale = plan[1] if plan is not None else None
+                if plan is not None and plan[0]:
+                    if self._can_fetch():
+                        future = executor.submit(self._fetch, item["code"])
+                    else:
+                        self.stats.deferred += 1
+                window.append((item, future, stale))
+                while window and (
+                    len(window) > max_pending or window[0][1] is None or window[0][1].done()
+                ):
+                    yield self._complete(*window.popleft())
+            while window:
+                yield self._complete(*window.popleft())
+        finally:
+            for _, future, _ in window:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=True)
+            self.cache.save()
+
+    async def _fetch_async(self, code: str) -> Any:
+        assert self._semaphore is not None and self.fetch_detail is not None
+        async with self._semaphore:
+            # Checked again once a slot is free: the budget may have run out meanwhile.
+            if not self._can_fetch():
+                return DEFERRED
+            started = self._clock()
+            try:
+                return extract_detail_fields(await self.fetch_detail(code), self.detail_fields)
+            except self.fetch_errors:
+                return None
+            finally:
+                if self.on_fetch is not None:
+                    self.on_fetch(self._clock() - started)
+
+    async def enrich_async(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Enrich one batch (a page) in place, with up to ``concurrency`` calls in flight.
+
+        The budget starts with the first batch. Unlike ``enrich`` the cache is not saved
+        here; call ``cache.save()`` once the run is done.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            if self.budget is not None:
+                self._deadline = self._clock() + self.budget
+        planned: list[tuple[dict[str, Any], asyncio.Task | None, dict[str, str] | None]] = []
+        try:
+            for item in items:
+                task: asyncio.Task | None = None
+                plan = self._plan(item)
+                stale = plan[1] if plan is not None else None
+                if plan is not None and plan[0]:
+                    if self._can_fetch():
+                        task = asyncio.ensure_future(self._fetch_async(item["code"]))
+                    else:
+                        self.stats.deferred += 1
+                planned.append((item, task, stale))
+            for item, task, stale in planned:
+                if task is None:
+                    self._merge(item, stale)
+                    continue
+                fetched = await task
+                if fetched is DEFERRED:
+                    self.stats.deferred += 1
+                    self._merge(item, stale)
+                    continue
+                self._record(item["code"], fetched)
+                self._merge(item, stale if fetched is None else fetched)
+        finally:
+            for _, task, _ in planned:
+                if task is not None and not task.done():
+                    task.cancel()
+        return items
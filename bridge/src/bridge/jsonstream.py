@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import codecs
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+_DECODER = json.JSONDecoder()
+# Drop already-parsed text once this much has accumulated in front of the cursor.
+_COMPACT_AT = 1 << 16
+
+
+class _TextBuffer:
+    """UTF-8 text assembled from byte chunks, consumed left to right."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Append the next chunk; returns False once the input is exhausted."""
+        if self.eof:
+            return False
+        if self.pos >= _COMPACT_AT:
+            self.text = self.text[self.pos :]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._decoder.decode(chunk)
+                return True
+        self.text += self._decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON body, found {found or 'end of input'!r}")
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk.
+            if end == len(self.text) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(buffer: _TextBuffer) -> Iterator[Any]:
+    buffer.expect("[")
+    while True:
+        char = buffer.peek()
+        if char == "]":
+            buffer.pos += 1
+            return
+        if char == ",":
+            buffer.pos += 1
+            continue
+        if not char:
+            raise ValueError("Truncated JSON array in body")
+        yield buffer.decode_value()
+
+
+def iter_list_records(
+    chunks: Iterable[bytes], preferred_keys: Iterable[str]
+) -> Iterator[dict[str, Any]]:
+    """Yield the dict records of a Kiwoom list body while it is still being received.
+
+    Records come from the first top-level array whose key is in ``preferred_keys`` (in
+    document order) and are decoded one at a time, so the full body is never held as
+    text or as a parsed tree. Without such a key the first other array containing dicts
+    is used; a top-level array body is streamed as-is. Scalars are skipped.
+    """
+    buffer = _TextBuffer(chunks)
+    first = buffer.peek()
+    if first == "[":
+        for value in _iter_array(buffer):
+            if isinstance(value, dict):
+                yield value
+        return
+    if first != "{":
+        return
+
+    preferred = set(preferred_keys)
+    buffer.pos += 1
+    streamed = False
+    fallback: list[dict[str, Any]] | None = None
+    while True:
+        char = buffer.peek()
+        if char == "}":
+            break
+        if char == ",":
+            buffer.pos += 1
+            continue
+        if not char:
+            raise ValueError("Truncated JSON object in body")
+        key = buffer.decode_value()
+        buffer.expect(":")
+        if buffer.peek() != "[":
+            buffer.decode_value()
+            continue
+        if not streamed and key in preferred:
+            streamed = True
+            for value in _iter_array(buffer):
+                if isinstance(value, dict):
+                    yield value
+            continue
+        keep = not streamed and fallback is None
+        values = [value for value in _iter_array(buffer) if keep and isinstance(value, dict)]
+        if keep and values:
+            fallback = values
+    if not streamed and fallback:
+        yield from fallback
@@ -1,11 +1,117 @@
 from __future__ import annotations
 
-from typing import Any
+import os
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Any, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from .jsonstream import iter_list_records
+from .ratelimit import RateLimiter, shared_rate_limiter
+from .token_cache import DEFAULT_REFRESH_MARGIN, TokenCache, parse_token_expiry
 
-def _safe_response_snippet(response: requests.Response, limit: int = 500) -> str:
+STREAM_CHUNK_SIZE = 64 * 1024
+LIST_KEYS = ("list", "items", "data", "output", "stkinfo")
+# Host pools kept alive (Kiwoom + backend) and idle keep-alive connections kept per host.
+# Override with BRIDGE_HTTP_POOL_HOSTS / BRIDGE_HTTP_POOL_PER_HOST; BRIDGE_HTTP_POOL_BLOCK=1
+# turns the per-host size into a hard cap on concurrent connections.
+DEFAULT_POOL_HOSTS = 4
+DEFAULT_POOL_PER_HOST = 8
+POOL_HOSTS_ENV = "BRIDGE_HTTP_POOL_HOSTS"
+POOL_PER_HOST_ENV = "BRIDGE_HTTP_POOL_PER_HOST"
+POOL_BLOCK_ENV = "BRIDGE_HTTP_POOL_BLOCK"
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    hosts: int = DEFAULT_POOL_HOSTS
+    per_host: int = DEFAULT_POOL_PER_HOST
+    block: bool = False
+
+    def at_least(self, concurrency: int) -> PoolSettings:
+        """Grow ``per_host`` to ``concurrency`` unless it is a hard cap (``block``).
+
+        A non-blocking pool opens extra connections past ``per_host`` but discards them
+        afterwards, so an undersized pool reconnects on every burst.
+        """
+        if self.block or self.per_host >= concurrency:
+            return self
+        return replace(self, per_host=concurrency)
+
+
+def resolve_pool_settings(env: Mapping[str, str] | None = None) -> PoolSettings:
+    source = os.environ if env is None else env
+    sizes: dict[str, int] = {}
+    for name, default in (
+        (POOL_HOSTS_ENV, DEFAULT_POOL_HOSTS),
+        (POOL_PER_HOST_ENV, DEFAULT_POOL_PER_HOST),
+    ):
+        raw = (source.get(name) or "").strip()
+        try:
+            sizes[name] = int(raw) if raw else default
+        except ValueError:
+            sizes[name] = 0
+        if sizes[name] < 1:
+            raise ValueError(f"Invalid {name}={raw!r}. Expected a positive integer.")
+    block = (source.get(POOL_BLOCK_ENV) or "").strip().lower() in {"1", "true", "yes", "on"}
+    return PoolSettings(hosts=sizes[POOL_HOSTS_ENV], per_host=sizes[POOL_PER_HOST_ENV], block=block)
+
+
+class _RetryExcept429(Retry):
+    """urllib3 retry that hands every 429 back to the caller.
+
+    urllib3 retries a 429 carrying ``Retry-After`` even when 429 is not in
+    ``status_forcelist``; the rate limiter must see those to slow the api-id down.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# Retried with backoff on every call; 429 is left to the rate limiter, which honours
+# Retry-After and slows that api-id down.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def create_adapter(
+    pool: PoolSettings, retry_statuses: Iterable[int] = RETRY_STATUSES
+) -> HTTPAdapter:
+    """Pooled adapter retrying connection errors and ``retry_statuses`` 3 times with backoff."""
+    # Once retries run out the last response is returned, so callers see its status
+    # instead of a RetryError.
+    retry = _RetryExcept429(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=list(retry_statuses),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=pool.hosts,
+        pool_maxsize=pool.per_host,
+        pool_block=pool.block,
+        max_retries=retry,
+    )
+
+
+def create_session(pool: PoolSettings | None = None) -> requests.Session:
+    """Keep-alive session with the bridge retry policy, shared by Kiwoom and backend calls."""
+    adapter = create_adapter(pool or PoolSettings())
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def safe_response_snippet(response: requests.Response, limit: int = 500) -> str:
     try:
         text = (response.text or "").strip()
     except Exception:
@@ -13,74 +119,342 @@ def _safe_response_snippet(response: requests.Response, limit: int = 500) -> str
     return text[:limit]
 
 
+TOKEN_HEADERS = {"Content-Type": "application/json;charset=UTF-8", "api-id": "au10001"}
+
+
+def token_payload(app_key: str, app_secret: str) -> dict[str, str]:
+    return {"grant_type": "client_credentials", "appkey": app_key, "secretkey": app_secret}
+
+
+def cached_token_data(token_cache: TokenCache | None) -> dict[str, Any] | None:
+    """``issue_token`` result for a still-valid cached token, or None."""
+    cached = token_cache.load() if token_cache is not None else None
+    if cached is None:
+        return None
+    return {
+        "token_type": cached.token_type,
+        "token": cached.token,
+        "expires_at": cached.expires_at.isoformat(),
+        "cached": True,
+    }
+
+
+def token_from_response(response: Any, token_cache: TokenCache | None) -> dict[str, Any]:
+    """Validate an au10001 response (requests or bridge.aio) and store the token in the cache."""
+    try:
+        data = response.json()
+    except Exception:
+        data = {"_non_json_body": (response.text or "").strip()[:500]}
+
+    if response.status_code < 200 or response.status_code >= 300:
+        snippet = safe_response_snippet(response)
+        raise RuntimeError(
+            f"Kiwoom token HTTP error: status={response.status_code} "
+            f"keys={list(data.keys())} body={snippet}"
+        )
+
+    token_type = data.get("token_type") or data.get("tokenType") or "Bearer"
+    token = data.get("token") or data.get("access_token") or data.get("accessToken")
+    if not token:
+        rc = data.get("return_code") or data.get("returnCode") or data.get("code")
+        rm = data.get("return_msg") or data.get("returnMsg") or data.get("message")
+        raise RuntimeError(
+            "Kiwoom token response missing token field. "
+            f"status={response.status_code} return_code={rc} return_msg={rm} "
+            f"keys={list(data.keys())}"
+        )
+
+    token_type = str(token_type).strip() or "Bearer"
+    token = str(token).strip()
+    if token_cache is not None:
+        token_cache.store(token_type, token, data)
+    return {**data, "token_type": token_type, "token": token}
+
+
+def token_now(token_cache: TokenCache | None) -> datetime:
+    return token_cache.now() if token_cache is not None else datetime.now(timezone.utc)
+
+
+def token_is_fresh(expires_at: datetime | None, now: datetime) -> bool:
+    return expires_at is None or expires_at - DEFAULT_REFRESH_MARGIN > now
+
+
+def token_expiry(data: dict[str, Any], now: datetime) -> datetime | None:
+    if data.get("cached"):
+        return datetime.fromisoformat(data["expires_at"])
+    return parse_token_expiry(data, now)
+
+
+def stock_info_from_data(data: Any, code: str) -> dict[str, Any]:
+    """The ka10001 body, or RuntimeError when it is not an object or reports a failure."""
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Kiwoom ka10001 returned a non-object body for code={code}")
+    return_code = str(data.get("return_code", 0)).strip()
+    if return_code not in ("0", ""):
+        raise RuntimeError(
+            f"Kiwoom ka10001 failed code={code} return_code={return_code} "
+            f"return_msg={data.get('return_msg')}"
+        )
+    return data
+
+
+@dataclass
+class PageStats:
+    pages: int = 0
+    bytes: int = 0
+
+
+def continuation_key(response_headers: Any) -> str | None:
+    """Return Kiwoom's ``next-key`` when the response announces more pages (``cont-yn: Y``)."""
+    headers = response_headers or {}
+    if str(headers.get("cont-yn") or "").strip().upper() != "Y":
+        return None
+    next_key = str(headers.get("next-key") or "").strip()
+    return next_key or None
+
+
+def read_list_page(
+    response: requests.Response,
+    preferred_keys: Iterable[str],
+    sink: list[bytes] | None = None,
+) -> tuple[list[dict[str, Any]], str | None, int]:
+    """Parse a streamed list response incrementally: (records, next continuation key, bytes).
+
+    The raw body chunks are also appended to ``sink`` when one is given.
+    """
+    size = 0
+
+    def counted_chunks() -> Iterator[bytes]:
+        nonlocal size
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            if sink is not None:
+                sink.append(chunk)
+            yield chunk
+
+    try:
+        records = list(iter_list_records(counted_chunks(), preferred_keys))
+    finally:
+        response.close()
+    return records, continuation_key(response.headers), size
+
+
+def iter_continuation_pages(
+    fetch_page: Callable[[str | None], tuple[list[dict[str, Any]], str | None, int]],
+    stats: PageStats | None = None,
+    label: str = "",
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield record pages until Kiwoom stops sending a continuation key.
+
+    ``fetch_page(next_key)`` returns ``(records, next_key or None, response bytes)``;
+    it is called with ``None`` for the first page.
+
+    The next page is requested in the background as soon as its key is known, so the
+    caller processes page N while page N+1 is in flight. A repeated key raises instead
+    of looping forever.
+    """
+    seen_keys: set[str] = set()
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        pending: Future | None = prefetcher.submit(fetch_page, None)
+        try:
+            while pending is not None:
+                records, next_key, size = pending.result()
+                pending = None
+                if next_key:
+                    if next_key in seen_keys:
+                        raise RuntimeError(
+                            f"Kiwoom continuation key repeated {label} next_key={next_key}".strip()
+                        )
+                    seen_keys.add(next_key)
+                    pending = prefetcher.submit(fetch_page, next_key)
+                if stats is not None:
+                    stats.pages += 1
+                    stats.bytes += size
+                yield records
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+
 class KiwoomClient:
-    def __init__(self, base_url: str, app_key: str, app_secret: str, timeout: int = 20) -> None:
+    """The one Kiwoom REST client: pooled session, retries, token lifecycle and list calls.
+
+    Every request goes through one keep-alive ``requests.Session`` (see ``create_session``)
+    and is paced by the rate limiter bucket of its api-id. The access token is issued once
+    (au10001), shared across threads and the on-disk ``TokenCache``, and reissued when
+    it expires or a list call is rejected with 401.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        app_key: str,
+        app_secret: str,
+        timeout: int = 20,
+        token_cache: TokenCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        session: requests.Session | None = None,
+        pool: PoolSettings | None = None,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
         self.app_key = app_key
         self.app_secret = app_secret
         self.timeout = timeout
+        self.token_cache = token_cache
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(pool)
+        self._token_lock = threading.Lock()
+        self._token: tuple[str, str] | None = None
+        self._token_expires_at: datetime | None = None
+
+    def close(self) -> None:
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self) -> KiwoomClient:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
     def issue_token(self) -> dict[str, Any]:
+        """Return a cached still-valid token, otherwise request one (au10001).
+
+        Kiwoom may return different field names depending on environment/version: the
+        token as ``token`` or ``access_token``, failures as ``return_code``/``return_msg``.
+        The result always carries normalized ``token_type`` and ``token``. Raises
+        RuntimeError with useful context (no secrets).
+        """
+        cached = cached_token_data(self.token_cache)
+        if cached is not None:
+            return cached
         url = f"{self.base_url}/oauth2/token"
-        headers = {
-            "Content-Type": "application/json",
-            "api-id": "au10001",
-        }
-        payload = {
-            "grant_type": "client_credentials",
-            "appkey": self.app_key,
-            "secretkey": self.app_secret,
-        }
-        response = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
-        if not response.ok:
-            snippet = _safe_response_snippet(response)
-            raise requests.HTTPError(
-                f"Kiwoom token HTTP error status={response.status_code} url={url} body={snippet}",
-                response=response,
-            )
-        data = response.json()
+        payload = token_payload(self.app_key, self.app_secret)
+        response = self.rate_limiter.send(
+            "au10001",
+            lambda: self.session.post(
+                url, headers=dict(TOKEN_HEADERS), json=payload, timeout=self.timeout
+            ),
+        )
+        return token_from_response(response, self.token_cache)
+
+    def token(self) -> tuple[str, str]:
+        """``(token_type, token)``, issued at most once at a time across threads."""
+        with self._token_lock:
+            now = token_now(self.token_cache)
+            if self._token is not None and token_is_fresh(self._token_expires_at, now):
+                return self._token
+            data = self.issue_token()
+            self._token = (data["token_type"], data["token"])
+            self._token_expires_at = token_expiry(data, now)
+            return self._token
+
+    def token_state(self) -> tuple[tuple[str, str] | None, datetime | None]:
+        """The token held in memory and its expiry, to share with another client."""
+        with self._token_lock:
+            return self._token, self._token_expires_at
+
+    def refresh_token(self, rejected: tuple[str, str] | None = None) -> tuple[str, str]:
+        """Drop the token (memory and on-disk cache) and issue a new one.
 
-        token_type = data.get("token_type")
-        token = data.get("token")
-        if not token_type or not token:
-            raise ValueError("Kiwoom token response missing token_type or token")
+        With ``rejected``, only that token is dropped: concurrent callers that saw the
+        same 401 share a single reissue.
+        """
+        with self._token_lock:
+            if rejected is None or self._token in (None, rejected):
+                self._token = None
+                if self.token_cache is not None:
+                    self.token_cache.invalidate()
+        return self.token()
 
-        return data
+    def fetch_stock_list(self, mrkt_tp: str) -> list[dict[str, Any]]:
+        """All records of one market across every continuation page."""
+        return [item for page in self.iter_stock_list_pages(mrkt_tp) for item in page]
 
-    def fetch_stock_list(self, token_type: str, token: str, mrkt_tp: str) -> list[dict[str, Any]]:
+    def fetch_stock_info(self, code: str) -> dict[str, Any]:
+        """Per-code detail (ka10001) as returned by Kiwoom.
+
+        Retried once with a fresh token on 401. Raises requests.HTTPError for other HTTP
+        errors and RuntimeError when Kiwoom reports a non-zero ``return_code``.
+        """
         url = f"{self.base_url}/api/dostk/stkinfo"
-        headers = {
-            "Content-Type": "application/json",
-            "authorization": f"{token_type} {token}",
-            "api-id": "ka10099",
-        }
-        payload = {"mrkt_tp": str(mrkt_tp)}
-        response = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
+        payload = {"stk_cd": str(code)}
+
+        def post(token: tuple[str, str]) -> requests.Response:
+            headers = {
+                "Content-Type": "application/json;charset=UTF-8",
+                "api-id": "ka10001",
+                "authorization": f"{token[0]} {token[1]}",
+            }
+            return self.rate_limiter.send(
+                "ka10001",
+                lambda: self.session.post(url, headers=headers, json=payload, timeout=self.timeout),
+            )
+
+        token = self.token()
+        response = post(token)
+        if response.status_code == 401:
+            response.close()
+            response = post(self.refresh_token(rejected=token))
         if not response.ok:
-            snippet = _safe_response_snippet(response)
+            snippet = safe_response_snippet(response)
             raise requests.HTTPError(
-                f"Kiwoom list HTTP error status={response.status_code} url={url} body={snippet}",
+                f"Kiwoom ka10001 HTTP error status={response.status_code} code={code} "
+                f"body={snippet}",
                 response=response,
             )
-        data = response.json()
-        return self._extract_items(data)
+        return stock_info_from_data(response.json(), code)
 
-    @staticmethod
-    def _extract_items(data: Any) -> list[dict[str, Any]]:
-        if isinstance(data, list):
-            return [item for item in data if isinstance(item, dict)]
+    def iter_stock_list_pages(
+        self,
+        mrkt_tp: str,
+        stats: PageStats | None = None,
+        on_body: Callable[[bytes, str | None], Any] | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """Yield the records of every ka10099 page for one market (``cont-yn``/``next-key``).
 
-        if not isinstance(data, dict):
-            return []
+        A page rejected with 401 is retried once with a freshly issued token. ``on_body``
+        receives each raw page body and its continuation key, in page order (used by the
+        response archive).
+        """
+        url = f"{self.base_url}/api/dostk/stkinfo"
+        payload = {"mrkt_tp": str(mrkt_tp)}
 
-        preferred_keys = ["items", "data", "list", "output", "stkinfo"]
-        for key in preferred_keys:
-            value = data.get(key)
-            if isinstance(value, list):
-                return [item for item in value if isinstance(item, dict)]
+        def post_page(token: tuple[str, str], next_key: str | None) -> requests.Response:
+            headers = {
+                "Content-Type": "application/json;charset=UTF-8",
+                "api-id": "ka10099",
+                "authorization": f"{token[0]} {token[1]}",
+            }
+            if next_key:
+                headers["cont-yn"] = "Y"
+                headers["next-key"] = next_key
+            return self.rate_limiter.send(
+                "ka10099",
+                lambda: self.session.post(
+                    url, headers=headers, json=payload, timeout=self.timeout, stream=True
+                ),
+            )
 
-        for value in data.values():
-            if isinstance(value, list) and all(isinstance(item, dict) for item in value):
-                return value
+        def fetch_page(next_key: str | None) -> tuple[list[dict[str, Any]], str | None, int]:
+            token = self.token()
+            response = post_page(token, next_key)
+            if response.status_code == 401:
+                # Token revoked or expired early: reissue and retry this page once.
+                response.close()
+                response = post_page(self.refresh_token(rejected=token), next_key)
+            if not response.ok:
+                snippet = safe_response_snippet(response)
+                raise requests.HTTPError(
+                    f"Kiwoom list HTTP error status={response.status_code} url={url} body={snippet}",
+                    response=response,
+                )
+            if on_body is None:
+                return read_list_page(response, LIST_KEYS)
+            chunks: list[bytes] = []
+            page = read_list_page(response, LIST_KEYS, sink=chunks)
+            on_body(b"".join(chunks), page[1])
+            return page
 
-        return []
+        return iter_continuation_pages(fetch_page, stats=stats, label=f"mrkt_tp={mrkt_tp}")
@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+
+from .storage import write_file_atomic
+
+METRICS_VERSION = 1
+PHASES = ("token", "fetch", "normalize", "enrich", "health_check", "upsert", "total")
+METRIC_PREFIX = "bridge_sync"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def request_phase(response: requests.Response) -> str:
+    """Phase of one HTTP exchange: Kiwoom api-id or backend endpoint."""
+    api_id = response.request.headers.get("api-id") if response.request is not None else None
+    if api_id:
+        return f"kiwoom_{api_id}"
+    path = urlsplit(str(response.url or "")).path.rstrip("/")
+    return "backend_" + (path.rsplit("/", 1)[-1] or "root")
+
+
+def _retry_count(response: requests.Response) -> int:
+    """Retries urllib3 made before this response (connection errors and 5xx)."""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(getattr(retries, "history", None) or ())
+
+
+def _header_int(headers: Mapping[str, str] | None, name: str) -> int:
+    try:
+        return int((headers or {}).get(name) or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+@dataclass
+class PhaseTiming:
+    seconds: float = 0.0
+    records: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+    latencies: list[float] = field(default_factory=list)
+
+
+class SyncMetrics:
+    """Per-phase timings and HTTP counters for one sync run. Thread-safe.
+
+    Phase seconds are not additive: fetch and normalize overlap the upsert while the
+    pipeline streams, ``normalize`` and ``upsert`` are busy time summed over pages and
+    chunks, and ``total`` is the wall time of the run.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._started = clock()
+        self.phases: dict[str, PhaseTiming] = {}
+        self.endpoints: dict[str, EndpointStats] = {}
+        self._sessions: list[requests.Session] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, seconds=self._clock() - started)
+
+    def add(self, name: str, seconds: float = 0.0, records: int = 0, bytes: int = 0) -> None:
+        with self._lock:
+            timing = self.phases.setdefault(name, PhaseTiming())
+            timing.seconds += seconds
+            timing.records += records
+            timing.bytes += bytes
+
+    def set_seconds(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases.setdefault(name, PhaseTiming()).seconds = seconds
+
+    def since_start(self) -> float:
+        return self._clock() - self._started
+
+    def on_response(self, response: requests.Response, *args: Any, **kwargs: Any) -> None:
+        """requests response hook: status, latency, retries and bytes per endpoint.
+
+        Sizes come from Content-Length headers, so streamed (chunked) bodies count as 0;
+        exact Kiwoom page bytes are recorded on the ``fetch`` phase instead. Also called
+        with ``bridge.aio`` responses by the asyncio engine, which passes its own ``retries``.
+        """
+        endpoint = request_phase(response)
+        request = response.request
+        sent = _header_int(request.headers if request is not None else None, "Content-Length")
+        received = _header_int(response.headers, "Content-Length")
+        retries = kwargs.get("retries")
+        if retries is None:
+            retries = _retry_count(response)
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.requests += 1
+            stats.retries += retries
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+            stats.latencies.append(response.elapsed.total_seconds())
+
+    def attach(self, session: requests.Session) -> None:
+        """Add the response hook; session-like objects without ``hooks`` are skipped."""
+        hooks = getattr(session, "hooks", None)
+        if hooks is None:
+            return
+        hooks.setdefault("response", []).append(self.on_response)
+        self._sessions.append(session)
+
+    def detach(self) -> None:
+        """Remove the hook from every attached session (they may outlive this run)."""
+        while self._sessions:
+            hooks = self._sessions.pop().hooks["response"]
+            if self.on_response in hooks:
+                hooks.remove(self.on_response)
+
+    def document(
+        self,
+        exit_code: int,
+        summary: Mapping[str, Any],
+        rate_limits: Mapping[str, Mapping[str, float]] | None = None,
+    ) -> dict[str, Any]:
+        """The metrics file contents: phases, HTTP endpoints, limiter counters and summary."""
+        self.set_seconds("total", self.since_start())
+        with self._lock:
+            phases = {
+                name: {
+                    "seconds": round(timing.seconds, 4),
+                    "records": timing.records,
+                    "bytes": timing.bytes,
+                    "records_per_s": (
+                        round(timing.records / timing.seconds, 1) if timing.seconds > 0 else 0.0
+                    ),
+                }
+                for name, timing in sorted(
+                    self.phases.items(),
+                    key=lambda item: (
+                        PHASES.index(item[0]) if item[0] in PHASES else len(PHASES),
+                        item[0],
+                    ),
+                )
+            }
+            http = {
+                endpoint: {
+                    "requests": stats.requests,
+                    "retries": stats.retries,
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                    "status": {str(code): n for code, n in sorted(stats.statuses.items())},
+                    "p50_ms": round(percentile(stats.latencies, 50) * 1000, 2),
+                    "p99_ms": round(percentile(stats.latencies, 99) * 1000, 2),
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+        finished = datetime.now(timezone.utc)
+        return {
+            "version": METRICS_VERSION,
+            "finished_at": finished.replace(microsecond=0).isoformat(),
+            "finished_at_unix": round(finished.timestamp(), 3),
+            "exit_code": exit_code,
+            "phases": phases,
+            "http": http,
+            "rate_limits": {
+                api_id: {
+                    "requests": int(limits.get("requests", 0)),
+                    "throttled": int(limits.get("throttled", 0)),
+                    "waited_s": round(float(limits.get("waited", 0.0)), 4),
+                }
+                for api_id, limits in sorted((rate_limits or {}).items())
+            },
+            "summary": dict(summary),
+        }
+
+
+def rate_limit_delta(
+    before: Mapping[str, Mapping[str, float]], after: Mapping[str, Mapping[str, float]]
+) -> dict[str, dict[str, float]]:
+    """Limiter counters accrued between two ``RateLimiter.stats()`` snapshots.
+
+    The limiter is process-wide, so a daemon's later runs would otherwise report totals.
+    """
+    delta: dict[str, dict[str, float]] = {}
+    for api_id, limits in after.items():
+        previous = before.get(api_id) or {}
+        counters = {
+            key: limits.get(key, 0) - previous.get(key, 0)
+            for key in ("requests", "throttled", "waited")
+        }
+        if counters["requests"] or counters["throttled"]:
+            delta[api_id] = counters
+    return delta
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _fraction(value: Any) -> tuple[int, int] | None:
+    """``"part/total"`` (summary quality fields) -> (part, total)."""
+    try:
+        part, total = (int(number) for number in str(value).split("/"))
+    except ValueError:
+        return None
+    return part, total
+
+
+def render_prometheus(document: Mapping[str, Any]) -> str:
+    """Render a metrics document in the Prometheus text exposition format (all gauges).
+
+    Meant for the node_exporter textfile collector: every value describes the last run.
+    """
+    lines: list[str] = []
+
+    def family(name: str, help_text: str, samples: list[tuple[dict[str, str], float]]) -> None:
+        if not samples:
+            return
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in samples:
+            rendered = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+            suffix = "{" + rendered + "}" if rendered else ""
+            lines.append(f"{metric}{suffix} {_format_value(value)}")
+
+    phases: Mapping[str, Mapping[str, Any]] = document.get("phases") or {}
+    http: Mapping[str, Mapping[str, Any]] = document.get("http") or {}
+    rate_limits: Mapping[str, Mapping[str, Any]] = document.get("rate_limits") or {}
+    summary: Mapping[str, Any] = document.get("summary") or {}
+    quality: Mapping[str, Any] = summary.get("quality") or {}
+    push_result = summary.get("push_result")
+
+    family("exit_code", "Exit code of the last sync run.", [({}, document["exit_code"])])
+    family(
+        "last_run_timestamp_seconds",
+        "Unix time the last sync run finished.",
+        [({}, document["finished_at_unix"])],
+    )
+    family(
+        "phase_duration_seconds",
+        "Seconds per phase (phases overlap while streaming; total is wall time).",
+        [({"phase": name}, phase["seconds"]) for name, phase in phases.items()],
+    )
+    family(
+        "phase_records",
+        "Records handled per phase.",
+        [({"phase": name}, phase["records"]) for name, phase in phases.items()],
+    )
+    family(
+        "phase_records_per_second",
+        "Records per second of phase time.",
+        [({"phase": name}, phase["records_per_s"]) for name, phase in phases.items()],
+    )
+    family(
+        "phase_bytes",
+        "Payload bytes per phase.",
+        [({"phase": name}, phase["bytes"]) for name, phase in phases.items() if phase["bytes"]],
+    )
+    family(
+        "http_requests",
+        "HTTP responses per endpoint and status code.",
+        [
+            ({"endpoint": endpoint, "status": status}, count)
+            for endpoint, stats in http.items()
+            for status, count in stats["status"].items()
+        ],
+    )
+    family(
+        "http_retries",
+        "urllib3 retries (connection errors and 5xx) per endpoint.",
+        [({"endpoint": endpoint}, stats["retries"]) for endpoint, stats in http.items()],
+    )
+    family(
+        "http_bytes",
+        "Content-Length bytes per endpoint and direction.",
+        [
+            ({"endpoint": endpoint, "direction": direction}, stats[f"bytes_{direction}"])
+            for endpoint, stats in http.items()
+            for direction in ("sent", "received")
+        ],
+    )
+    family(
+        "http_latency_seconds",
+        "Time to response headers per endpoint.",
+        [
+            ({"endpoint": endpoint, "quantile": quantile}, stats[key] / 1000)
+            for endpoint, stats in http.items()
+            for quantile, key in (("0.5", "p50_ms"), ("0.99", "p99_ms"))
+        ],
+    )
+    family(
+        "rate_limit_throttled",
+        "Kiwoom 429 responses per api-id.",
+        [({"api_id": api_id}, limits["throttled"]) for api_id, limits in rate_limits.items()],
+    )
+    family(
+        "rate_limit_wait_seconds",
+        "Seconds spent waiting on the client-side rate limiter per api-id.",
+        [({"api_id": api_id}, limits["waited_s"]) for api_id, limits in rate_limits.items()],
+    )
+    family(
+        "records",
+        "Records per pipeline stage.",
+        [
+            ({"stage": stage}, summary[key])
+            for stage, key in (("raw", "raw_count_total"), ("normalized", "normalized_unique"))
+            if isinstance(summary.get(key), int)
+        ],
+    )
+    family(
+        "market_records",
+        "Normalized records per market.",
+        [
+            ({"market": market}, count)
+            for market, count in sorted((quality.get("per_market_counts") or {}).items())
+        ],
+    )
+    listed = _fraction(quality.get("listed_date_parsed"))
+    family(
+        "listed_date_parsed_ratio",
+        "Share of normalized records with a parsed listed date.",
+        [({}, listed[0] / listed[1])] if listed and listed[1] else [],
+    )
+    missing = _fraction(quality.get("category_l1_missing"))
+    family(
+        "category_l1_missing",
+        "Normalized records without a level-1 category.",
+        [({}, missing[0])] if missing else [],
+    )
+    if isinstance(push_result, Mapping):
+        family(
+            "upsert_items",
+            "Upsert result counts by outcome.",
+            [
+                ({"result": key}, value)
+                for key, value in sorted(push_result.items())
+                if isinstance(value, int) and not isinstance(value, bool)
+            ],
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(
+    document: Mapping[str, Any],
+    json_path: str | Path | None = None,
+    textfile_path: str | Path | None = None,
+) -> None:
+    """Write the JSON document and/or the Prometheus textfile, each atomically."""
+    if json_path:
+        write_file_atomic(
+            Path(json_path), json.dumps(document, ensure_ascii=False, indent=2) + "\n"
+        )
+    if textfile_path:
+        write_file_atomic(Path(textfile_path), render_prometheus(document))
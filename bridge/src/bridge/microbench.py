@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from . import normalize, sync
+from .storage import read_json_file
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_TOLERANCE = 0.25
+# Rough KRX proportions: KOSPI, KOSDAQ, KONEX.
+MARKET_SHARES = (("0", 0.55), ("10", 0.42), ("50", 0.03))
+_SECTORS = ("전기전자", "화학", "서비스업", "의약품", "금융업", "운수장비", "유통업", "")
+_BAD_REG_DAYS = ("20231345", "0", "2023-01-05", "abc", "19990230")
+_MARKET_CODES = ("0", "0", "0", "0", "8", "6", "2", "60")
+
+Pages = list[tuple[str, list[dict[str, Any]]]]
+
+
+def generate_pages(size: int, seed: int = 0, page_size: int = 500) -> Pages:
+    """Deterministic ka10099-like pages with ``size`` raw records in total.
+
+    About 3% of records repeat a code already listed in another market, 1% lack a name,
+    3% use the ``stk_cd``/``stk_nm`` spelling, 4% have an unparseable ``regDay`` and 5%
+    have none. Values carry stray whitespace like real Kiwoom payloads.
+    """
+    rng = random.Random(seed)
+    pages: Pages = []
+    issued: list[str] = []
+    produced = 0
+    for position, (mrkt_tp, share) in enumerate(MARKET_SHARES):
+        count = size - produced if position == len(MARKET_SHARES) - 1 else int(size * share)
+        records: list[dict[str, Any]] = []
+        for index in range(count):
+            roll = rng.random()
+            if roll < 0.03 and issued:
+                code = rng.choice(issued)
+            else:
+                code = f"{position}{produced + index:07d}"
+                issued.append(code)
+            name = f" 종목{mrkt_tp}-{index} " if roll >= 0.04 or roll < 0.03 else ""
+            reg_roll = rng.random()
+            if reg_roll < 0.04:
+                reg_day = rng.choice(_BAD_REG_DAYS)
+            elif reg_roll < 0.09:
+                reg_day = ""
+            else:
+                reg_day = f"{1975 + index % 50}{1 + index % 12:02d}{1 + index % 28:02d}"
+            record: dict[str, Any] = {
+                "listCount": f"{1_000_000 + index:015d}",
+                "auditInfo": "정상",
+                "regDay": reg_day,
+                "lastPrice": f"{1000 + index % 90000:08d}",
+                "state": "증거금20%",
+                "marketCode": rng.choice(_MARKET_CODES),
+                "marketName": "거래소",
+                "upName": rng.choice(_SECTORS),
+                "upSizeName": "대형주",
+                "companyClassName": "" if index % 3 else "외국기업",
+                "orderWarning": "0",
+                "nxtEnable": "Y",
+            }
+            if 0.04 <= roll < 0.07:
+                record.update({"stk_cd": f" {code} ", "stk_nm": name})
+            else:
+                record.update({"code": f"{code} ", "name": name})
+            records.append(record)
+        produced += count
+        for start in range(0, len(records), page_size):
+            pages.append((mrkt_tp, records[start : start + page_size]))
+    return pages
+
+
+@dataclass
+class CaseResult:
+    case: str
+    size: int
+    seconds: float
+    ns_per_record: float
+    peak_kib: float
+
+
+def _cases(pages: Pages) -> dict[str, Callable[[], Any]]:
+    normalized = sync._normalize_and_dedup(pages)
+    raw_count = sum(len(records) for _, records in pages)
+
+    def normalize_ka10099_item() -> None:
+        for mrkt_tp, records in pages:
+            for record in records:
+                sync._normalize_ka10099_item(record, mrkt_tp)
+
+    def normalize_item() -> None:
+        for mrkt_tp, records in pages:
+            for record in records:
+                normalize.normalize_item(record, mrkt_tp)
+
+    def normalize_and_dedup() -> None:
+        sync._normalize_and_dedup(pages)
+
+    def compute_change_summary() -> None:
+        sync.compute_change_summary(
+            fetched_markets=len(MARKET_SHARES),
+            raw_count_total=raw_count,
+            normalized_items=normalized,
+            selected_items=normalized,
+            dry_run=True,
+            push_result="skipped",
+        )
+
+    return {
+        "normalize_ka10099_item": normalize_ka10099_item,
+        "normalize_item": normalize_item,
+        "normalize_and_dedup": normalize_and_dedup,
+        "compute_change_summary": compute_change_summary,
+    }
+
+
+def _time_best_of(run: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _peak_memory(run: Callable[[], Any]) -> float:
+    """Peak bytes allocated while ``run`` executes (inputs already exist and are excluded)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_microbench(
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    repeat: int = 3,
+    cases: Iterable[str] | None = None,
+    seed: int = 0,
+) -> list[CaseResult]:
+    """Time each hot path (best of ``repeat``) and measure its peak traced memory."""
+    results: list[CaseResult] = []
+    wanted = set(cases) if cases is not None else None
+    for size in sizes:
+        pages = generate_pages(size, seed=seed)
+        for name, run in _cases(pages).items():
+            if wanted is not None and name not in wanted:
+                continue
+            seconds = _time_best_of(run, repeat)
+            results.append(
+                CaseResult(
+                    case=name,
+                    size=size,
+                    seconds=round(seconds, 6),
+                    ns_per_record=round(seconds * 1e9 / max(size, 1), 1),
+                    peak_kib=round(_peak_memory(run) / 1024, 1),
+                )
+            )
+        del pages
+    return results
+
+
+def _revision() -> str | None:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def results_document(results: list[CaseResult]) -> dict[str, Any]:
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+
+def save_results(path: Path, results: list[CaseResult]) -> None:
+    document = results_document(results)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def compare_results(
+    results: list[CaseResult], baseline: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE
+) -> list[dict[str, Any]]:
+    """Per-case ratio against a baseline document; ``regressed`` when slower than tolerance."""
+    previous = {
+        (entry.get("case"), entry.get("size")): entry
+        for entry in baseline.get("results", [])
+        if isinstance(entry, dict)
+    }
+    rows = []
+    for result in results:
+        entry = previous.get((result.case, result.size))
+        row: dict[str, Any] = {**asdict(result), "baseline_ns": None, "ratio": None}
+        if entry and entry.get("ns_per_record"):
+            ratio = result.ns_per_record / float(entry["ns_per_record"])
+            row.update(
+                baseline_ns=entry["ns_per_record"],
+                ratio=round(ratio, 3),
+                regressed=ratio > 1 + tolerance,
+            )
+        rows.append(row)
+    return rows
+
+
+def load_baseline(path: Path) -> dict[str, Any] | None:
+    document = read_json_file(path)
+    return document if isinstance(document, dict) else None
+
+
+def format_rows(rows: list[dict[str, Any]]) -> list[str]:
+    lines = [
+        f"{'case':<24} {'size':>9} {'ns/record':>10} {'baseline':>10} {'ratio':>7} {'peak_kib':>10}"
+    ]
+    for row in rows:
+        baseline = "-" if row.get("baseline_ns") is None else f"{row['baseline_ns']:.1f}"
+        ratio = "-" if row.get("ratio") is None else f"{row['ratio']:.2f}"
+        flag = "  REGRESSED" if row.get("regressed") else ""
+        lines.append(
+            f"{row['case']:<24} {row['size']:>9} {row['ns_per_record']:>10.1f} "
+            f"{baseline:>10} {ratio:>7} {row['peak_kib']:>10.1f}{flag}"
+        )
+    return lines
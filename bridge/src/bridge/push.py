@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from .batch import StockBatch
+from .storage import read_json_file, remove_file, write_private_file
+
+DEFAULT_CHUNK_SIZE = 500
+COUNT_KEYS = ("received", "inserted", "updated", "unchanged")
+CHECKPOINT_MAX_AGE = timedelta(hours=24)
+
+
+def iter_chunks(
+    items: Iterable[dict[str, Any]], size: int, new_chunk: Callable[[], Any] = list
+) -> Iterator[Any]:
+    """Group items into chunks of ``size``; ``new_chunk`` builds an empty chunk."""
+    chunk = new_chunk()
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = new_chunk()
+    if len(chunk):
+        yield chunk
+
+
+def chunk_digest(chunk: Any) -> str:
+    if isinstance(chunk, StockBatch):
+        encoded = chunk.encode_json()
+    else:
+        encoded = json.dumps(chunk, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class UpsertCheckpoint:
+    """Record of chunks the backend has acknowledged, keyed by chunk content hash.
+
+    Keying by content means a rerun only skips chunks whose items are byte-for-byte
+    identical to ones already committed; anything that changed is sent again.
+    The file is removed once a push completes and ignored after ``max_age``.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_age: timedelta = CHECKPOINT_MAX_AGE,
+        clock: Callable[[], datetime] | None = None,
+    ) -> None:
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+        self.acked: dict[str, dict[str, int]] = {}
+
+    @classmethod
+    def for_target(cls, cache_dir: Path, upsert_url: str) -> UpsertCheckpoint:
+        target = hashlib.sha256(upsert_url.encode("utf-8")).hexdigest()[:16]
+        return cls(cache_dir / f"upsert-checkpoint-{target}.json")
+
+    def load(self) -> UpsertCheckpoint:
+        data = read_json_file(self.path)
+        if not isinstance(data, dict):
+            return self
+        try:
+            saved_at = datetime.fromisoformat(data["saved_at"])
+            acked = data["acked"]
+        except (KeyError, TypeError, ValueError):
+            return self
+        if self._clock() - saved_at > self.max_age or not isinstance(acked, dict):
+            return self
+        self.acked = acked
+        return self
+
+    def ack(self, digest: str, counts: dict[str, int]) -> None:
+        self.acked[digest] = counts
+        payload = {"saved_at": self._clock().isoformat(), "acked": self.acked}
+        try:
+            write_private_file(self.path, json.dumps(payload))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        self.acked = {}
+        remove_file(self.path)
+
+
+def result_counts(result: dict[str, Any]) -> dict[str, int]:
+    """The ``COUNT_KEYS`` of one upsert response, as ints (0 when missing)."""
+    return {key: int(result.get(key) or 0) for key in COUNT_KEYS}
+
+
+class PushTotals:
+    """Aggregated ``COUNT_KEYS`` plus ``chunks``/``resumed_chunks`` of one chunked push."""
+
+    def __init__(
+        self, on_chunk: Callable[[int, int, dict[str, int], float, bool], None] | None = None
+    ) -> None:
+        self.on_chunk = on_chunk
+        self.totals = {key: 0 for key in COUNT_KEYS}
+        self.totals["chunks"] = 0
+        self.totals["resumed_chunks"] = 0
+
+    def record(
+        self, index: int, size: int, counts: dict[str, int], elapsed: float, resumed: bool
+    ) -> None:
+        for key in COUNT_KEYS:
+            self.totals[key] += counts.get(key, 0)
+        self.totals["chunks"] += 1
+        if resumed:
+            self.totals["resumed_chunks"] += 1
+        if self.on_chunk is not None:
+            self.on_chunk(index, size, counts, elapsed, resumed)
+
+
+def push_in_chunks(
+    items: Iterable[dict[str, Any]],
+    *,
+    post: Callable[[Any], dict[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_in_flight: int = 1,
+    checkpoint: UpsertCheckpoint | None = None,
+    on_chunk: Callable[[int, int, dict[str, int], float, bool], None] | None = None,
+    new_chunk: Callable[[], Any] = list,
+) -> dict[str, int]:
+    """Push items in chunks with at most ``max_in_flight`` concurrent requests.
+
+    Returns aggregated ``received/inserted/updated/unchanged`` plus ``chunks`` and
+    ``resumed_chunks``. Chunks already acknowledged in ``checkpoint`` are skipped and
+    their stored counts merged. ``items`` is consumed lazily, one chunk at a time, so
+    chunks are posted while later items are still being produced. On the first failure
+    (posting a chunk or producing items) no new chunks are started, in-flight chunks are
+    allowed to finish (and are checkpointed), and the error is re-raised. Chunks are
+    lists unless ``new_chunk`` builds another appendable type (e.g. ``StockBatch``).
+    """
+    totals = PushTotals(on_chunk)
+    record = totals.record
+
+    def send(chunk: Any) -> tuple[dict[str, int], float]:
+        started = time.perf_counter()
+        result = post(chunk)
+        return result_counts(result), time.perf_counter() - started
+
+    pending: dict[Future, tuple[int, int, str]] = {}
+    error: BaseException | None = None
+
+    def drain() -> None:
+        nonlocal error
+        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in done:
+            index, size, digest = pending.pop(future)
+            try:
+                counts, elapsed = future.result()
+            except Exception as exc:
+                if error is None:
+                    error = exc
+                continue
+            if checkpoint is not None:
+                checkpoint.ack(digest, counts)
+            record(index, size, counts, elapsed, False)
+
+    chunks = enumerate(iter_chunks(items, chunk_size, new_chunk), start=1)
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+        while error is None:
+            # ``items`` may be a lazy pipeline; a failure producing the next chunk is
+            # handled like a failed post so in-flight chunks still get checkpointed.
+            try:
+                index, chunk = next(chunks)
+            except StopIteration:
+                break
+            except Exception as exc:
+                error = exc
+                break
+            digest = chunk_digest(chunk)
+            if checkpoint is not None and digest in checkpoint.acked:
+                record(index, len(chunk), checkpoint.acked[digest], 0.0, True)
+                continue
+            while len(pending) >= max(1, max_in_flight):
+                drain()
+            if error is not None:
+                break
+            pending[executor.submit(send, chunk)] = (index, len(chunk), digest)
+        while pending:
+            drain()
+
+    if error is not None:
+        raise error
+    if checkpoint is not None:
+        checkpoint.clear()
+    return totals.totals
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections.abc import Awaitable, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable
+
+# Conservative per-api-id ceilings (requests/second) for one app key. Override with
+# KIWOOM_RATE_LIMITS, e.g. "default=5,ka10099=4,au10001=1".
+DEFAULT_RATE = 5.0
+DEFAULT_RATES = {"au10001": 1.0}
+# After a 429 the rate is halved (never below MIN_RATE) and then regained by
+# RECOVERY_STEP * ceiling per successful request.
+MIN_RATE = 0.2
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.05
+MAX_THROTTLED_ATTEMPTS = 4
+RATE_LIMITS_ENV = "KIWOOM_RATE_LIMITS"
+
+
+def resolve_rate_limits(env: Mapping[str, str] | None = None) -> dict[str, float]:
+    """Parse ``KIWOOM_RATE_LIMITS`` into ``{api_id: requests_per_second}``.
+
+    The ``default`` entry applies to api-ids without their own entry.
+    """
+    source = os.environ if env is None else env
+    rates = {"default": DEFAULT_RATE, **DEFAULT_RATES}
+    raw = (source.get(RATE_LIMITS_ENV) or "").strip()
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        api_id, sep, value = part.partition("=")
+        try:
+            rate = float(value)
+        except ValueError:
+            rate = 0.0
+        if not sep or not api_id.strip() or rate <= 0:
+            raise ValueError(
+                f"Invalid {RATE_LIMITS_ENV} entry {part.strip()!r}. "
+                "Expected comma-separated api_id=requests_per_second with a positive rate."
+            )
+        rates[api_id.strip()] = rate
+    return rates
+
+
+def parse_retry_after(value: str | None, now: datetime | None = None) -> float | None:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    text = (value or "").strip()
+    if not text:
+        return None
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    current = now or datetime.now(timezone.utc)
+    return max(0.0, (when - current).total_seconds())
+
+
+@dataclass
+class ApiBucket:
+    ceiling: float
+    rate: float
+    tokens: float
+    updated: float
+    blocked_until: float = 0.0
+    requests: int = 0
+    throttled: int = 0
+    waited: float = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take one token and return 0, or return how long to wait before trying again."""
+        capacity = max(1.0, self.ceiling)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            self.requests += 1
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per Kiwoom ``api-id``, shared by every thread making Kiwoom calls.
+
+    Each bucket refills at its current rate and holds at most one second of burst. A 429
+    halves that api-id's rate and blocks it for ``Retry-After`` (or one refill interval
+    when absent); successful responses raise the rate back toward its ceiling.
+    """
+
+    def __init__(
+        self,
+        rates: Mapping[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rates = dict(rates) if rates is not None else resolve_rate_limits({})
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets: dict[str, ApiBucket] = {}
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] | None = None) -> RateLimiter:
+        return cls(resolve_rate_limits(env))
+
+    def _bucket(self, api_id: str) -> ApiBucket:
+        bucket = self._buckets.get(api_id)
+        if bucket is None:
+            ceiling = self.rates.get(api_id, self.rates.get("default", DEFAULT_RATE))
+            bucket = ApiBucket(
+                ceiling=ceiling, rate=ceiling, tokens=max(1.0, ceiling), updated=self._clock()
+            )
+            self._buckets[api_id] = bucket
+        return bucket
+
+    def _reserve(self, api_id: str) -> float:
+        with self._lock:
+            bucket = self._bucket(api_id)
+            delay = bucket.reserve(self._clock())
+            if delay > 0:
+                bucket.waited += delay
+            return delay
+
+    def acquire(self, api_id: str) -> None:
+        """Block until a request for ``api_id`` may be sent."""
+        while (delay := self._reserve(api_id)) > 0:
+            self._sleep(delay)
+
+    async def acquire_async(self, api_id: str) -> None:
+        """``acquire`` for coroutines: waits with ``asyncio.sleep`` instead of blocking."""
+        while (delay := self._reserve(api_id)) > 0:
+            await asyncio.sleep(delay)
+
+    def observe(self, api_id: str, response: Any) -> None:
+        """Adapt the api-id's rate to a response: back off on 429, recover otherwise."""
+        with self._lock:
+            bucket = self._bucket(api_id)
+            if getattr(response, "status_code", None) == 429:
+                headers = getattr(response, "headers", None) or {}
+                retry_after = parse_retry_after(headers.get("Retry-After"))
+                bucket.throttled += 1
+                bucket.rate = max(MIN_RATE, bucket.rate * BACKOFF_FACTOR)
+                bucket.tokens = 0.0
+                pause = retry_after if retry_after is not None else 1.0 / bucket.rate
+                bucket.blocked_until = max(bucket.blocked_until, self._clock() + pause)
+            elif bucket.rate < bucket.ceiling:
+                bucket.rate = min(bucket.ceiling, bucket.rate + bucket.ceiling * RECOVERY_STEP)
+
+    def send(
+        self,
+        api_id: str,
+        request: Callable[[], Any],
+        max_attempts: int = MAX_THROTTLED_ATTEMPTS,
+    ) -> Any:
+        """Send ``request()`` within the api-id's budget, retrying 429s up to ``max_attempts``.
+
+        The last response is returned as-is when every attempt was throttled.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self.acquire(api_id)
+            response = request()
+            self.observe(api_id, response)
+            if getattr(response, "status_code", None) != 429 or attempt >= max_attempts:
+                return response
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+
+    async def send_async(
+        self,
+        api_id: str,
+        request: Callable[[], Awaitable[Any]],
+        max_attempts: int = MAX_THROTTLED_ATTEMPTS,
+    ) -> Any:
+        """``send`` for coroutines; ``request()`` returns an awaitable, fully read response."""
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.acquire_async(api_id)
+            response = await request()
+            self.observe(api_id, response)
+            if getattr(response, "status_code", None) != 429 or attempt >= max_attempts:
+                return response
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {
+                api_id: {
+                    "rate": bucket.rate,
+                    "requests": bucket.requests,
+                    "throttled": bucket.throttled,
+                    "waited": bucket.waited,
+                }
+                for api_id, bucket in sorted(self._buckets.items())
+            }
+
+
+_shared_lock = threading.Lock()
+_shared: RateLimiter | None = None
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """The process-wide limiter, built from the environment on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter.from_env()
+        return _shared
+
+
+def reset_shared_rate_limiter() -> None:
+    """Forget the process-wide limiter so the next use re-reads the environment."""
+    global _shared
+    with _shared_lock:
+        _shared = None
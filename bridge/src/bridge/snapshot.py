@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from .storage import read_json_file, write_private_file
+
+# Must match the backend manifest encoding (backend/stocks/manifest.py): columns in this
+# order joined by U+001F, None as U+001E, booleans as true/false, dates as YYYY-MM-DD.
+MANIFEST_ALGORITHM = "md5-v1"
+MANIFEST_COLUMNS = [
+    "code",
+    "name_kr",
+    "name_en",
+    "market",
+    "security_type",
+    "mrkt_tp_raw",
+    "market_code_raw",
+    "category_l1",
+    "category_l2",
+    "is_active",
+    "listed_date",
+    "delisted_date",
+]
+
+
+def _manifest_text(value: Any) -> str:
+    if value is None:
+        return "\x1e"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    return str(value)
+
+
+def item_digest(item: dict[str, Any]) -> str:
+    """Content hash of one normalized record, identical to the backend manifest row hash."""
+    encoded = "\x1f".join(_manifest_text(item.get(column)) for column in MANIFEST_COLUMNS)
+    return hashlib.md5(encoded.encode("utf-8")).hexdigest()
+
+
+def market_rollups(items: Iterable[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Per-market ``count`` + roll-up hash, computed like the backend manifest."""
+    by_market: dict[str, dict[str, str]] = {}
+    for item in items:
+        by_market.setdefault(str(item.get("market", "")), {})[item["code"]] = item_digest(item)
+    return {
+        market: {
+            "count": len(hashes),
+            "hash": hashlib.md5(
+                "".join(hashes[code] for code in sorted(hashes)).encode("ascii")
+            ).hexdigest(),
+        }
+        for market, hashes in by_market.items()
+    }
+
+
+def reconcile_entries(
+    items: list[dict[str, Any]],
+    backend_rollups: dict[str, dict[str, Any]],
+    fetch_codes: Callable[[list[str]], dict[str, dict[str, str]]] | None,
+) -> tuple[dict[str, dict[str, str]], list[str]]:
+    """Build snapshot entries that mirror what the backend currently holds.
+
+    Markets whose roll-up already matches are taken from ``items`` without fetching
+    anything; only differing markets are fetched via ``fetch_codes`` (one request).
+    Returns the entries and the list of differing markets. Without ``fetch_codes`` the
+    caller fetches the differing markets itself and adds them with ``merge_backend_codes``.
+    """
+    local = market_rollups(items)
+    differing = sorted(
+        market
+        for market in set(local) | set(backend_rollups)
+        if local.get(market) != backend_rollups.get(market)
+    )
+    entries: dict[str, dict[str, str]] = {
+        item["code"]: {"hash": item_digest(item), "market": str(item.get("market", ""))}
+        for item in items
+        if str(item.get("market", "")) not in differing
+    }
+    if differing and fetch_codes is not None:
+        merge_backend_codes(entries, fetch_codes(differing))
+    return entries, differing
+
+
+def merge_backend_codes(
+    entries: dict[str, dict[str, str]], codes: dict[str, dict[str, str]]
+) -> None:
+    """Add the manifest's ``{market: {code: hash}}`` rows to snapshot ``entries``."""
+    for market, hashes in codes.items():
+        for code, digest in hashes.items():
+            entries[code] = {"hash": digest, "market": market}
+
+
+@dataclass
+class Delta:
+    changed: list[dict[str, Any]] = field(default_factory=list)
+    removed_codes: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+
+class DeltaStream:
+    """Lazily yields the items that differ from the snapshot while counting the rest.
+
+    Iterate it once (e.g. straight into the chunked push); afterwards ``removed_codes()``
+    and ``pushed_entries`` describe the run without ever holding the items themselves.
+    """
+
+    def __init__(
+        self,
+        entries: dict[str, dict[str, str]],
+        items: Iterable[dict[str, Any]],
+        full: bool = False,
+    ) -> None:
+        self._entries = entries
+        self._items = items
+        self._full = full
+        self._seen: dict[str, str] = {}
+        self.changed = 0
+        self.unchanged = 0
+        self.pushed_entries: dict[str, dict[str, str]] = {}
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return self.select(self._items)
+
+    def select(self, items: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        """Diff ``items`` into this stream's counters; for callers that feed it page by page."""
+        for item in items:
+            code = item["code"]
+            self._seen[code] = str(item.get("market", ""))
+            digest = item_digest(item)
+            entry = self._entries.get(code)
+            if not self._full and entry is not None and entry.get("hash") == digest:
+                self.unchanged += 1
+                continue
+            self.changed += 1
+            self.pushed_entries[code] = {"hash": digest, "market": str(item.get("market", ""))}
+            yield item
+
+    def removed_codes(self, complete_markets: Iterable[str] = ()) -> list[str]:
+        """Codes no longer listed, restricted to ``complete_markets``.
+
+        Removals are only reported for markets whose entire list was fetched this run. A
+        market that came back empty or a ``--limit`` run must never be mistaken for mass
+        delisting.
+        """
+        markets = set(complete_markets)
+        return sorted(
+            code
+            for code, entry in self._entries.items()
+            if code not in self._seen and entry.get("market") in markets
+        )
+
+    def listed_codes(self, complete_markets: Iterable[str] = ()) -> dict[str, list[str]]:
+        """Every code seen this run per market, for the backend's full snapshot mode.
+
+        Restricted to ``complete_markets`` like ``removed_codes``: the backend deactivates
+        whatever a market's list omits.
+        """
+        listed: dict[str, list[str]] = {market: [] for market in complete_markets if market}
+        for code, market in self._seen.items():
+            if market in listed:
+                listed[market].append(code)
+        return {market: sorted(codes) for market, codes in listed.items() if codes}
+
+
+class SnapshotStore:
+    """Last successfully pushed state per backend: ``code -> (content hash, market)``.
+
+    Used to push only new/changed records and to report codes that disappeared.
+    The snapshot is only rewritten after the backend acknowledged the whole push.
+    Hashes use the backend manifest encoding, so entries can also be rebuilt from
+    ``GET /api/internal/stocks:manifest`` (see ``reconcile_entries``).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: dict[str, dict[str, str]] = {}
+
+    @classmethod
+    def for_target(cls, cache_dir: Path, upsert_url: str) -> SnapshotStore:
+        target = hashlib.sha256(upsert_url.encode("utf-8")).hexdigest()[:16]
+        return cls(cache_dir / f"snapshot-{target}.json")
+
+    def load(self) -> SnapshotStore:
+        data = read_json_file(self.path)
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            self.entries = entries
+        return self
+
+    def stream_diff(self, items: Iterable[dict[str, Any]], *, full: bool = False) -> DeltaStream:
+        return DeltaStream(self.entries, items, full=full)
+
+    def diff(
+        self,
+        items: Iterable[dict[str, Any]],
+        *,
+        full: bool = False,
+        complete_markets: Iterable[str] = (),
+    ) -> Delta:
+        """Split ``items`` into records to push and codes that vanished (see ``DeltaStream``)."""
+        stream = self.stream_diff(items, full=full)
+        changed = list(stream)
+        return Delta(
+            changed=changed,
+            removed_codes=stream.removed_codes(complete_markets),
+            unchanged=stream.unchanged,
+        )
+
+    def commit(self, pushed: Iterable[dict[str, Any]], removed_codes: Iterable[str]) -> None:
+        self.commit_entries(
+            {
+                item["code"]: {"hash": item_digest(item), "market": str(item.get("market", ""))}
+                for item in pushed
+            },
+            removed_codes,
+        )
+
+    def commit_entries(
+        self, pushed_entries: dict[str, dict[str, str]], removed_codes: Iterable[str]
+    ) -> None:
+        self.entries.update(pushed_entries)
+        for code in removed_codes:
+            self.entries.pop(code, None)
+        try:
+            write_private_file(
+                self.path, json.dumps({"entries": self.entries}, separators=(",", ":"))
+            )
+        except OSError:
+            pass
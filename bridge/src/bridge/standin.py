@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from .token_cache import KST
+
+STANDIN_TOKEN = "standin-token"
+DEFAULT_MARKET_SIZES = {"0": 2400, "10": 1800, "50": 120}
+# First digit of synthetic codes per market so codes never collide across markets.
+_CODE_PREFIX = {"0": "0", "10": "1", "50": "5"}
+_SECTORS = ("전기전자", "화학", "서비스업", "의약품", "금융업", "운수장비")
+
+
+@dataclass
+class StandInConfig:
+    """Synthetic universe and fault injection for the local Kiwoom stand-in."""
+
+    market_sizes: dict[str, int] = field(default_factory=lambda: dict(DEFAULT_MARKET_SIZES))
+    page_size: int = 500
+    latency: float = 0.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    retry_after: str = "0"
+    seed: int = 0
+
+
+def parse_market_sizes(spec: str) -> dict[str, int]:
+    """Parse ``"0=2400,10=1800,50=120"`` into ``{mrkt_tp: record_count}``."""
+    sizes: dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        mrkt_tp, sep, value = part.partition("=")
+        try:
+            size = int(value)
+        except ValueError:
+            size = -1
+        if not sep or mrkt_tp.strip() not in _CODE_PREFIX or not 0 <= size < 100_000:
+            raise ValueError(
+                f"Invalid universe entry {part.strip()!r}. "
+                "Expected mrkt_tp=count with mrkt_tp in 0/10/50 and count below 100000."
+            )
+        sizes[mrkt_tp.strip()] = size
+    return sizes
+
+
+def synthetic_record(mrkt_tp: str, index: int) -> dict[str, Any]:
+    """One ka10099 record, stable for a given market and index."""
+    prefix = _CODE_PREFIX.get(mrkt_tp, "9")
+    return {
+        "code": f"{prefix}{index:05d}",
+        "name": f"합성종목{mrkt_tp}-{index}",
+        "listCount": str(1_000_000 + index),
+        "regDay": f"{2000 + index % 25}{1 + index % 12:02d}{1 + index % 28:02d}",
+        "lastPrice": str(1000 + index * 7 % 90000),
+        "marketCode": mrkt_tp,
+        "marketName": {"0": "거래소", "10": "코스닥", "50": "코넥스"}.get(mrkt_tp, ""),
+        "upName": _SECTORS[index % len(_SECTORS)],
+        "companyClassName": "",
+        "orderWarning": "0",
+        "nxtEnable": "Y",
+    }
+
+
+def synthetic_detail(code: str, market_sizes: dict[str, int]) -> dict[str, Any] | None:
+    """ka10001 detail for a synthetic code, or None when the code is not in the universe.
+
+    ``stk_nm_eng``/``upName`` are stand-in keys, not documented ka10001 fields; map them
+    with ``KIWOOM_DETAIL_FIELDS=name_en=stk_nm_eng,category_l1=upName``.
+    """
+    mrkt_tp = next((tp for tp, prefix in _CODE_PREFIX.items() if code.startswith(prefix)), None)
+    if mrkt_tp is None or len(code) != 6 or not code[1:].isdigit():
+        return None
+    index = int(code[1:])
+    if index >= market_sizes.get(mrkt_tp, 0):
+        return None
+    record = synthetic_record(mrkt_tp, index)
+    return {
+        "stk_cd": code,
+        "stk_nm": record["name"],
+        "stk_nm_eng": f"Synthetic {mrkt_tp}-{index}",
+        "upName": record["upName"],
+        "flo_stk": record["listCount"],
+        "cur_prc": record["lastPrice"],
+    }
+
+
+class StandInStats:
+    """Thread-safe request counters: per ``endpoint status`` plus TCP connections."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: Counter[str] = Counter()
+        self.connections = 0
+        self.records_served = 0
+
+    def count(self, endpoint: str, status: int, records: int = 0) -> None:
+        with self._lock:
+            self.requests[f"{endpoint} {status}"] += 1
+            self.records_served += records
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(sorted(self.requests.items())),
+                "connections": self.connections,
+                "records_served": self.records_served,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the stats show whether the bridge reuses connections.
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY every small response on a
+    # kept-alive connection waits ~40 ms for the client's delayed ACK.
+    disable_nagle_algorithm = True
+    server: _StandInHTTPServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.stats.connected()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: dict[str, str] | None = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self) -> dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            data = json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _inject_fault(self, endpoint: str) -> bool:
+        config = self.server.config
+        if config.latency > 0:
+            time.sleep(config.latency)
+        roll = self.server.roll()
+        if roll < config.rate_429:
+            self.server.stats.count(endpoint, 429)
+            self._send_json(
+                429,
+                {"return_code": 5, "return_msg": "허용된 요청 개수를 초과하였습니다"},
+                {"Retry-After": config.retry_after},
+            )
+            return True
+        if roll < config.rate_429 + config.rate_5xx:
+            self.server.stats.count(endpoint, 503)
+            self._send_json(503, {"return_code": 1, "return_msg": "stand-in 503"})
+            return True
+        return False
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        path = self.path.split("?", 1)[0]
+        if path == "/oauth2/token":
+            self._token(body)
+        elif path == "/api/dostk/stkinfo" and self.headers.get("api-id") == "ka10001":
+            self._stock_info(body)
+        elif path == "/api/dostk/stkinfo":
+            self._stock_list(body)
+        else:
+            self.server.stats.count(path, 404)
+            self._send_json(404, {"return_code": 1, "return_msg": "not found"})
+
+    def _token(self, body: dict[str, Any]) -> None:
+        if self._inject_fault("au10001"):
+            return
+        expires = datetime.now(KST) + timedelta(days=1)
+        self.server.stats.count("au10001", 200)
+        self._send_json(
+            200,
+            {
+                "expires_dt": expires.strftime("%Y%m%d%H%M%S"),
+                "token_type": "Bearer",
+                "token": STANDIN_TOKEN,
+                "return_code": 0,
+                "return_msg": "정상적으로 처리되었습니다",
+            },
+        )
+
+    def _stock_info(self, body: dict[str, Any]) -> None:
+        if self.headers.get("authorization") != f"Bearer {STANDIN_TOKEN}":
+            self.server.stats.count("ka10001", 401)
+            self._send_json(401, {"return_code": 3, "return_msg": "invalid token"})
+            return
+        if self._inject_fault("ka10001"):
+            return
+        code = str(body.get("stk_cd") or "")
+        detail = synthetic_detail(code, self.server.config.market_sizes)
+        if detail is None:
+            self.server.stats.count("ka10001", 200)
+            self._send_json(200, {"return_code": 1, "return_msg": f"unknown code {code}"})
+            return
+        self.server.stats.count("ka10001", 200, 1)
+        self._send_json(
+            200,
+            {**detail, "return_code": 0, "return_msg": "정상적으로 처리되었습니다"},
+            {"api-id": "ka10001"},
+        )
+
+    def _stock_list(self, body: dict[str, Any]) -> None:
+        if self.headers.get("authorization") != f"Bearer {STANDIN_TOKEN}":
+            self.server.stats.count("ka10099", 401)
+            self._send_json(401, {"return_code": 3, "return_msg": "invalid token"})
+            return
+        if self._inject_fault("ka10099"):
+            return
+        config = self.server.config
+        mrkt_tp = str(body.get("mrkt_tp") or "")
+        size = config.market_sizes.get(mrkt_tp, 0)
+        start = 0
+        if (self.headers.get("cont-yn") or "").upper() == "Y":
+            try:
+                start = int(self.headers.get("next-key") or 0)
+            except ValueError:
+                start = 0
+        end = min(size, start + config.page_size)
+        records = [synthetic_record(mrkt_tp, index) for index in range(start, end)]
+        headers = {"cont-yn": "N", "next-key": "", "api-id": "ka10099"}
+        if end < size:
+            headers = {"cont-yn": "Y", "next-key": str(end), "api-id": "ka10099"}
+        self.server.stats.count("ka10099", 200, len(records))
+        self._send_json(
+            200,
+            {"return_code": 0, "return_msg": "정상적으로 처리되었습니다", "list": records},
+            headers,
+        )
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: StandInConfig) -> None:
+        super().__init__(address, _Handler)
+        self.config = config
+        self.stats = StandInStats()
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+
+    def roll(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+
+class StandInServer:
+    """Local HTTP stand-in for the Kiwoom token (au10001) and list (ka10099) endpoints.
+
+    Serves a synthetic universe with real ``cont-yn``/``next-key`` paging and injects
+    latency, 429s (with ``Retry-After``) and 503s at the configured rates. Use as a
+    context manager; ``port=0`` picks a free port.
+    """
+
+    def __init__(
+        self, config: StandInConfig | None = None, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.config = config or StandInConfig()
+        self._server = _StandInHTTPServer((host, port), self.config)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> StandInStats:
+        return self._server.stats
+
+    def start(self) -> StandInServer:
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> StandInServer:
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import IO, Any
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
+
+
+def write_file_atomic(
+    path: Path, data: bytes | str, mode: int = 0o644, dir_mode: int = 0o755
+) -> None:
+    """Replace ``path`` with ``data`` via a temporary file and rename in the same directory.
+
+    Readers (e.g. a node_exporter textfile collector) never see a partial file.
+    """
+    path.parent.mkdir(mode=dir_mode, parents=True, exist_ok=True)
+    payload = data.encode("utf-8") if isinstance(data, str) else data
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(payload)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def write_private_file(path: Path, data: bytes | str) -> None:
+    """Atomically replace ``path`` with ``data``, readable by the owner only.
+
+    The parent directory is created with 0700 and the file with 0600 so tokens and
+    cached market data never become world-readable, even briefly.
+    """
+    write_file_atomic(path, data, mode=0o600, dir_mode=0o700)
+
+
+def read_json_file(path: Path) -> Any | None:
+    """Return the decoded JSON document, or None when missing or unreadable."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def remove_file(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+class FileLock:
+    """Non-blocking exclusive lock on ``path`` (``flock``), also exclusive between threads.
+
+    The holder's pid is written into the file for operators. Without ``fcntl`` (non-POSIX)
+    the lock only guards the current process.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._guard = threading.Lock()
+        self._handle: IO[str] | None = None
+
+    def acquire(self) -> bool:
+        if not self._guard.acquire(blocking=False):
+            return False
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            handle = open(self.path, "a+", encoding="utf-8")
+        except OSError:
+            self._guard.release()
+            raise
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                self._guard.release()
+                return False
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{os.getpid()}\n")
+        handle.flush()
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        handle, self._handle = self._handle, None
+        if handle is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        handle.close()
+        self._guard.release()
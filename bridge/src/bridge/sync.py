@@ -1,17 +1,55 @@
 from __future__ import annotations
 
+import functools
+import gzip
 import json
 import os
+import queue
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable
 
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
-from .config import load_bridge_env_files, resolve_kiwoom_config
+from .archive import ArchiveReader, ArchiveWriter, resolve_archive_dir
+from .batch import StockBatch
+from .config import load_bridge_env_files, resolve_bridge_cache_dir, resolve_kiwoom_config
+from .enrich import (
+    DEFAULT_ENRICH_BUDGET,
+    DEFAULT_ENRICH_CONCURRENCY,
+    DEFAULT_ENRICH_TTL_HOURS,
+    Enricher,
+    EnrichmentCache,
+    resolve_detail_fields,
+)
+from .kiwoom import (
+    RETRY_STATUSES,
+    KiwoomClient,
+    PageStats,
+    PoolSettings,
+    create_adapter,
+    create_session,
+    resolve_pool_settings,
+)
+from .metrics import SyncMetrics, rate_limit_delta, write_metrics
+from .push import COUNT_KEYS, DEFAULT_CHUNK_SIZE, UpsertCheckpoint, push_in_chunks
+from .ratelimit import RateLimiter
+from .snapshot import MANIFEST_ALGORITHM, DeltaStream, SnapshotStore, reconcile_entries
+from .storage import FileLock
+from .token_cache import TokenCache
 
 MARKET_TYPES = ["0", "10", "50"]
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+NDJSON_HEADERS = {"Content-Type": NDJSON_CONTENT_TYPE, "Content-Encoding": "gzip"}
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+SYNC_LOCK_FILENAME = "sync.lock"
+ENGINES = ("threads", "asyncio")
 
 SECURITY_TYPE_MAP = {
     "60": "ETN",
@@ -33,18 +71,60 @@ def _load_dotenv_if_available() -> None:
     load_bridge_env_files()
 
 
-def _create_retry_session() -> requests.Session:
-    retry = Retry(
-        total=3,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=frozenset(["GET", "POST"]),
+def sync_lock() -> FileLock:
+    """Lock held for the whole of a sync so runs sharing a cache dir never overlap."""
+    return FileLock(resolve_bridge_cache_dir() / SYNC_LOCK_FILENAME)
+
+
+def create_kiwoom_client(
+    fetch_workers: int = 1,
+    push_concurrency: int = 1,
+    session: requests.Session | None = None,
+    enrich_concurrency: int = 0,
+) -> KiwoomClient:
+    """Kiwoom client for the configured mode on a pooled session sized for the sync.
+
+    Raises ValueError for missing/invalid Kiwoom or pool configuration.
+    """
+    kiwoom = resolve_kiwoom_config()
+    if session is None:
+        session = create_session(pool_settings(fetch_workers, push_concurrency, enrich_concurrency))
+    return KiwoomClient(
+        kiwoom.host_url,
+        kiwoom.app_key,
+        kiwoom.app_secret,
+        token_cache=TokenCache.from_env(kiwoom.mode, kiwoom.app_key),
+        session=session,
     )
-    adapter = HTTPAdapter(max_retries=retry)
-    session = requests.Session()
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+
+
+def pool_settings(
+    fetch_workers: int, push_concurrency: int, enrich_concurrency: int = 0
+) -> PoolSettings:
+    """Configured pool, grown so concurrent fetches and pushes never discard connections."""
+    # Each fetching market keeps one page in flight plus one prefetched; detail lookups
+    # for enrichment go to the same Kiwoom host at the same time.
+    kiwoom_in_flight = 2 * fetch_workers + enrich_concurrency
+    return resolve_pool_settings().at_least(max(kiwoom_in_flight, push_concurrency))
+
+
+# The backend answers 409 while an upsert with the same Idempotency-Key is still being
+# applied; the retry, with the same key, gets its stored response. Kiwoom calls keep
+# ``RETRY_STATUSES``: a Kiwoom 409 means something else.
+BACKEND_RETRY_STATUSES = (409, *RETRY_STATUSES)
+
+
+def mount_backend_retries(session: Any, backend: BackendTarget, pool: PoolSettings) -> None:
+    """Send ``backend`` calls on ``session`` through an adapter that also retries 409.
+
+    Sessions that already have it (a warm client's, reused across runs) and session-like
+    objects without ``mount`` are left alone.
+    """
+    prefix = f"{backend.api_base}/"
+    adapters = getattr(session, "adapters", None)
+    if adapters is None or prefix in adapters:
+        return
+    session.mount(prefix, create_adapter(pool, BACKEND_RETRY_STATUSES))
 
 
 def _safe_response_snippet(response: requests.Response, limit: int = 500) -> str:
@@ -108,24 +188,63 @@ def _normalize_ka10099_item(raw: dict[str, Any], mrkt_tp: str) -> dict[str, Any]
     }
 
 
-def _normalize_and_dedup(
-    records_by_market: list[tuple[str, list[dict[str, Any]]]],
+def normalize_page(
+    mrkt_tp: str,
+    records: list[dict[str, Any]],
+    seen: set[str],
+    limit: int | None = None,
+    stats: SummaryStats | None = None,
+    metrics: SyncMetrics | None = None,
 ) -> list[dict[str, Any]]:
-    by_code: dict[str, dict[str, Any]] = {}
-    order: list[str] = []
+    """Normalize one raw page, skipping codes already in ``seen`` (which it extends).
+
+    Stops once ``seen`` holds ``limit`` codes. ``metrics`` gets the normalize time.
+    """
+    started = time.perf_counter()
+    if stats is not None:
+        stats.raw_count_total += len(records)
+    page: list[dict[str, Any]] = []
+    for raw in records:
+        normalized = _normalize_ka10099_item(raw, mrkt_tp)
+        if normalized is None or normalized["code"] in seen:
+            continue
+        seen.add(normalized["code"])
+        if stats is not None:
+            stats.add(normalized)
+        page.append(normalized)
+        if limit is not None and len(seen) >= limit:
+            break
+    if metrics is not None:
+        metrics.add("normalize", seconds=time.perf_counter() - started, records=len(page))
+    return page
 
-    for mrkt_tp, records in records_by_market:
-        for raw in records:
-            normalized = _normalize_ka10099_item(raw, mrkt_tp)
-            if normalized is None:
-                continue
-            code = normalized["code"]
-            if code in by_code:
-                continue
-            by_code[code] = normalized
-            order.append(code)
 
-    return [by_code[code] for code in order]
+def _iter_unique_items(
+    pages: Iterable[tuple[str, list[dict[str, Any]]]],
+    limit: int | None = None,
+    stats: SummaryStats | None = None,
+    metrics: SyncMetrics | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Normalize raw pages and yield each code once (first seen wins), stopping at ``limit``.
+
+    Returning early closes ``pages``, so no further Kiwoom pages are requested once
+    ``limit`` unique items exist. Only the set of seen codes grows with the universe.
+    Each page is normalized before its items are yielded, so ``metrics`` gets the
+    normalize time without the consumer's time in between.
+    """
+    if limit is not None and limit < 1:
+        return
+    seen: set[str] = set()
+    for mrkt_tp, records in pages:
+        yield from normalize_page(mrkt_tp, records, seen, limit, stats, metrics)
+        if limit is not None and len(seen) >= limit:
+            return
+
+
+def _normalize_and_dedup(
+    records_by_market: list[tuple[str, list[dict[str, Any]]]],
+) -> StockBatch:
+    return StockBatch(_iter_unique_items(records_by_market))
 
 
 def _post_json(
@@ -135,7 +254,10 @@ def _post_json(
     body: dict[str, Any],
     timeout: int,
 ) -> dict[str, Any]:
-    response = session.post(url, headers=headers, json=body, timeout=timeout)
+    if any(isinstance(value, StockBatch) for value in body.values()):
+        response = session.post(url, headers=headers, data=encode_json_body(body), timeout=timeout)
+    else:
+        response = session.post(url, headers=headers, json=body, timeout=timeout)
     if not response.ok:
         snippet = _safe_response_snippet(response)
         raise requests.HTTPError(
@@ -148,204 +270,413 @@ def _post_json(
     return data
 
 
-def _fetch_token(
-    session: requests.Session,
-    base_url: str,
-    app_key: str,
-    app_secret: str,
-) -> tuple[str, str]:
-    """Fetch Kiwoom REST access token.
+def with_idempotency_key(headers: dict[str, str]) -> dict[str, str]:
+    """Headers for one upsert batch; transport retries resend the same key.
 
-    Kiwoom may return different field names depending on environment/version.
-    - Success fields: token_type + token (sometimes access_token)
-    - Failure fields: return_code / return_msg
-
-    Raise RuntimeError with useful context (no secrets).
+    The backend replays its stored response for a key it has already committed, so a
+    retried batch whose first response was lost is never applied twice.
     """
-    token_url = f"{base_url.rstrip('/')}/oauth2/token"
-    headers = {
-        "Content-Type": "application/json;charset=UTF-8",
-        "api-id": "au10001",
-    }
-    body = {
-        "grant_type": "client_credentials",
-        "appkey": app_key,
-        "secretkey": app_secret,
-    }
+    return {**headers, IDEMPOTENCY_HEADER: uuid.uuid4().hex}
+
+
+def encode_json_body(body: dict[str, Any]) -> bytes:
+    """Compact JSON for a request body whose values may include ``StockBatch`` columns."""
+    parts = []
+    for key, value in body.items():
+        if isinstance(value, StockBatch):
+            encoded = value.encode_json()
+        else:
+            encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        parts.append(f"{json.dumps(key)}:{encoded}")
+    return ("{" + ",".join(parts) + "}").encode("utf-8")
 
-    resp = session.post(token_url, headers=headers, json=body, timeout=10)
-    try:
-        data = resp.json()
-    except Exception:
-        data = {"_non_json_body": (resp.text or "").strip()[:500]}
 
-    if resp.status_code < 200 or resp.status_code >= 300:
-        snippet = _safe_response_snippet(resp)
-        raise RuntimeError(
-            f"Kiwoom token HTTP error: status={resp.status_code} keys={list(data.keys())} body={snippet}"
+def encode_ndjson(records: Iterable[dict[str, Any]]) -> bytes:
+    """Gzip-compressed NDJSON: one compact JSON object per line."""
+    if isinstance(records, StockBatch):
+        return records.encode_ndjson()
+    lines = (
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records
+    )
+    return gzip.compress("".join(lines).encode("utf-8"))
+
+
+def _post_ndjson(
+    session: requests.Session,
+    url: str,
+    headers: dict[str, str],
+    records: Iterable[dict[str, Any]],
+    timeout: int,
+) -> dict[str, Any]:
+    ndjson_headers = {**headers, **NDJSON_HEADERS}
+    response = session.post(
+        url, headers=ndjson_headers, data=encode_ndjson(records), timeout=timeout
+    )
+    if not response.ok:
+        snippet = _safe_response_snippet(response)
+        raise requests.HTTPError(
+            f"HTTP error status={response.status_code} url={url} body={snippet}",
+            response=response,
         )
+    data = response.json()
+    if not isinstance(data, dict):
+        return {}
+    return data
 
-    token_type = data.get("token_type") or data.get("tokenType") or "Bearer"
-    token = data.get("token") or data.get("access_token") or data.get("accessToken")
 
-    if not token:
-        rc = data.get("return_code") or data.get("returnCode") or data.get("code")
-        rm = data.get("return_msg") or data.get("returnMsg") or data.get("message")
-        raise RuntimeError(
-            "Kiwoom token response missing token field. "
-            f"status={resp.status_code} return_code={rc} return_msg={rm} keys={list(data.keys())}"
+def _get_json(
+    session: requests.Session,
+    url: str,
+    headers: dict[str, str],
+    params: dict[str, Any] | None,
+    timeout: int,
+) -> dict[str, Any]:
+    response = session.get(url, headers=headers, params=params, timeout=timeout)
+    if not response.ok:
+        snippet = _safe_response_snippet(response)
+        raise requests.HTTPError(
+            f"HTTP error status={response.status_code} url={url} body={snippet}",
+            response=response,
         )
+    data = response.json()
+    if not isinstance(data, dict):
+        return {}
+    return data
 
-    token_type = str(token_type).strip() or "Bearer"
-    token = str(token).strip()
-    return token_type, token
 
+class KiwoomFetchError(RuntimeError):
+    """A Kiwoom list request failed while the sync pipeline was consuming pages."""
+
+
+@dataclass
+class MarketStats:
+    mrkt_tp: str
+    raw_count: int = 0
+    pages: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+
+def _close_iterator(iterator: Iterator[Any]) -> None:
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
 
-def _fetch_market_list(
-    session: requests.Session,
-    base_url: str,
-    token_type: str,
-    token: str,
-    mrkt_tp: str,
-) -> list[dict[str, Any]]:
-    list_url = f"{base_url.rstrip('/')}/api/dostk/stkinfo"
-    list_headers = {
-        "Content-Type": "application/json;charset=UTF-8",
-        "api-id": "ka10099",
-        "authorization": f"{token_type} {token}",
-    }
-    list_body = {"mrkt_tp": mrkt_tp}
-    data = _post_json(session, list_url, list_headers, list_body, timeout=20)
 
-    raw_list = data.get("list")
-    if isinstance(raw_list, list):
-        return [item for item in raw_list if isinstance(item, dict)]
+class MarketStream:
+    """``(mrkt_tp, raw page)`` pairs for every managed market, in MARKET_TYPES order.
 
-    for key in ["items", "data", "output", "stkinfo"]:
-        candidate = data.get(key)
-        if isinstance(candidate, list):
-            return [item for item in candidate if isinstance(item, dict)]
+    Sequentially, markets are fetched one after another as the consumer pulls pages. With an
+    executor every market starts fetching immediately into its own bounded queue
+    (``max_buffered_pages``) and the consumer drains the queues in MARKET_TYPES order, so
+    first-seen dedup stays deterministic and memory stays bounded. ``close()`` stops the
+    producers; call it when the consumer stops early.
+
+    ``client`` may be an ``ArchiveReader`` to replay an archived run instead of calling
+    Kiwoom; ``archive`` stores every raw page body fetched by a live client.
+    """
+
+    def __init__(
+        self,
+        client: KiwoomClient | ArchiveReader,
+        executor: ThreadPoolExecutor | None = None,
+        max_buffered_pages: int = 4,
+        on_market_done: Callable[[MarketStats], None] | None = None,
+        archive: ArchiveWriter | None = None,
+    ) -> None:
+        self._client = client
+        self._archive = archive
+        self._on_market_done = on_market_done
+        self._stop = threading.Event()
+        self._queues: dict[str, queue.Queue] = {}
+        self.markets: dict[str, MarketStats] = {}
+        if executor is not None:
+            for mrkt_tp in MARKET_TYPES:
+                self._queues[mrkt_tp] = queue.Queue(maxsize=max(1, max_buffered_pages))
+                executor.submit(self._produce, mrkt_tp, self._queues[mrkt_tp])
+
+    def _market_pages(self, stats: MarketStats) -> Iterator[list[dict[str, Any]]]:
+        page_stats = PageStats()
+        started = time.perf_counter()
+        if self._archive is not None:
+            pages = self._client.iter_stock_list_pages(
+                stats.mrkt_tp,
+                stats=page_stats,
+                on_body=functools.partial(self._archive.add_page, stats.mrkt_tp),
+            )
+        else:
+            pages = self._client.iter_stock_list_pages(stats.mrkt_tp, stats=page_stats)
+        try:
+            for page in pages:
+                stats.raw_count += len(page)
+                stats.pages = page_stats.pages
+                stats.bytes = page_stats.bytes
+                yield page
+        finally:
+            _close_iterator(pages)
+            stats.elapsed = time.perf_counter() - started
+
+    def _put(self, target: queue.Queue, entry: tuple[str, Any]) -> bool:
+        while not self._stop.is_set():
+            try:
+                target.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, mrkt_tp: str, target: queue.Queue) -> None:
+        stats = MarketStats(mrkt_tp)
+        try:
+            pages = self._market_pages(stats)
+            try:
+                for page in pages:
+                    if not self._put(target, ("page", page)):
+                        return
+            finally:
+                pages.close()
+        except BaseException as exc:
+            self._put(target, ("error", exc))
+            return
+        self._put(target, ("done", stats))
+
+    def _finish_market(self, stats: MarketStats) -> None:
+        self.markets[stats.mrkt_tp] = stats
+        if self._on_market_done is not None:
+            self._on_market_done(stats)
+
+    def __iter__(self) -> Iterator[tuple[str, list[dict[str, Any]]]]:
+        try:
+            for mrkt_tp in MARKET_TYPES:
+                if not self._queues:
+                    stats = MarketStats(mrkt_tp)
+                    for page in self._market_pages(stats):
+                        yield mrkt_tp, page
+                    self._finish_market(stats)
+                    continue
+                while True:
+                    kind, payload = self._queues[mrkt_tp].get()
+                    if kind == "page":
+                        yield mrkt_tp, payload
+                    elif kind == "done":
+                        self._finish_market(payload)
+                        break
+                    else:
+                        raise payload
+        finally:
+            self.close()
 
-    for value in data.values():
-        if isinstance(value, list):
-            dict_items = [item for item in value if isinstance(item, dict)]
-            if dict_items:
-                return dict_items
+    def close(self) -> None:
+        self._stop.set()
 
-    return []
+
+def health_ok(response: Any) -> bool:
+    """Whether a ``/health`` response (requests or bridge.aio) reports ``status=ok``.
+
+    Raises ValueError for a body that is not JSON.
+    """
+    if response.status_code != 200:
+        return False
+    health_data = response.json()
+    return isinstance(health_data, dict) and health_data.get("status") == "ok"
 
 
 def _check_backend_health(backend_api_base: str) -> bool:
     health_url = f"{backend_api_base}/health"
     try:
-        health_resp = requests.get(health_url, timeout=2)
-        if health_resp.status_code != 200:
-            return False
-        health_data = health_resp.json()
-        return isinstance(health_data, dict) and health_data.get("status") == "ok"
+        return health_ok(requests.get(health_url, timeout=2))
     except (requests.ConnectionError, requests.Timeout, ValueError):
         return False
 
 
+@dataclass
+class SummaryStats:
+    """Running counters for the sync summary, updated one normalized item at a time."""
+
+    raw_count_total: int = 0
+    normalized_unique: int = 0
+    listed_date_parsed: int = 0
+    category_l1_missing: int = 0
+    per_market_counts: dict[str, int] = field(default_factory=dict)
+
+    def add(self, item: dict[str, Any]) -> None:
+        self.normalized_unique += 1
+        if item.get("listed_date") is not None:
+            self.listed_date_parsed += 1
+        if item.get("category_l1") is None:
+            self.category_l1_missing += 1
+        market = str(item.get("market", "UNKNOWN"))
+        self.per_market_counts[market] = self.per_market_counts.get(market, 0) + 1
+
+    def record_enriched(self, filled: list[str]) -> None:
+        """Adjust the counters for fields filled in after ``add`` (enrichment)."""
+        if "category_l1" in filled:
+            self.category_l1_missing -= 1
+
+    def add_batch(self, batch: StockBatch) -> None:
+        """Same as ``add`` for every item, aggregated over the batch columns."""
+        listed, category_missing, per_market = batch.summary_counts()
+        self.normalized_unique += len(batch)
+        self.listed_date_parsed += listed
+        self.category_l1_missing += category_missing
+        for market, count in per_market.items():
+            self.per_market_counts[market] = self.per_market_counts.get(market, 0) + count
+
+    def as_summary(
+        self,
+        *,
+        fetched_markets: int,
+        limited_to: int,
+        dry_run: bool,
+        push_result: str | dict[str, Any],
+    ) -> dict[str, Any]:
+        normalized_unique = self.normalized_unique
+        return {
+            "fetched_markets": fetched_markets,
+            "raw_count_total": self.raw_count_total,
+            "normalized_unique": normalized_unique,
+            "limited_to": limited_to,
+            "dry_run": dry_run,
+            "push_result": push_result,
+            "quality": {
+                "listed_date_parsed": f"{self.listed_date_parsed}/{normalized_unique}",
+                "category_l1_missing": f"{self.category_l1_missing}/{normalized_unique}",
+                "per_market_counts": dict(self.per_market_counts),
+            },
+        }
+
+
 def compute_change_summary(
     *,
     fetched_markets: int,
     raw_count_total: int,
-    normalized_items: list[dict[str, Any]],
-    selected_items: list[dict[str, Any]],
+    normalized_items: Sequence[dict[str, Any]],
+    selected_items: Sequence[dict[str, Any]],
     dry_run: bool,
     push_result: str | dict[str, Any],
 ) -> dict[str, Any]:
-    normalized_unique = len(normalized_items)
-    listed_date_parsed = sum(1 for item in normalized_items if item.get("listed_date") is not None)
-    category_l1_missing = sum(1 for item in normalized_items if item.get("category_l1") is None)
-    per_market_counts: dict[str, int] = {}
-    for item in normalized_items:
-        market = str(item.get("market", "UNKNOWN"))
-        per_market_counts[market] = per_market_counts.get(market, 0) + 1
+    stats = SummaryStats(raw_count_total=raw_count_total)
+    if isinstance(normalized_items, StockBatch):
+        stats.add_batch(normalized_items)
+    else:
+        for item in normalized_items:
+            stats.add(item)
+    return stats.as_summary(
+        fetched_markets=fetched_markets,
+        limited_to=len(selected_items),
+        dry_run=dry_run,
+        push_result=push_result,
+    )
 
-    return {
-        "fetched_markets": fetched_markets,
-        "raw_count_total": raw_count_total,
-        "normalized_unique": normalized_unique,
-        "limited_to": len(selected_items),
-        "dry_run": dry_run,
-        "push_result": push_result,
-        "quality": {
-            "listed_date_parsed": f"{listed_date_parsed}/{normalized_unique}",
-            "category_l1_missing": f"{category_l1_missing}/{normalized_unique}",
-            "per_market_counts": per_market_counts,
-        },
-    }
 
+class RunReport:
+    """Console output, summary and metrics files of one sync run, shared by both engines.
 
-def sync_stocks(dry_run: bool, limit: int | None, verbose: bool = False) -> int:
-    raw_count_total = 0
-    push_result: str | dict[str, Any] = "not_started"
+    Holds the running ``SummaryStats``/``SyncMetrics`` and the ``push_result``; every exit
+    goes through ``finish`` so the ``summary`` line and metrics are always written.
+    """
 
-    def print_summary(
-        items_for_summary: list[dict[str, Any]], all_normalized: list[dict[str, Any]]
+    def __init__(
+        self,
+        *,
+        dry_run: bool,
+        verbose: bool,
+        full: bool,
+        on_summary: Callable[[dict[str, Any]], None] | None,
+        metrics_json: str | Path | None,
+        metrics_textfile: str | Path | None,
     ) -> None:
-        summary = compute_change_summary(
+        self.dry_run = dry_run
+        self.verbose = verbose
+        self.full = full
+        self.on_summary = on_summary
+        self.metrics_json = metrics_json
+        self.metrics_textfile = metrics_textfile
+        self.stats = SummaryStats()
+        self.metrics = SyncMetrics()
+        self.push_result: str | dict[str, Any] = "not_started"
+        self.rate_limiter: RateLimiter | None = None
+        self.limits_before: dict[str, dict[str, float]] = {}
+        self.fetch_workers = 1
+        self.fetch_started = time.perf_counter()
+        self.enricher: Enricher | None = None
+        self.enrich = False
+
+    def watch_rate_limiter(self, rate_limiter: RateLimiter) -> None:
+        """Report this limiter's counters, as a delta from now, in the fetch report/metrics."""
+        self.rate_limiter = rate_limiter
+        self.limits_before = rate_limiter.stats()
+
+    def _summary(self) -> dict[str, Any]:
+        return self.stats.as_summary(
             fetched_markets=len(MARKET_TYPES),
-            raw_count_total=raw_count_total,
-            normalized_items=all_normalized,
-            selected_items=items_for_summary,
-            dry_run=dry_run,
-            push_result=push_result,
-        )
-        summary["quality"] = json.dumps(
-            summary["quality"], ensure_ascii=False, separators=(",", ":")
+            limited_to=self.stats.normalized_unique,
+            dry_run=self.dry_run,
+            push_result=self.push_result,
         )
-        print("summary " + " ".join(f"{key}={summary[key]}" for key in summary))
 
-    _load_dotenv_if_available()
+    def print_summary(self) -> dict[str, Any]:
+        summary = self._summary()
+        if self.on_summary is not None:
+            self.on_summary(dict(summary))
+        quality = json.dumps(summary["quality"], ensure_ascii=False, separators=(",", ":"))
+        printed = {**summary, "quality": quality}
+        print("summary " + " ".join(f"{key}={printed[key]}" for key in printed))
+        return summary
 
-    backend_api_base = (
-        (os.getenv("BACKEND_API_BASE") or os.getenv("MYQUANT_BASE_URL") or "http://127.0.0.1:8000")
-        .strip()
-        .rstrip("/")
-    )
-    bridge_api_key = os.getenv("BRIDGE_API_KEY", "dev-bridge-key").strip() or "dev-bridge-key"
+    def finish(self, code: int) -> int:
+        self.metrics.detach()
+        summary = self.print_summary()
+        if self.metrics_json or self.metrics_textfile:
+            limits = (
+                rate_limit_delta(self.limits_before, self.rate_limiter.stats())
+                if self.rate_limiter is not None
+                else {}
+            )
+            self.metrics.add("total", records=self.stats.normalized_unique)
+            document = self.metrics.document(code, summary, rate_limits=limits)
+            try:
+                write_metrics(
+                    document, json_path=self.metrics_json, textfile_path=self.metrics_textfile
+                )
+            except OSError as exc:
+                print(f"Failed to write sync metrics: {exc}")
+        return code
 
-    try:
-        kiwoom = resolve_kiwoom_config()
-    except ValueError as exc:
-        print(str(exc))
-        print_summary([], [])
-        return 2
-    base_url = kiwoom.host_url
-    app_key = kiwoom.app_key
-    app_secret = kiwoom.app_secret
+    def failed(self, code: int, message: str, push_result: str | None = None) -> int:
+        print(message)
+        if push_result is not None:
+            self.push_result = push_result
+        return self.finish(code)
 
-    session = _create_retry_session()
+    def start_fetch(self, fetch_workers: int) -> None:
+        self.fetch_workers = fetch_workers
+        self.fetch_started = time.perf_counter()
 
-    try:
-        token_type, token = _fetch_token(session, base_url, app_key, app_secret)
-    except Exception as e:
-        print(f"Failed to fetch Kiwoom token: {e}")
-        print_summary([], [])
-        return 1
-
-    records_by_market: list[tuple[str, list[dict[str, Any]]]] = []
-    for mrkt_tp in MARKET_TYPES:
-        records = _fetch_market_list(session, base_url, token_type, token, mrkt_tp)
-        raw_count_total += len(records)
-        records_by_market.append((mrkt_tp, records))
-        if verbose:
-            print(f"mrkt_tp={mrkt_tp} received={len(records)}")
-
-    normalized_items = _normalize_and_dedup(records_by_market)
-    if verbose:
-        pre_summary = compute_change_summary(
-            fetched_markets=len(MARKET_TYPES),
-            raw_count_total=raw_count_total,
-            normalized_items=normalized_items,
-            selected_items=normalized_items,
-            dry_run=dry_run,
-            push_result=push_result,
-        )
-        quality = pre_summary["quality"]
+    def market_done(self, market: MarketStats) -> None:
+        self.metrics.add("fetch", records=market.raw_count, bytes=market.bytes)
+        self.metrics.set_seconds("fetch", time.perf_counter() - self.fetch_started)
+        if self.verbose:
+            print(
+                f"mrkt_tp={market.mrkt_tp} received={market.raw_count} "
+                f"elapsed_ms={market.elapsed * 1000:.0f} pages={market.pages} bytes={market.bytes}"
+            )
+
+    def report_fetch(self) -> None:
+        if self.enricher is not None and (self.enrich or self.verbose):
+            print(self.enricher.stats.as_line())
+        if not self.verbose:
+            return
+        fetch_elapsed = time.perf_counter() - self.fetch_started
+        print(f"fetch workers={self.fetch_workers} elapsed_ms={fetch_elapsed * 1000:.0f}")
+        limiter_stats = self.rate_limiter.stats() if self.rate_limiter is not None else {}
+        for api_id, limits in limiter_stats.items():
+            print(
+                f"rate_limit api_id={api_id} rate={limits['rate']:.2f}/s "
+                f"requests={limits['requests']} throttled={limits['throttled']} "
+                f"waited_ms={limits['waited'] * 1000:.0f}"
+            )
+        quality = self._summary()["quality"]
         print(
             "quality "
             f"listed_date_parsed={quality['listed_date_parsed']} "
@@ -353,61 +684,532 @@ def sync_stocks(dry_run: bool, limit: int | None, verbose: bool = False) -> int:
             f"per_market_counts={json.dumps(quality['per_market_counts'], ensure_ascii=False)}"
         )
 
-    items = normalized_items
-    if limit is not None:
-        items = items[:limit]
+    def dry_run_done(self, sample: list[dict[str, Any]]) -> int:
+        self.push_result = "skipped"
+        self.report_fetch()
+        print(f"total={self.stats.normalized_unique}")
+        print("change_summary=" + json.dumps(self._summary(), ensure_ascii=False))
+        print(json.dumps(sample, ensure_ascii=False, indent=2))
+        return self.finish(0)
 
-    push_result = "skipped"
+    def backend_down(self, backend_api_base: str) -> int:
+        return self.failed(
+            3,
+            f"Backend not running at {backend_api_base}. Start docker compose and verify with curl {backend_api_base}/health",
+            "health_check_failed",
+        )
 
-    if dry_run:
-        print(f"total={len(items)}")
-        print(
-            "change_summary="
-            + json.dumps(
-                compute_change_summary(
-                    fetched_markets=len(MARKET_TYPES),
-                    raw_count_total=raw_count_total,
-                    normalized_items=normalized_items,
-                    selected_items=items,
-                    dry_run=True,
-                    push_result=push_result,
-                ),
-                ensure_ascii=False,
+    def manifest_mismatch(self, algorithm: Any) -> int:
+        return self.failed(
+            4,
+            f"Backend manifest algorithm={algorithm} "
+            f"does not match bridge algorithm={MANIFEST_ALGORITHM}",
+            "manifest_algorithm_mismatch",
+        )
+
+    def manifest_failed(self, manifest_url: str, status_code: int | None) -> int:
+        return self.failed(
+            4,
+            f"Backend manifest failed url={manifest_url} status={status_code}",
+            f"manifest_error_status_{status_code}",
+        )
+
+    def reconciled(self, differing: list[str]) -> None:
+        if self.verbose:
+            print(f"reconcile differing_markets={','.join(differing) or '-'}")
+
+    def chunk_done(
+        self, index: int, size: int, counts: dict[str, int], elapsed: float, resumed: bool
+    ) -> None:
+        if not resumed:
+            self.metrics.add("upsert", seconds=elapsed, records=size)
+        if self.verbose:
+            print(
+                f"chunk={index} size={size} "
+                + " ".join(f"{key}={counts.get(key, 0)}" for key in COUNT_KEYS)
+                + (" resumed=1" if resumed else f" elapsed_ms={elapsed * 1000:.0f}")
+            )
+
+    def delta_done(self, delta: DeltaStream, removed_codes: list[str]) -> None:
+        if self.verbose:
+            print(
+                f"delta changed={delta.changed} unchanged={delta.unchanged} "
+                f"removed={len(removed_codes)} full={self.full}"
+            )
+
+    def pushed(self, result: dict[str, Any]) -> None:
+        print(json.dumps(result, ensure_ascii=False))
+        self.push_result = result
+
+    def upsert_failed(
+        self, upsert_url: str, status_code: int | None, checkpoint: UpsertCheckpoint
+    ) -> int:
+        if status_code == 401:
+            print(
+                f"Backend upsert failed url={upsert_url} status=401. "
+                "Check BRIDGE_API_KEY in root .env matches backend container env."
+            )
+        else:
+            print(f"Backend upsert failed url={upsert_url} status={status_code}")
+        if checkpoint.acked:
+            print(
+                f"acknowledged_chunks={len(checkpoint.acked)} saved to checkpoint; "
+                "rerun to resume from the first unacknowledged chunk"
+            )
+        self.push_result = f"upsert_error_status_{status_code}"
+        return self.finish(4)
+
+    def commit_archive(self, archive_writer: ArchiveWriter | None) -> None:
+        if archive_writer is None or not archive_writer.pages:
+            return
+        try:
+            archive_writer.commit()
+            print(
+                f"archive run={archive_writer.run_id} pages={archive_writer.pages} "
+                f"bytes={archive_writer.bytes} new_objects={archive_writer.new_objects}"
             )
+        except OSError as exc:
+            print(f"Failed to write response archive: {exc}")
+
+
+@dataclass(frozen=True)
+class BackendTarget:
+    """Backend API base URL and bridge API key, with the internal endpoints both engines call."""
+
+    api_base: str
+    api_key: str
+
+    @classmethod
+    def from_env(cls) -> BackendTarget:
+        api_base = (
+            (
+                os.getenv("BACKEND_API_BASE")
+                or os.getenv("MYQUANT_BASE_URL")
+                or "http://127.0.0.1:8000"
+            )
+            .strip()
+            .rstrip("/")
         )
-        print(json.dumps(items[:3], ensure_ascii=False, indent=2))
+        api_key = os.getenv("BRIDGE_API_KEY", "dev-bridge-key").strip() or "dev-bridge-key"
+        return cls(api_base, api_key)
+
+    @property
+    def health_url(self) -> str:
+        return f"{self.api_base}/health"
+
+    @property
+    def upsert_url(self) -> str:
+        return f"{self.api_base}/api/internal/stocks:upsert"
+
+    @property
+    def manifest_url(self) -> str:
+        return f"{self.api_base}/api/internal/stocks:manifest"
+
+    def upsert_headers(self) -> dict[str, str]:
+        return {"Content-Type": "application/json", "X-Bridge-Key": self.api_key}
+
+    def manifest_headers(self) -> dict[str, str]:
+        return {"X-Bridge-Key": self.api_key}
+
+
+def open_checkpoint(cache_dir: Path, upsert_url: str, resume: bool) -> UpsertCheckpoint:
+    """The run's upsert checkpoint: loaded to resume, otherwise cleared."""
+    checkpoint = UpsertCheckpoint.for_target(cache_dir, upsert_url)
+    if resume:
+        checkpoint.load()
     else:
-        if not _check_backend_health(backend_api_base):
-            print(
-                f"Backend not running at {backend_api_base}. Start docker compose and verify with curl {backend_api_base}/health"
+        checkpoint.clear()
+    return checkpoint
+
+
+def _complete_markets(
+    limit: int | None, markets: Iterable[MarketStats], replay: ArchiveReader | None
+) -> list[str | None]:
+    """Markets fetched in full this run; removals are only trustworthy for those."""
+    if limit is not None:
+        return []
+    return [
+        _map_market(market.mrkt_tp)
+        for market in markets
+        if market.raw_count and (replay is None or replay.is_complete(market.mrkt_tp))
+    ]
+
+
+def _removal_body(removed_codes: list[str], listed: dict[str, list[str]]) -> dict[str, Any] | None:
+    """Final upsert body: ``removed_codes`` and/or, in full snapshot mode, ``snapshot``."""
+    body: dict[str, Any] = {}
+    if removed_codes:
+        body["removed_codes"] = removed_codes
+    if listed:
+        body["snapshot"] = listed
+    return {"items": [], **body} if body else None
+
+
+def plan_removals(
+    report: RunReport,
+    delta: DeltaStream,
+    result: dict[str, Any],
+    *,
+    limit: int | None,
+    markets: Iterable[MarketStats],
+    replay: ArchiveReader | None,
+    full_snapshot: bool,
+) -> tuple[list[str], dict[str, Any] | None]:
+    """Once every chunk is pushed: report the fetch and delta, and return the removed codes
+    with the final removal request body (None when there is nothing to send)."""
+    report.report_fetch()
+    complete_markets = _complete_markets(limit, markets, replay)
+    removed_codes = delta.removed_codes(complete_markets)
+    report.delta_done(delta, removed_codes)
+    result["skipped_unchanged"] = delta.unchanged
+    body = _removal_body(
+        removed_codes, delta.listed_codes(complete_markets) if full_snapshot else {}
+    )
+    return removed_codes, body
+
+
+def commit_push(
+    report: RunReport,
+    snapshot: SnapshotStore,
+    delta: DeltaStream,
+    result: dict[str, Any],
+    removed_codes: list[str],
+    removal: dict[str, Any] | None,
+) -> None:
+    """Merge the removal response into ``result``, commit the snapshot and print the result."""
+    if removal is not None:
+        result["deactivated"] = int(removal.get("deactivated") or 0)
+        if isinstance(removal.get("snapshot"), dict):
+            result["snapshot"] = removal["snapshot"]
+    snapshot.commit_entries(delta.pushed_entries, removed_codes)
+    report.pushed(result)
+
+
+def open_replay(from_archive: str) -> ArchiveReader:
+    replay = ArchiveReader.open(resolve_archive_dir(resolve_bridge_cache_dir()), from_archive)
+    print(f"replay archive run={replay.run_id}")
+    return replay
+
+
+def load_enricher(
+    report: RunReport,
+    enrich: bool,
+    fetch_detail: Callable[[str], Any] | None,
+    concurrency: int,
+    ttl_hours: float,
+    budget: float,
+    **kwargs: Any,
+) -> Enricher | None:
+    """Enricher for the run: with ``enrich`` or whenever cached details exist to merge.
+
+    With ``enrich`` the caller has already checked ``resolve_detail_fields``.
+    """
+    cache = EnrichmentCache.for_cache_dir(resolve_bridge_cache_dir(), ttl_hours * 3600).load()
+    if not (enrich or cache.entries):
+        return None
+    report.enrich = enrich
+    report.enricher = Enricher(
+        cache,
+        fetch_detail=fetch_detail if enrich else None,
+        detail_fields=resolve_detail_fields() if enrich else None,
+        concurrency=concurrency,
+        budget=budget,
+        on_fetch=lambda seconds: report.metrics.add("enrich", seconds=seconds, records=1),
+        on_filled=report.stats.record_enriched,
+        **kwargs,
+    )
+    return report.enricher
+
+
+def sync_stocks(
+    dry_run: bool,
+    limit: int | None,
+    verbose: bool = False,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    push_concurrency: int = 1,
+    resume: bool = True,
+    full: bool = False,
+    reconcile: bool = False,
+    wire: str = "json",
+    full_snapshot: bool = False,
+    session: requests.Session | None = None,
+    client: KiwoomClient | None = None,
+    on_summary: Callable[[dict[str, Any]], None] | None = None,
+    metrics_json: str | Path | None = None,
+    metrics_textfile: str | Path | None = None,
+    archive: bool = False,
+    from_archive: str | None = None,
+    enrich: bool = False,
+    enrich_concurrency: int = DEFAULT_ENRICH_CONCURRENCY,
+    enrich_ttl_hours: float = DEFAULT_ENRICH_TTL_HOURS,
+    enrich_budget: float = DEFAULT_ENRICH_BUDGET,
+    engine: str = "threads",
+) -> int:
+    """Stream Kiwoom pages -> normalize -> dedup -> (delta) -> chunked upsert.
+
+    Items flow through generators end to end: pages are normalized as they arrive, chunks
+    are pushed while later pages are still being fetched, and ``limit`` stops fetching as
+    soon as that many unique items exist. Only per-code bookkeeping (seen codes, snapshot
+    hashes) grows with the universe; ``--reconcile`` buffers the normalized items because
+    the manifest comparison needs every record before diffing. ``wire="ndjson"`` sends
+    each upsert chunk as gzip-compressed NDJSON instead of a JSON object.
+
+    Kiwoom and backend calls share one pooled keep-alive session through ``KiwoomClient``;
+    ``session`` replaces the default one (e.g. one with instrumentation hooks) and
+    ``client`` reuses an already warm client and its session across runs. ``on_summary``
+    receives the final summary fields that are printed as the ``summary`` line.
+
+    Every run collects per-phase timings and HTTP counters (``SyncMetrics``); they are
+    written, with the summary, to ``metrics_json`` and/or ``metrics_textfile``
+    (Prometheus text format) whatever the exit code.
+
+    ``archive`` stores every raw ka10099 response of the run under the cache dir (see
+    ``ArchiveWriter``). ``from_archive`` (a run id or ``latest``) replays such a run
+    instead of calling Kiwoom: no Kiwoom configuration, token or network is needed, and
+    the replayed pages go through the same normalize -> delta -> push path.
+
+    ``enrich`` fills missing ``name_en``/``category_l1`` from per-code ka10001 details
+    (see ``Enricher``; response keys from ``KIWOOM_DETAIL_FIELDS``) before the delta, with
+    ``enrich_concurrency`` calls in flight, a per-code cache refreshed after
+    ``enrich_ttl_hours`` and no new calls after ``enrich_budget`` seconds. Cached details
+    are merged on every run, also without ``enrich``, so records never flip back to the
+    bare list values.
+
+    ``full_snapshot`` also sends the complete code list of every fully fetched market
+    (``snapshot`` in the last upsert request); the backend deactivates, in one statement,
+    every active code of those markets that is not listed, also codes this bridge never
+    pushed. Deactivation counts are reported in the result.
+
+    ``engine="asyncio"`` runs the same flow on one event loop with an aiohttp session (see
+    ``bridge.aio``) instead of threads over ``requests``; output and exit codes are the
+    same. It needs the ``async`` extra and does not use ``session``.
+    """
+    report = RunReport(
+        dry_run=dry_run,
+        verbose=verbose,
+        full=full,
+        on_summary=on_summary,
+        metrics_json=metrics_json,
+        metrics_textfile=metrics_textfile,
+    )
+    if engine not in ENGINES:
+        return report.failed(2, f"Unknown sync engine {engine!r}. Expected one of {ENGINES}.")
+    if engine == "asyncio":
+        try:
+            from .aio import sync_stocks_async
+        except ImportError as exc:
+            return report.failed(
+                2,
+                f"The asyncio engine needs aiohttp ({exc}). "
+                "Install it with: pip install 'myquant-bridge[async]'",
             )
-            push_result = "health_check_failed"
-            print_summary(items, normalized_items)
-            return 3
-
-        upsert_url = f"{backend_api_base}/api/internal/stocks:upsert"
-        upsert_headers = {
-            "Content-Type": "application/json",
-            "X-Bridge-Key": bridge_api_key,
-        }
-        payload = {"items": items}
+        return sync_stocks_async(
+            report,
+            limit=limit,
+            workers=workers,
+            chunk_size=chunk_size,
+            push_concurrency=push_concurrency,
+            resume=resume,
+            reconcile=reconcile,
+            wire=wire,
+            full_snapshot=full_snapshot,
+            client=client,
+            archive=archive,
+            from_archive=from_archive,
+            enrich_concurrency=enrich_concurrency,
+            enrich_ttl_hours=enrich_ttl_hours,
+            enrich_budget=enrich_budget,
+            enrich=enrich,
+        )
+
+    stats = report.stats
+    metrics = report.metrics
+
+    _load_dotenv_if_available()
+    backend = BackendTarget.from_env()
+    if enrich:
+        try:
+            resolve_detail_fields()
+        except ValueError as exc:
+            return report.failed(2, str(exc))
+
+    fetch_workers = max(1, min(workers, len(MARKET_TYPES)))
+    replay: ArchiveReader | None = None
+    archive_writer: ArchiveWriter | None = None
+    if from_archive:
+        try:
+            replay = open_replay(from_archive)
+        except ValueError as exc:
+            return report.failed(2, str(exc))
+        client = None
+        if session is None:
+            session = create_session(pool_settings(fetch_workers, push_concurrency))
+        metrics.attach(session)
+    else:
+        if client is None:
+            try:
+                client = create_kiwoom_client(
+                    fetch_workers,
+                    push_concurrency,
+                    session=session,
+                    enrich_concurrency=enrich_concurrency if enrich else 0,
+                )
+            except ValueError as exc:
+                return report.failed(2, str(exc))
+        session = client.session
+        report.watch_rate_limiter(client.rate_limiter)
+        metrics.attach(session)
+
+        try:
+            with metrics.phase("token"):
+                client.token()
+        except Exception as e:
+            return report.failed(1, f"Failed to fetch Kiwoom token: {e}")
+        if archive:
+            archive_writer = ArchiveWriter(resolve_archive_dir(resolve_bridge_cache_dir()))
+
+    try:
+        mount_backend_retries(session, backend, pool_settings(fetch_workers, push_concurrency))
+    except ValueError as exc:
+        return report.failed(2, str(exc))
+
+    # One extra slot so the backend health probe overlaps the market fetches.
+    executor = ThreadPoolExecutor(max_workers=fetch_workers + 1) if fetch_workers > 1 else None
+    health_future: Future[bool] | None = None
+
+    def check_backend_health() -> bool:
+        with metrics.phase("health_check"):
+            return _check_backend_health(backend.api_base)
 
+    if executor is not None and not dry_run:
+        health_future = executor.submit(check_backend_health)
+    report.start_fetch(fetch_workers)
+    stream = MarketStream(
+        replay or client, executor, on_market_done=report.market_done, archive=archive_writer
+    )
+
+    def market_pages() -> Iterator[tuple[str, list[dict[str, Any]]]]:
         try:
-            result = _post_json(session, upsert_url, upsert_headers, payload, timeout=30)
-            print(json.dumps(result, ensure_ascii=False))
-            push_result = result
+            yield from stream
+        except Exception as exc:
+            raise KiwoomFetchError(str(exc)) from exc
+
+    enricher = load_enricher(
+        report,
+        enrich,
+        client.fetch_stock_info if client is not None else None,
+        enrich_concurrency,
+        enrich_ttl_hours,
+        enrich_budget,
+    )
+
+    try:
+        items = _iter_unique_items(market_pages(), limit=limit, stats=stats, metrics=metrics)
+        if enricher is not None:
+            items = enricher.enrich(items)
+        if dry_run:
+            return _run_dry_run(items, report)
+
+        backend_healthy = (
+            health_future.result() if health_future is not None else check_backend_health()
+        )
+        if not backend_healthy:
+            return report.backend_down(backend.api_base)
+
+        upsert_url = backend.upsert_url
+        upsert_headers = backend.upsert_headers()
+        cache_dir = resolve_bridge_cache_dir()
+        snapshot = SnapshotStore.for_target(cache_dir, upsert_url).load()
+        source: Iterable[dict[str, Any]] = items
+
+        if reconcile:
+            source = StockBatch(items)
+            manifest_url = backend.manifest_url
+            manifest_headers = backend.manifest_headers()
+
+            def fetch_codes(markets: list[str]) -> dict[str, dict[str, str]]:
+                detail = _get_json(
+                    session,
+                    manifest_url,
+                    manifest_headers,
+                    {"markets": markets, "codes": "1"},
+                    timeout=30,
+                )
+                return detail.get("codes") or {}
+
+            try:
+                manifest = _get_json(session, manifest_url, manifest_headers, None, timeout=30)
+                if manifest.get("algorithm") != MANIFEST_ALGORITHM:
+                    return report.manifest_mismatch(manifest.get("algorithm"))
+                entries, differing = reconcile_entries(
+                    source, manifest.get("markets") or {}, fetch_codes
+                )
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as exc:
+                status_code = getattr(getattr(exc, "response", None), "status_code", None)
+                return report.manifest_failed(manifest_url, status_code)
+            # The backend is the source of truth: replace the local snapshot entirely.
+            snapshot.entries = entries
+            report.reconciled(differing)
+
+        delta = snapshot.stream_diff(source, full=full)
+
+        checkpoint = open_checkpoint(cache_dir, upsert_url, resume)
+
+        def post_chunk(chunk: StockBatch) -> dict[str, Any]:
+            headers = with_idempotency_key(upsert_headers)
+            if wire == "ndjson":
+                return _post_ndjson(session, upsert_url, headers, chunk, timeout=30)
+            return _post_json(session, upsert_url, headers, {"items": chunk}, timeout=30)
+
+        try:
+            result: dict[str, Any] = push_in_chunks(
+                delta,
+                post=post_chunk,
+                chunk_size=chunk_size,
+                max_in_flight=push_concurrency,
+                checkpoint=checkpoint,
+                on_chunk=report.chunk_done,
+                new_chunk=StockBatch,
+            )
+            removed_codes, removal_body = plan_removals(
+                report,
+                delta,
+                result,
+                limit=limit,
+                markets=stream.markets.values(),
+                replay=replay,
+                full_snapshot=full_snapshot,
+            )
+            removal = None
+            if removal_body is not None:
+                with metrics.phase("upsert"):
+                    removal = _post_json(
+                        session,
+                        upsert_url,
+                        with_idempotency_key(upsert_headers),
+                        removal_body,
+                        timeout=30,
+                    )
+            commit_push(report, snapshot, delta, result, removed_codes, removal)
         except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as exc:
             status_code = getattr(getattr(exc, "response", None), "status_code", None)
-            if status_code == 401:
-                print(
-                    f"Backend upsert failed url={upsert_url} status=401. "
-                    "Check BRIDGE_API_KEY in root .env matches backend container env."
-                )
-            else:
-                print(f"Backend upsert failed url={upsert_url} status={status_code}")
-            push_result = f"upsert_error_status_{status_code}"
-            print_summary(items, normalized_items)
-            return 4
-
-    print_summary(items, normalized_items)
-    return 0
+            return report.upsert_failed(upsert_url, status_code, checkpoint)
+    except KiwoomFetchError as exc:
+        return report.failed(1, f"Failed to fetch Kiwoom stock list: {exc}", "fetch_failed")
+    finally:
+        stream.close()
+        if executor is not None:
+            executor.shutdown(wait=True)
+        metrics.detach()
+        report.commit_archive(archive_writer)
+
+    return report.finish(0)
+
+
+def _run_dry_run(items: Iterable[dict[str, Any]], report: RunReport) -> int:
+    sample: list[dict[str, Any]] = []
+    for item in items:
+        if len(sample) < 3:
+            sample.append(item)
+    return report.dry_run_done(sample)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from .config import resolve_bridge_cache_dir
+from .storage import read_json_file, remove_file, write_private_file
+
+# Kiwoom reports expires_dt as a naive KST timestamp (YYYYMMDDHHMMSS).
+KST = timezone(timedelta(hours=9))
+DEFAULT_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    token_type: str
+    token: str
+    expires_at: datetime
+
+
+def parse_token_expiry(data: Mapping[str, Any], now: datetime) -> datetime | None:
+    """Return the token expiry as an aware UTC datetime, or None when unknown."""
+    expires_dt = str(data.get("expires_dt") or data.get("expiresDt") or "").strip()
+    if expires_dt:
+        try:
+            parsed = datetime.strptime(expires_dt, "%Y%m%d%H%M%S")
+        except ValueError:
+            parsed = None
+        if parsed is not None:
+            return parsed.replace(tzinfo=KST).astimezone(timezone.utc)
+
+    expires_in = data.get("expires_in")
+    if expires_in is not None:
+        try:
+            return now + timedelta(seconds=int(expires_in))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def resolve_token_cache_dir(env: Mapping[str, str] | None = None) -> Path | None:
+    """Resolve the cache directory; None means caching is disabled."""
+    source = os.environ if env is None else env
+
+    enabled = (source.get("KIWOOM_TOKEN_CACHE", "1") or "1").strip().lower()
+    if enabled in {"0", "false", "no", "off"}:
+        return None
+
+    explicit = (source.get("KIWOOM_TOKEN_CACHE_DIR") or "").strip()
+    if explicit:
+        return Path(explicit).expanduser()
+    return resolve_bridge_cache_dir(source)
+
+
+class TokenCache:
+    """On-disk Kiwoom access token cache keyed by mode and app key.
+
+    The app key is only stored as a hash in the filename. Files are written with
+    0600 permissions inside a 0700 directory. Tokens are treated as expired
+    ``refresh_margin`` before Kiwoom's ``expires_dt`` so they are refreshed proactively.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        app_key: str,
+        cache_dir: Path,
+        refresh_margin: timedelta = DEFAULT_REFRESH_MARGIN,
+        clock: Callable[[], datetime] | None = None,
+    ) -> None:
+        key_hash = hashlib.sha256(app_key.encode("utf-8")).hexdigest()[:16]
+        self.path = Path(cache_dir) / f"kiwoom-token-{mode}-{key_hash}.json"
+        self.refresh_margin = refresh_margin
+        self._clock = clock or (lambda: datetime.now(timezone.utc))
+
+    @classmethod
+    def from_env(
+        cls, mode: str, app_key: str, env: Mapping[str, str] | None = None
+    ) -> TokenCache | None:
+        cache_dir = resolve_token_cache_dir(env)
+        if cache_dir is None:
+            return None
+        return cls(mode, app_key, cache_dir)
+
+    def now(self) -> datetime:
+        return self._clock()
+
+    def load(self) -> CachedToken | None:
+        data = read_json_file(self.path)
+        try:
+            cached = CachedToken(
+                token_type=str(data["token_type"]),
+                token=str(data["token"]),
+                expires_at=datetime.fromisoformat(data["expires_at"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+
+        if cached.expires_at - self.refresh_margin <= self.now():
+            return None
+        return cached
+
+    def store(self, token_type: str, token: str, data: Mapping[str, Any]) -> CachedToken | None:
+        """Persist a freshly issued token; tokens without a known expiry are not cached."""
+        expires_at = parse_token_expiry(data, self.now())
+        if expires_at is None:
+            return None
+
+        cached = CachedToken(token_type=token_type, token=token, expires_at=expires_at)
+        payload = json.dumps(
+            {
+                "token_type": cached.token_type,
+                "token": cached.token,
+                "expires_at": cached.expires_at.isoformat(),
+            }
+        )
+        try:
+            write_private_file(self.path, payload)
+        except OSError:
+            # A read-only or missing cache dir must never break token issuance.
+            return None
+        return cached
+
+    def invalidate(self) -> None:
+        remove_file(self.path)
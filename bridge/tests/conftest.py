@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolate_bridge_cache(monkeypatch, tmp_path):
+    # Token cache and upsert checkpoints must never touch the developer's real cache dir.
+    monkeypatch.setenv("BRIDGE_CACHE_DIR", str(tmp_path / "bridge-cache"))
+    monkeypatch.delenv("KIWOOM_TOKEN_CACHE_DIR", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_rate_limiter(monkeypatch):
+    # A fresh, effectively unlimited Kiwoom rate limiter per test; limiter tests build their own.
+    from bridge import ratelimit
+
+    monkeypatch.setenv("KIWOOM_RATE_LIMITS", "default=10000,au10001=10000")
+    ratelimit.reset_shared_rate_limiter()
+    yield
+    ratelimit.reset_shared_rate_limiter()
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from bridge import cli, ratelimit, sync  # noqa: E402
+from bridge.aio import (  # noqa: E402
+    HTTP_ERRORS,
+    AsyncChunkPusher,
+    AsyncKiwoomClient,
+    AsyncSession,
+)
+from bridge.enrich import Enricher, EnrichmentCache  # noqa: E402
+from bridge.push import UpsertCheckpoint  # noqa: E402
+from bridge.standin import (  # noqa: E402
+    STANDIN_TOKEN,
+    StandInConfig,
+    StandInServer,
+    synthetic_record,
+)
+
+
+class FakeBackend:
+    """Minimal backend: ``/health`` and the upsert endpoint, optionally failing a chunk."""
+
+    def __init__(self, fail_chunk: int | None = None, fail_status: int = 500) -> None:
+        self.fail_chunk = fail_chunk
+        self.fail_status = fail_status
+        self.chunks: list[list[dict]] = []
+        self.keys: list[str | None] = []
+        self.lock = threading.Lock()
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(200, {"status": "ok"})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path == "/oauth2/token":
+                    return self._reply(403, {"return_code": 3, "return_msg": "denied"})
+                if self.headers.get("Content-Encoding") == "gzip":
+                    items = [json.loads(line) for line in gzip.decompress(raw).splitlines()]
+                else:
+                    items = json.loads(raw)["items"]
+                with backend.lock:
+                    index = len(backend.chunks) + 1
+                    if index == backend.fail_chunk:
+                        return self._reply(backend.fail_status, {"detail": "boom"})
+                    backend.chunks.append(items)
+                    backend.keys.append(self.headers.get("Idempotency-Key"))
+                self._reply(200, {"received": len(items), "inserted": len(items)})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> FakeBackend:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def codes(self) -> list[str]:
+        return sorted(item["code"] for chunk in self.chunks for item in chunk)
+
+
+def _configure(monkeypatch, kiwoom_url, backend_url="http://127.0.0.1:9"):
+    monkeypatch.setenv("KIWOOM_HOST_URL", kiwoom_url)
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("BACKEND_API_BASE", backend_url)
+
+
+def _lines(output):
+    # Timings differ between runs; everything else must match line for line.
+    return [line for line in output.splitlines() if "elapsed_ms" not in line]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"dry_run": True, "limit": None, "verbose": True, "workers": 3},
+        {"dry_run": True, "limit": 9, "workers": 1},
+        {
+            "dry_run": False,
+            "limit": None,
+            "workers": 3,
+            "chunk_size": 4,
+            "push_concurrency": 2,
+            "full_snapshot": True,
+        },
+        {"dry_run": False, "limit": None, "chunk_size": 5, "wire": "ndjson"},
+    ],
+)
+def test_asyncio_engine_matches_threads_engine(monkeypatch, tmp_path, capsys, options):
+    config = StandInConfig(market_sizes={"0": 11, "10": 6, "50": 2}, page_size=4)
+    outputs, pushed, keys = {}, {}, {}
+    with StandInServer(config) as server:
+        for engine in sync.ENGINES:
+            monkeypatch.setenv("BRIDGE_CACHE_DIR", str(tmp_path / engine))
+            ratelimit.reset_shared_rate_limiter()
+            with FakeBackend() as backend:
+                _configure(monkeypatch, server.url, backend.url)
+                assert sync.sync_stocks(**options, engine=engine) == 0
+            outputs[engine] = _lines(capsys.readouterr().out)
+            pushed[engine] = backend.codes
+            keys[engine] = backend.keys
+
+    assert outputs["asyncio"] == outputs["threads"]
+    assert pushed["asyncio"] == pushed["threads"]
+    if not options["dry_run"]:
+        assert len(pushed["asyncio"]) == 19
+        # Every upsert request carries its own idempotency key.
+        for engine_keys in keys.values():
+            assert all(engine_keys) and len(set(engine_keys)) == len(engine_keys)
+
+
+def test_asyncio_upsert_failure_checkpoints_and_resumes(monkeypatch, capsys):
+    config = StandInConfig(market_sizes={"0": 10, "10": 0, "50": 0}, page_size=4)
+    with StandInServer(config) as server:
+        with FakeBackend(fail_chunk=2, fail_status=400) as backend:
+            _configure(monkeypatch, server.url, backend.url)
+            code = sync.sync_stocks(dry_run=False, limit=None, chunk_size=4, engine="asyncio")
+            output = capsys.readouterr().out
+
+            assert code == 4
+            assert "status=400" in output
+            assert "push_result=upsert_error_status_400" in output
+            assert "acknowledged_chunks=1 saved to checkpoint" in output
+
+            backend.fail_chunk = None
+            assert sync.sync_stocks(dry_run=False, limit=None, chunk_size=4, engine="asyncio") == 0
+            output = capsys.readouterr().out
+
+    # The first chunk was not sent again.
+    assert [len(chunk) for chunk in backend.chunks] == [4, 4, 2]
+    assert '"resumed_chunks": 1' in output
+
+
+def test_asyncio_token_and_backend_failures_keep_exit_codes(monkeypatch, capsys):
+    config = StandInConfig(market_sizes={"0": 3, "10": 0, "50": 0}, page_size=4)
+    with FakeBackend() as backend, StandInServer(config) as server:
+        _configure(monkeypatch, backend.url, backend.url)
+        assert sync.sync_stocks(dry_run=True, limit=None, engine="asyncio") == 1
+        assert "Failed to fetch Kiwoom token: Kiwoom token HTTP error" in capsys.readouterr().out
+
+        _configure(monkeypatch, server.url)
+        assert sync.sync_stocks(dry_run=False, limit=None, engine="asyncio") == 3
+        assert "push_result=health_check_failed" in capsys.readouterr().out
+
+    monkeypatch.delenv("KIWOOM_APP_KEY")
+    assert sync.sync_stocks(dry_run=True, limit=None, engine="asyncio") == 2
+    assert sync.sync_stocks(dry_run=True, limit=None, engine="fibers") == 2
+
+
+def test_async_client_refreshes_token_and_enriches_details(monkeypatch, tmp_path):
+    monkeypatch.setenv("KIWOOM_RATE_LIMITS", "default=10000,au10001=10000,ka10001=10000")
+    config = StandInConfig(market_sizes={"0": 6, "10": 0, "50": 0}, page_size=4)
+
+    async def run(server):
+        async with AsyncSession() as session:
+            client = AsyncKiwoomClient(server.url, "key", "secret", session)
+            pages = [page async for page in client.iter_stock_list_pages("0")]
+            # A token revoked early is reissued once and the call retried.
+            client._token = ("Bearer", "revoked")
+            detail = await client.fetch_stock_info("000001")
+            enricher = Enricher(
+                EnrichmentCache(tmp_path / "cache.json", ttl=3600),
+                client.fetch_stock_info,
+                {"name_en": "stk_nm_eng"},
+                concurrency=3,
+                budget=None,
+                fetch_errors=(*Enricher.FETCH_ERRORS, *HTTP_ERRORS),
+            )
+            items = [{"code": record["code"], "name_en": None} for page in pages for record in page]
+            enriched = await enricher.enrich_async(items + [{"code": "999999", "name_en": None}])
+            return pages, client._token, detail, enriched, enricher.stats
+
+    with StandInServer(config) as server:
+        pages, token, detail, enriched, stats = asyncio.run(run(server))
+        requests_by_status = server.stats.as_dict()["requests"]
+
+    assert [len(page) for page in pages] == [4, 2]
+    assert token == ("Bearer", STANDIN_TOKEN) and detail["return_code"] == 0
+    assert requests_by_status["ka10001 401"] == 1
+    assert [item["code"] for item in enriched][:6] == [r["code"] for page in pages for r in page]
+    assert all(item["name_en"] for item in enriched[:6])
+    assert stats.fetched == 6 and stats.failed == 1
+
+
+def test_async_chunk_pusher_stops_after_a_failure(tmp_path):
+    posted = []
+
+    async def post(chunk):
+        await asyncio.sleep(0.01 if len(posted) == 0 else 0)
+        posted.append(len(chunk))
+        if len(posted) == 2:
+            raise RuntimeError("down")
+        return {"received": len(chunk)}
+
+    async def run():
+        pusher = AsyncChunkPusher(
+            post, chunk_size=2, max_in_flight=2, checkpoint=UpsertCheckpoint(tmp_path / "c.json")
+        )
+        items = (sync._normalize_ka10099_item(synthetic_record("0", i), "0") for i in range(10))
+        accepted = await pusher.add(items)
+        with pytest.raises(RuntimeError, match="down"):
+            await pusher.finish()
+        return accepted, pusher.checkpoint
+
+    accepted, checkpoint = asyncio.run(run())
+
+    assert accepted is False
+    assert len(posted) < 5
+    assert len(checkpoint.acked) == len(posted) - 1
+
+
+def test_cli_passes_the_engine(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sync, "sync_stocks", lambda **kwargs: calls.append(kwargs) or 0)
+
+    assert cli.main(["sync", "--dry-run", "--engine", "asyncio"]) == 0
+    assert calls[0]["engine"] == "asyncio"
+    with pytest.raises(SystemExit):
+        cli.main(["sync", "--engine", "gevent"])
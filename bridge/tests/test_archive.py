@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from bridge import sync
+from bridge.archive import ArchiveReader, ArchiveWriter, list_runs, resolve_archive_dir
+from bridge.config import resolve_bridge_cache_dir
+from bridge.kiwoom import PageStats
+from bridge.standin import StandInConfig, StandInServer
+
+
+def _body(codes):
+    return json.dumps({"list": [{"code": code, "name": f"N{code}"} for code in codes]}).encode()
+
+
+def test_writer_deduplicates_objects_and_reader_replays_pages(tmp_path):
+    writer = ArchiveWriter(tmp_path, run_id="r1")
+    writer.add_page("0", _body(["A", "B"]), "k2")
+    writer.add_page("0", _body(["C"]), None)
+    writer.add_page("10", _body(["A", "B"]), "k2")
+    writer.commit()
+
+    assert writer.pages == 3
+    assert writer.new_objects == 2
+    assert len(list((tmp_path / "objects").rglob("*.json.gz"))) == 2
+
+    reader = ArchiveReader.open(tmp_path, "latest")
+    stats = PageStats()
+    pages = list(reader.iter_stock_list_pages("0", stats=stats))
+
+    assert reader.run_id == "r1"
+    assert [[record["code"] for record in page] for page in pages] == [["A", "B"], ["C"]]
+    assert stats.pages == 2 and stats.bytes == len(_body(["A", "B"])) + len(_body(["C"]))
+    assert reader.is_complete("0") is True
+    # The KOSDAQ fetch stopped with a continuation key pending; KONEX was never fetched.
+    assert reader.is_complete("10") is False
+    assert reader.is_complete("50") is False
+    assert list(reader.iter_stock_list_pages("50")) == []
+
+
+def test_run_ids_are_unique_and_sorted(tmp_path):
+    first = ArchiveWriter(tmp_path)
+    first.add_page("0", _body(["A"]), None)
+    first.commit()
+    second = ArchiveWriter(tmp_path)
+    second.created_at = first.created_at
+    second.run_id = second._new_run_id()
+    second.add_page("0", _body(["A"]), None)
+    second.commit()
+
+    assert second.run_id == f"{first.run_id}-2"
+    assert list_runs(tmp_path) == [first.run_id, second.run_id]
+
+
+def test_reader_rejects_missing_runs_and_corrupt_objects(tmp_path):
+    with pytest.raises(ValueError, match="No archived runs"):
+        ArchiveReader.open(tmp_path, "latest")
+
+    writer = ArchiveWriter(tmp_path, run_id="r1")
+    digest = writer.add_page("0", _body(["A"]), None)
+    writer.commit()
+    with pytest.raises(ValueError, match="not found"):
+        ArchiveReader.open(tmp_path, "r2")
+
+    path = tmp_path / "objects" / digest[:2] / f"{digest}.json.gz"
+    path.write_bytes(gzip.compress(_body(["B"])))
+    with pytest.raises(ValueError, match="does not match its hash"):
+        list(ArchiveReader.open(tmp_path, "r1").iter_stock_list_pages("0"))
+
+
+def test_archived_run_replays_without_kiwoom(monkeypatch, capsys):
+    config = StandInConfig(market_sizes={"0": 7, "10": 5, "50": 2}, page_size=3)
+    with StandInServer(config) as server:
+        monkeypatch.setenv("KIWOOM_HOST_URL", server.url)
+        monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+        monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+        assert sync.sync_stocks(dry_run=True, limit=None, workers=3, archive=True) == 0
+    live = capsys.readouterr().out
+
+    archive_dir = resolve_archive_dir(resolve_bridge_cache_dir())
+    run_id = list_runs(archive_dir)[-1]
+    assert f"archive run={run_id} pages=6 " in live
+
+    # No Kiwoom configuration and no server: the replay must not touch the network.
+    for name in ("KIWOOM_HOST_URL", "KIWOOM_APP_KEY", "KIWOOM_APP_SECRET"):
+        monkeypatch.delenv(name)
+    assert sync.sync_stocks(dry_run=True, limit=None, from_archive=run_id) == 0
+    replayed = capsys.readouterr().out
+
+    assert f"replay archive run={run_id}" in replayed
+    live_lines = [line for line in live.splitlines() if not line.startswith("archive ")]
+    assert replayed.splitlines()[1:] == live_lines
+
+
+def test_replay_of_incomplete_market_never_deactivates_it(monkeypatch):
+    monkeypatch.setenv("BACKEND_API_BASE", "http://localhost:8000")
+    writer = ArchiveWriter(resolve_archive_dir(resolve_bridge_cache_dir()), run_id="partial")
+    writer.add_page("0", _body(["000001"]), None)
+    writer.add_page("10", _body(["100001"]), "more")
+    writer.commit()
+    snapshot = sync.SnapshotStore.for_target(
+        resolve_bridge_cache_dir(), "http://localhost:8000/api/internal/stocks:upsert"
+    )
+    snapshot.commit_entries(
+        {
+            "000002": {"hash": "h", "market": "KOSPI"},
+            "100002": {"hash": "h", "market": "KOSDAQ"},
+        },
+        [],
+    )
+    posted = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        posted.append(body)
+        return {"received": len(body["items"])}
+
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, from_archive="partial") == 0
+    assert posted[-1]["removed_codes"] == ["000002"]
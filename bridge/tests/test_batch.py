@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import gzip
+import json
+import tracemalloc
+
+from bridge import sync
+from bridge.batch import StockBatch
+from bridge.microbench import generate_pages
+from bridge.push import chunk_digest, iter_chunks
+
+
+def _items():
+    return [
+        {
+            "code": "005930",
+            "name_kr": '삼성"전자',
+            "name_en": "Samsung Electronics",
+            "market": "KOSPI",
+            "security_type": "COMMON_STOCK",
+            "mrkt_tp_raw": "0",
+            "market_code_raw": "0",
+            "category_l1": "전기전자",
+            "category_l2": None,
+            "is_active": True,
+            "listed_date": "1975-06-11",
+            "delisted_date": None,
+        },
+        {
+            "code": "091990",
+            "name_kr": "셀트리온헬스케어\t",
+            "name_en": None,
+            "market": "KOSDAQ",
+            "security_type": "ETF",
+            "mrkt_tp_raw": "10",
+            "market_code_raw": None,
+            "category_l1": None,
+            "category_l2": "외국기업",
+            "is_active": False,
+            "listed_date": None,
+            "delisted_date": "2023-12-27",
+        },
+    ]
+
+
+def test_batch_round_trips_items_and_slices():
+    items = _items()
+    batch = StockBatch(items)
+
+    assert len(batch) == 2
+    assert list(batch) == items
+    assert batch[-1] == items[1]
+    assert list(batch[:1]) == items[:1]
+    assert batch[1:].vocabularies is batch.vocabularies
+    assert [item["code"] for item in batch] == ["005930", "091990"]
+
+
+def test_batch_encoders_match_json_dumps():
+    items = _items()
+    batch = StockBatch(items)
+
+    compact = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+    assert batch.encode_json() == compact
+    lines = gzip.decompress(batch.encode_ndjson()).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == items
+    assert StockBatch().encode_json() == "[]"
+
+
+def test_add_unique_keeps_first_seen_code():
+    batch = StockBatch()
+    first, duplicate = _items()[0], dict(_items()[0], name_kr="dup")
+
+    assert batch.add_unique(first) is True
+    assert batch.add_unique(duplicate) is False
+    batch.append(_items()[1])
+    assert batch.has_code("091990")
+    assert [item["name_kr"] for item in batch] == ['삼성"전자', "셀트리온헬스케어\t"]
+
+
+def test_batch_summary_matches_per_item_stats():
+    batch = sync._normalize_and_dedup(generate_pages(3000, seed=5))
+    per_item = sync.SummaryStats()
+    for item in batch:
+        per_item.add(item)
+    columnar = sync.SummaryStats()
+    columnar.add_batch(batch)
+
+    assert isinstance(batch, StockBatch)
+    assert columnar == per_item
+
+
+def test_batch_uses_a_fraction_of_list_of_dicts_memory():
+    items = list(sync._iter_unique_items(generate_pages(20000, seed=1)))
+
+    tracemalloc.start()
+    as_dicts = [dict(item) for item in items]
+    dicts_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    batch = StockBatch(items)
+    batch_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(batch) == len(as_dicts)
+    assert batch_bytes * 4 < dicts_bytes
+
+
+def test_batch_chunks_have_stable_digest_and_post_as_json_bytes():
+    chunks = list(iter_chunks(_items() * 3, 4, StockBatch))
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+    assert chunk_digest(chunks[1]) == chunk_digest(StockBatch(_items()))
+
+    sent = {}
+
+    class Response:
+        ok = True
+
+        def json(self):
+            return {"received": 2}
+
+    class Session:
+        def post(self, url, headers=None, data=None, json=None, timeout=None):
+            sent.update(data=data, json=json)
+            return Response()
+
+    result = sync._post_json(Session(), "http://b", {}, {"items": chunks[1]}, timeout=5)
+
+    assert result == {"received": 2}
+    assert sent["json"] is None
+    assert json.loads(sent["data"]) == {"items": _items()}
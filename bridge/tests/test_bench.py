@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import pytest
+import requests
+
+from bridge import cli
+from bridge.bench import percentile, run_benchmark
+from bridge.standin import STANDIN_TOKEN, StandInConfig, StandInServer, parse_market_sizes
+
+
+def _list(server, mrkt_tp, next_key=None):
+    headers = {"api-id": "ka10099", "authorization": f"Bearer {STANDIN_TOKEN}"}
+    if next_key:
+        headers.update({"cont-yn": "Y", "next-key": next_key})
+    return requests.post(
+        f"{server.url}/api/dostk/stkinfo", json={"mrkt_tp": mrkt_tp}, headers=headers, timeout=5
+    )
+
+
+def test_standin_pages_synthetic_universe():
+    config = StandInConfig(market_sizes={"0": 5, "10": 0}, page_size=2)
+    with StandInServer(config) as server:
+        token = requests.post(f"{server.url}/oauth2/token", json={}, timeout=5).json()
+        codes, next_key = [], None
+        while True:
+            response = _list(server, "0", next_key)
+            codes.extend(record["code"] for record in response.json()["list"])
+            if response.headers["cont-yn"] != "Y":
+                break
+            next_key = response.headers["next-key"]
+        empty = _list(server, "10").json()["list"]
+        unauthorized = requests.post(
+            f"{server.url}/api/dostk/stkinfo", json={"mrkt_tp": "0"}, timeout=5
+        )
+        stats = server.stats.as_dict()
+
+    assert token["token"] == STANDIN_TOKEN
+    assert codes == ["000000", "000001", "000002", "000003", "000004"]
+    assert empty == []
+    assert unauthorized.status_code == 401
+    assert stats["requests"]["ka10099 200"] == 4
+    assert stats["records_served"] == 5
+    # Keep-alive is off for bare requests.post calls: one connection per request.
+    assert stats["connections"] == 6
+
+
+def test_standin_injects_429_and_5xx():
+    with StandInServer(StandInConfig(rate_429=1.0, retry_after="7")) as server:
+        throttled = _list(server, "0")
+    with StandInServer(StandInConfig(rate_5xx=1.0)) as server:
+        failing = _list(server, "0")
+
+    assert throttled.status_code == 429
+    assert throttled.headers["Retry-After"] == "7"
+    assert failing.status_code == 503
+
+
+def test_parse_market_sizes_validates_entries():
+    assert parse_market_sizes("0=10, 50=3") == {"0": 10, "50": 3}
+    for bad in ("8=10", "0=-1", "0=100000", "0"):
+        with pytest.raises(ValueError, match="Invalid universe entry"):
+            parse_market_sizes(bad)
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_benchmark_dry_run_reports_phases_and_reuses_connections():
+    config = StandInConfig(market_sizes={"0": 30, "10": 20, "50": 5}, page_size=10)
+
+    report = run_benchmark(config, runs=2, dry_run=True)
+
+    assert report["exit_codes"] == [0, 0]
+    assert report["records"] == 55
+    assert report["run"]["count"] == 2
+    assert report["records_per_s"]["p50"] > 0
+    assert report["phases"]["kiwoom_au10001"]["count"] == 2
+    assert report["phases"]["kiwoom_ka10099"]["count"] == 2 * (3 + 2 + 1)
+    assert report["kiwoom"]["records_served"] == 110
+    # Each run reuses keep-alive connections instead of opening one per page.
+    assert report["kiwoom"]["connections"] < report["phases"]["kiwoom_ka10099"]["count"]
+
+
+def test_benchmark_429s_reach_the_rate_limiter():
+    config = StandInConfig(market_sizes={"0": 40}, page_size=10, rate_429=0.3, seed=3)
+
+    report = run_benchmark(config, runs=1, dry_run=True)
+
+    assert report["exit_codes"] == [0]
+    statuses = report["phases"]["kiwoom_ka10099"]["status"]
+    assert statuses["429"] == report["kiwoom"]["requests"]["ka10099 429"]
+    # Four pages for market 0 plus one empty page each for markets 10 and 50.
+    assert statuses["200"] == 6
+
+
+def test_cli_bench_rejects_bad_universe(capsys):
+    assert cli.main(["bench", "--universe", "7=10"]) == 2
+    assert "Invalid universe entry" in capsys.readouterr().out
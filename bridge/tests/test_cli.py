@@ -6,16 +6,19 @@ import types
 import pytest
 
 from bridge import cli
+from bridge.config import resolve_bridge_cache_dir
+from bridge.storage import FileLock
 
 
 def _install_fake_sync_module(monkeypatch, calls):
     module = types.ModuleType("bridge.sync")
 
-    def fake_sync_stocks(*, dry_run, limit, verbose):
-        calls.append({"dry_run": dry_run, "limit": limit, "verbose": verbose})
+    def fake_sync_stocks(*, dry_run, limit, verbose, **options):
+        calls.append({"dry_run": dry_run, "limit": limit, "verbose": verbose, **options})
         return 0
 
     module.sync_stocks = fake_sync_stocks
+    module.sync_lock = lambda: FileLock(resolve_bridge_cache_dir() / "sync.lock")
     monkeypatch.setitem(sys.modules, "bridge.sync", module)
 
 
@@ -26,7 +29,30 @@ def test_main_sync_supports_dry_run(monkeypatch):
     code = cli.main(["sync", "--dry-run", "--limit", "5", "--verbose"])
 
     assert code == 0
-    assert calls == [{"dry_run": True, "limit": 5, "verbose": True}]
+    assert calls == [
+        {
+            "dry_run": True,
+            "limit": 5,
+            "verbose": True,
+            "workers": 1,
+            "chunk_size": 500,
+            "push_concurrency": 1,
+            "resume": True,
+            "full": False,
+            "reconcile": False,
+            "wire": "json",
+            "full_snapshot": False,
+            "engine": "threads",
+            "metrics_json": None,
+            "metrics_textfile": None,
+            "archive": False,
+            "from_archive": None,
+            "enrich": False,
+            "enrich_concurrency": 4,
+            "enrich_ttl_hours": 168.0,
+            "enrich_budget": 300.0,
+        }
+    ]
 
 
 def test_main_sync_stocks_alias_supported(monkeypatch):
@@ -36,7 +62,8 @@ def test_main_sync_stocks_alias_supported(monkeypatch):
     code = cli.main(["sync-stocks", "--no-push"])
 
     assert code == 0
-    assert calls == [{"dry_run": True, "limit": None, "verbose": False}]
+    assert calls[0]["dry_run"] is True
+    assert calls[0]["limit"] is None
 
 
 def test_main_rejects_invalid_limit(monkeypatch, capsys):
@@ -50,6 +77,133 @@ def test_main_rejects_invalid_limit(monkeypatch, capsys):
     assert calls == []
 
 
+def test_main_sync_passes_workers(monkeypatch):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    code = cli.main(["sync", "--workers", "3"])
+
+    assert code == 0
+    assert calls[0]["workers"] == 3
+
+
+def test_main_passes_chunked_push_options(monkeypatch):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    code = cli.main(["sync", "--chunk-size", "200", "--push-concurrency", "4", "--no-resume"])
+
+    assert code == 0
+    assert calls[0]["chunk_size"] == 200
+    assert calls[0]["push_concurrency"] == 4
+    assert calls[0]["resume"] is False
+
+
+def test_main_passes_full_and_reconcile_flags(monkeypatch):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    assert cli.main(["sync", "--full", "--reconcile"]) == 0
+    assert calls[0]["full"] is True
+    assert calls[0]["reconcile"] is True
+
+
+def test_main_passes_wire_format(monkeypatch, capsys):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    assert cli.main(["sync", "--wire", "ndjson"]) == 0
+    assert calls[0]["wire"] == "ndjson"
+    with pytest.raises(SystemExit):
+        cli.main(["sync", "--wire", "msgpack"])
+
+
+def test_main_passes_metrics_paths(monkeypatch):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    assert cli.main(["sync", "--metrics-json", "m.json", "--metrics-textfile", "s.prom"]) == 0
+    assert calls[0]["metrics_json"] == "m.json"
+    assert calls[0]["metrics_textfile"] == "s.prom"
+
+
+def test_main_passes_archive_options(monkeypatch, capsys):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    assert cli.main(["sync", "--archive"]) == 0
+    assert cli.main(["sync", "--from-archive", "latest", "--dry-run"]) == 0
+    assert calls[0]["archive"] is True
+    assert calls[1]["from_archive"] == "latest"
+    assert cli.main(["sync", "--archive", "--from-archive", "latest"]) == 2
+    assert "cannot be combined" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        cli.main(["serve", "--from-archive", "latest"])
+
+
+def test_main_passes_enrich_options(monkeypatch, capsys):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    argv = ["sync", "--enrich", "--enrich-concurrency", "8", "--enrich-ttl-hours", "24"]
+    assert cli.main([*argv, "--enrich-budget", "0"]) == 0
+    assert calls[0]["enrich"] is True
+    assert calls[0]["enrich_concurrency"] == 8
+    assert calls[0]["enrich_ttl_hours"] == 24.0
+    assert calls[0]["enrich_budget"] == 0.0
+    assert cli.main(["sync", "--enrich-ttl-hours", "0"]) == 2
+    assert "--enrich-ttl-hours must be > 0" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "flag", ["--workers", "--chunk-size", "--push-concurrency", "--enrich-concurrency"]
+)
+def test_main_rejects_non_positive_counts(monkeypatch, capsys, flag):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+
+    code = cli.main(["sync", flag, "0"])
+
+    assert code == 2
+    assert f"{flag} must be >= 1" in capsys.readouterr().out
+    assert calls == []
+
+
+def test_main_sync_refuses_to_overlap_a_running_sync(monkeypatch, capsys):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+    held = FileLock(resolve_bridge_cache_dir() / "sync.lock")
+    assert held.acquire()
+    try:
+        code = cli.main(["sync", "--dry-run"])
+    finally:
+        held.release()
+
+    assert code == 5
+    assert "Another sync is running" in capsys.readouterr().out
+    assert calls == []
+    assert cli.main(["sync", "--dry-run"]) == 0
+
+
+def test_main_sync_reports_an_unusable_lock_file(monkeypatch, tmp_path, capsys):
+    calls = []
+    _install_fake_sync_module(monkeypatch, calls)
+    (tmp_path / "cache").write_text("not a directory")
+    monkeypatch.setenv("BRIDGE_CACHE_DIR", str(tmp_path / "cache"))
+
+    code = cli.main(["sync", "--dry-run"])
+
+    assert code == 5
+    assert "Cannot open sync lock" in capsys.readouterr().out
+    assert calls == []
+
+
+def test_main_serve_rejects_bad_schedule(capsys):
+    assert cli.main(["serve", "--market-hours", "16:00-09:00"]) == 2
+    assert "Invalid market hours" in capsys.readouterr().out
+    assert cli.main(["serve", "--interval", "0"]) == 2
+
+
 def test_help_works_at_top_level():
     with pytest.raises(SystemExit) as excinfo:
         cli.main(["--help"])
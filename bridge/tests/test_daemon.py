@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta, timezone
+from datetime import time as dt_time
+
+import pytest
+import requests
+
+from bridge.daemon import Schedule, StatusServer, SyncDaemon, parse_market_hours
+from bridge.storage import FileLock
+from bridge.token_cache import KST
+
+
+def _kst(*args):
+    return datetime(*args, tzinfo=KST).astimezone(timezone.utc)
+
+
+def test_schedule_uses_market_interval_only_during_market_hours():
+    schedule = Schedule(market_interval=300, off_hours_interval=3600)
+
+    # Tuesday 10:00 KST
+    assert schedule.next_delay(_kst(2026, 3, 3, 10, 0)) == 300
+    # Tuesday 08:40 KST: off hours, but never later than the 09:00 open.
+    assert schedule.next_delay(_kst(2026, 3, 3, 8, 40)) == 20 * 60
+    # Friday 15:30 KST: the close itself is off hours.
+    assert schedule.next_delay(_kst(2026, 3, 6, 15, 30)) == 3600
+
+
+def test_schedule_off_hours_zero_waits_for_next_weekday_open():
+    schedule = Schedule(market_interval=300, off_hours_interval=0)
+    friday_evening = _kst(2026, 3, 6, 18, 0)
+
+    assert schedule.next_open(friday_evening) == datetime(2026, 3, 9, 9, 0, tzinfo=KST)
+    assert schedule.next_delay(friday_evening) == timedelta(days=2, hours=15).total_seconds()
+
+
+def test_parse_market_hours_validates_order():
+    assert parse_market_hours("08:30-16:00") == (dt_time(8, 30), dt_time(16, 0))
+    for bad in ("16:00-09:00", "9am-3pm", "09:00"):
+        with pytest.raises(ValueError, match="Invalid market hours"):
+            parse_market_hours(bad)
+
+
+def test_file_lock_is_exclusive_across_instances(tmp_path):
+    first = FileLock(tmp_path / "sync.lock")
+    second = FileLock(tmp_path / "sync.lock")
+
+    assert first.acquire()
+    assert not first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+class FakeClient:
+    def __init__(self):
+        self.token_calls = 0
+        self.closed = False
+
+    def token(self):
+        self.token_calls += 1
+        return "Bearer", "t"
+
+    def close(self):
+        self.closed = True
+
+
+def _daemon(tmp_path, run_sync, factory_calls):
+    def factory():
+        factory_calls.append(1)
+        return FakeClient()
+
+    return SyncDaemon(
+        Schedule(market_interval=0.01, off_hours_interval=0.01),
+        client_factory=factory,
+        run_sync=run_sync,
+        lock=FileLock(tmp_path / "sync.lock"),
+        sync_options={"dry_run": True, "limit": None},
+    )
+
+
+def test_daemon_reuses_warm_client_and_reports_last_run(tmp_path):
+    seen = []
+    factory_calls = []
+
+    def run_sync(*, client, on_summary, **options):
+        seen.append((client, options))
+        on_summary({"normalized_unique": len(seen), "push_result": "skipped"})
+        return 0
+
+    daemon = _daemon(tmp_path, run_sync, factory_calls)
+    with StatusServer(daemon.status) as server:
+        daemon.serve(threading.Event(), max_runs=3)
+        status = requests.get(f"{server.url}/status", timeout=5).json()
+        health = requests.get(f"{server.url}/health", timeout=5).json()
+
+    assert factory_calls == [1]
+    assert len({id(client) for client, _ in seen}) == 1
+    assert seen[0][0].token_calls == 1
+    assert seen[0][0].closed
+    assert seen[0][1] == {"dry_run": True, "limit": None}
+    assert health == {"status": "ok"}
+    assert status["state"] == "stopped"
+    assert (status["runs"], status["failures"], status["skipped"]) == (3, 0, 0)
+    assert status["last_run"]["exit_code"] == 0
+    assert status["last_run"]["summary"] == {"normalized_unique": 3, "push_result": "skipped"}
+    assert status["schedule"]["market_hours"] == "09:00-15:30"
+
+
+def test_daemon_skips_run_while_lock_is_held_and_counts_failures(tmp_path):
+    codes = iter([4])
+
+    def run_sync(**options):
+        return next(codes)
+
+    daemon = _daemon(tmp_path, run_sync, [])
+    other = FileLock(tmp_path / "sync.lock")
+    assert other.acquire()
+    skipped = daemon.run_once()
+    other.release()
+    failed = daemon.run_once()
+
+    assert skipped.skipped == "locked"
+    assert failed.exit_code == 4
+    snapshot = daemon.status.snapshot()
+    assert (snapshot["runs"], snapshot["failures"], snapshot["skipped"]) == (1, 1, 1)
+    assert snapshot["last_success_at"] is None
+
+
+def test_daemon_fails_the_run_when_the_lock_file_cannot_be_opened(tmp_path, capsys):
+    (tmp_path / "cache").write_text("not a directory")
+    daemon = SyncDaemon(
+        Schedule(),
+        client_factory=FakeClient,
+        run_sync=lambda **options: 0,
+        lock=FileLock(tmp_path / "cache" / "sync.lock"),
+    )
+
+    run = daemon.run_once()
+
+    assert run.exit_code == 5 and run.skipped is None
+    assert "cannot open sync lock" in capsys.readouterr().out
+    snapshot = daemon.status.snapshot()
+    assert (snapshot["runs"], snapshot["failures"], snapshot["skipped"]) == (1, 1, 0)
+
+
+def test_daemon_retries_client_creation_after_config_error(tmp_path):
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("Missing Kiwoom configuration")
+        return FakeClient()
+
+    daemon = SyncDaemon(
+        Schedule(),
+        client_factory=factory,
+        run_sync=lambda **options: 0,
+        lock=FileLock(tmp_path / "sync.lock"),
+    )
+    daemon.warm()
+
+    assert daemon.client is None
+    assert daemon.run_once().exit_code == 0
+    assert len(attempts) == 2
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+import requests
+
+from bridge import kiwoom, sync
+from bridge.config import resolve_bridge_cache_dir
+from bridge.enrich import (
+    Enricher,
+    EnrichmentCache,
+    extract_detail_fields,
+    resolve_detail_fields,
+)
+from bridge.standin import StandInConfig, StandInServer
+
+# The keys the stand-in's synthetic ka10001 details carry.
+DETAIL_FIELDS = {"name_en": "stk_nm_eng", "category_l1": "upName"}
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _items(*codes, category="전기전자"):
+    return [
+        {"code": code, "name_kr": f"N{code}", "name_en": None, "category_l1": category}
+        for code in codes
+    ]
+
+
+def test_detail_fields_come_from_the_environment_only():
+    env = {"KIWOOM_DETAIL_FIELDS": " name_en = eng_nm , category_l1=sector ,"}
+    assert resolve_detail_fields(env) == {"name_en": "eng_nm", "category_l1": "sector"}
+    # ka10001 documents neither field, so there is no built-in guess to fall back on.
+    with pytest.raises(ValueError, match="--enrich needs KIWOOM_DETAIL_FIELDS"):
+        resolve_detail_fields({})
+    for raw in ("name_en", "name_kr=stk_nm", "name_en="):
+        with pytest.raises(ValueError, match="Invalid KIWOOM_DETAIL_FIELDS entry"):
+            resolve_detail_fields({"KIWOOM_DETAIL_FIELDS": raw})
+
+
+def test_extract_detail_fields_reads_only_the_configured_keys():
+    detail = {"stk_nm_eng": " Samsung ", "bstp_nm": "전기전자", "upName": ""}
+    assert extract_detail_fields(detail, DETAIL_FIELDS) == {"name_en": "Samsung"}
+    assert extract_detail_fields(detail, {"category_l1": "bstp_nm"}) == {"category_l1": "전기전자"}
+    assert extract_detail_fields(detail, {}) == {}
+
+
+def test_enricher_fills_missing_fields_in_order_with_bounded_concurrency(tmp_path):
+    active, peak, lock = 0, 0, threading.Lock()
+
+    def fetch_detail(code):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01 if code.endswith("1") else 0.001)
+        with lock:
+            active -= 1
+        return {"stk_nm_eng": f"E{code}", "upName": "ignored"}
+
+    cache = EnrichmentCache(tmp_path / "cache.json", ttl=3600)
+    enricher = Enricher(cache, fetch_detail, DETAIL_FIELDS, concurrency=3, budget=None)
+    codes = [f"{i:06d}" for i in range(20)]
+    items = _items(*codes[:-1]) + _items(codes[-1], category=None)
+
+    enriched = list(enricher.enrich(items))
+
+    assert [item["code"] for item in enriched] == codes
+    assert all(item["name_en"] == f"E{item['code']}" for item in enriched)
+    # Values from the list response win; only the missing category was filled.
+    assert enriched[0]["category_l1"] == "전기전자"
+    assert enriched[-1]["category_l1"] == "ignored"
+    assert peak == 3
+    assert enricher.stats.fetched == 20
+    assert enricher.stats.filled == {"name_en": 20, "category_l1": 1}
+    assert EnrichmentCache(cache.path, ttl=3600).load().get(codes[0])[0] == {
+        "name_en": f"E{codes[0]}",
+        "category_l1": "ignored",
+    }
+
+
+def test_enricher_uses_fresh_cache_and_refetches_stale_codes(tmp_path):
+    clock = FakeClock()
+    cache = EnrichmentCache(tmp_path / "cache.json", ttl=100, clock=clock)
+    cache.put("A", {"name_en": "cached-a"})
+    clock.now += 50
+    cache.put("B", {"name_en": "cached-b"})
+    clock.now += 60
+    fetched = []
+
+    def fetch_detail(code):
+        fetched.append(code)
+        return {"stk_nm_eng": f"fresh-{code}"}
+
+    enricher = Enricher(cache, fetch_detail, DETAIL_FIELDS, concurrency=1, budget=None)
+    items = list(enricher.enrich(_items("A", "B", "C")))
+
+    assert fetched == ["A", "C"]
+    assert [item["name_en"] for item in items] == ["fresh-A", "cached-b", "fresh-C"]
+    assert enricher.stats.cached == 1
+
+
+def test_failures_and_budget_keep_stale_values_and_defer_codes(tmp_path):
+    clock = FakeClock()
+    cache = EnrichmentCache(tmp_path / "cache.json", ttl=10, clock=clock)
+    cache.put("A", {"name_en": "stale-a"})
+    cache.put("B", {"name_en": "stale-b"})
+    clock.now += 100
+
+    def failing(code):
+        raise requests.HTTPError("Kiwoom ka10001 HTTP error status=500")
+
+    enricher = Enricher(cache, failing, DETAIL_FIELDS, concurrency=1, budget=None)
+    items = list(enricher.enrich(_items("A", "C")))
+
+    assert [item["name_en"] for item in items] == ["stale-a", None]
+    assert enricher.stats.failed == 2
+    assert cache.get("A") == ({"name_en": "stale-a"}, False)
+
+    ticks = iter(range(0, 100, 6))
+    budgeted = Enricher(
+        cache, failing, DETAIL_FIELDS, concurrency=1, budget=5, clock=lambda: next(ticks)
+    )
+    assert [item["name_en"] for item in budgeted.enrich(_items("B"))] == ["stale-b"]
+    assert budgeted.stats.deferred == 1 and budgeted.stats.failed == 0
+
+
+def test_fetch_stock_info_raises_on_kiwoom_error_codes():
+    class Response:
+        status_code = 200
+        ok = True
+        headers: dict = {}
+        text = ""
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+        def close(self):
+            pass
+
+    bodies = iter([{"return_code": 0, "stk_cd": "005930"}, {"return_code": 2, "return_msg": "x"}])
+
+    class Session:
+        def post(self, url, headers=None, json=None, timeout=None, stream=False):
+            assert headers["api-id"] == "ka10001" and json == {"stk_cd": "005930"}
+            return Response(next(bodies))
+
+    client = kiwoom.KiwoomClient("https://k", "key", "secret", session=Session())
+    client.token = lambda: ("Bearer", "t")
+
+    assert client.fetch_stock_info("005930")["stk_cd"] == "005930"
+    with pytest.raises(RuntimeError, match="return_code=2"):
+        client.fetch_stock_info("005930")
+
+
+def test_sync_enriches_before_push_and_reuses_the_cache(monkeypatch, capsys):
+    config = StandInConfig(market_sizes={"0": 5, "10": 3, "50": 0}, page_size=4)
+    with StandInServer(config) as server:
+        monkeypatch.setenv("KIWOOM_HOST_URL", server.url)
+        monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+        monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+        monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+        pushed = []
+
+        def fake_post_json(session, url, headers, body, timeout):
+            pushed.extend(body["items"])
+            return {"received": len(body["items"])}
+
+        monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+        assert sync.sync_stocks(dry_run=False, limit=None, enrich=True) == 2
+        assert "--enrich needs KIWOOM_DETAIL_FIELDS" in capsys.readouterr().out
+        monkeypatch.setenv("KIWOOM_DETAIL_FIELDS", "name_en=stk_nm_eng,category_l1=upName")
+
+        assert sync.sync_stocks(dry_run=False, limit=None, enrich=True) == 0
+        first = capsys.readouterr().out
+        detail_calls = server.stats.as_dict()["requests"]["ka10001 200"]
+        # Without --enrich the cached details are still merged, with no detail calls.
+        assert sync.sync_stocks(dry_run=True, limit=None, verbose=True) == 0
+        second = capsys.readouterr().out
+
+    assert detail_calls == 8
+    assert server.stats.as_dict()["requests"]["ka10001 200"] == 8
+    assert "enrich candidates=8 cached=0 fetched=8 failed=0" in first
+    assert {item["name_en"] for item in pushed} == {f"Synthetic 0-{i}" for i in range(5)} | {
+        f"Synthetic 10-{i}" for i in range(3)
+    }
+    assert "enrich candidates=8 cached=8 fetched=0" in second
+    assert (resolve_bridge_cache_dir() / "enrichment-ka10001.json").exists()
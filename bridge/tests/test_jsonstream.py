@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from bridge.jsonstream import iter_list_records
+
+KEYS = ("list", "items")
+
+
+def _chunks(payload, size):
+    encoded = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return [encoded[start : start + size] for start in range(0, len(encoded), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 64, 1 << 16])
+def test_records_survive_any_chunk_boundary(size):
+    payload = {
+        "return_code": 0,
+        "return_msg": "정상적으로 처리되었습니다",
+        "list": [{"code": f"{i:06d}", "name": f"종목{i}", "price": 1234.5 + i} for i in range(50)],
+    }
+
+    records = list(iter_list_records(_chunks(payload, size), KEYS))
+
+    assert records == payload["list"]
+
+
+def test_records_are_yielded_before_the_body_ends():
+    body = b'{"list": [{"code": "000001"}, {"code": "000002"}, '
+    consumed = []
+
+    def chunks():
+        for chunk in (body, b'{"code": "000003"}]}'):
+            consumed.append(chunk)
+            yield chunk
+
+    records = iter_list_records(chunks(), KEYS)
+
+    assert next(records) == {"code": "000001"}
+    assert len(consumed) == 1
+    assert [record["code"] for record in records] == ["000002", "000003"]
+
+
+def test_falls_back_to_first_array_of_dicts():
+    payload = {"tags": ["a", "b"], "unexpected": [{"code": "A"}], "other": [{"code": "B"}]}
+
+    assert list(iter_list_records(_chunks(payload, 5), KEYS)) == [{"code": "A"}]
+
+
+def test_top_level_array_and_missing_list():
+    assert list(iter_list_records(_chunks([{"code": "A"}, 1], 2), KEYS)) == [{"code": "A"}]
+    assert list(iter_list_records(_chunks({"meta": {"ok": True}}, 4), KEYS)) == []
+
+
+def test_truncated_body_raises():
+    with pytest.raises(ValueError):
+        list(iter_list_records([b'{"list": [{"code": "A"}, {"co'], KEYS))
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import stat
+from datetime import timedelta
+
+import requests
+from urllib3.util.retry import RequestHistory, Retry
+
+from bridge import sync
+from bridge.metrics import SyncMetrics, rate_limit_delta, render_prometheus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Raw:
+    def __init__(self, retries):
+        self.retries = retries
+
+
+def _response(url, status, headers=None, request_headers=None, retries=0, elapsed=0.05):
+    request = requests.Request("POST", url, headers=request_headers or {}).prepare()
+    response = requests.Response()
+    response.request = request
+    response.url = url
+    response.status_code = status
+    response.headers.update(headers or {})
+    response.elapsed = timedelta(seconds=elapsed)
+    history = tuple(RequestHistory("POST", url, None, 503, None) for _ in range(retries))
+    response.raw = Raw(Retry(total=3, history=history))
+    return response
+
+
+def test_hook_counts_statuses_bytes_and_retries_per_endpoint():
+    metrics = SyncMetrics()
+    session = requests.Session()
+    metrics.attach(session)
+    page_headers = {"api-id": "ka10099", "Content-Length": "40"}
+    for status, retries in ((200, 0), (200, 2), (401, 0)):
+        for hook in session.hooks["response"]:
+            hook(_response("https://k/api/dostk/stkinfo", status, {}, page_headers, retries))
+    for hook in session.hooks["response"]:
+        hook(
+            _response(
+                "http://b/api/internal/stocks:upsert",
+                200,
+                {"Content-Length": "64"},
+                {"Content-Length": "1000"},
+                elapsed=0.2,
+            )
+        )
+
+    metrics.detach()
+    assert session.hooks["response"] == []
+    http = metrics.document(0, {})["http"]
+    assert http["kiwoom_ka10099"]["status"] == {"200": 2, "401": 1}
+    assert http["kiwoom_ka10099"]["retries"] == 2
+    assert http["kiwoom_ka10099"]["bytes_sent"] == 120
+    assert http["backend_stocks:upsert"]["bytes_received"] == 64
+    assert http["backend_stocks:upsert"]["p99_ms"] == 200.0
+
+
+def test_phases_are_ordered_and_report_records_per_second():
+    clock = FakeClock()
+    metrics = SyncMetrics(clock=clock)
+    with metrics.phase("token"):
+        clock.now += 0.5
+    metrics.add("upsert", seconds=2.0, records=1000)
+    metrics.add("fetch", records=3000, bytes=90000)
+    metrics.set_seconds("fetch", 1.5)
+    clock.now += 1.0
+
+    phases = metrics.document(0, {})["phases"]
+
+    assert list(phases) == ["token", "fetch", "upsert", "total"]
+    assert phases["fetch"] == {
+        "seconds": 1.5,
+        "records": 3000,
+        "bytes": 90000,
+        "records_per_s": 2000.0,
+    }
+    assert phases["upsert"]["records_per_s"] == 500.0
+    assert phases["total"]["seconds"] == 1.5
+
+
+def test_rate_limit_delta_reports_only_this_run():
+    before = {"ka10099": {"rate": 5.0, "requests": 10, "throttled": 1, "waited": 0.5}}
+    after = {
+        "ka10099": {"rate": 5.0, "requests": 16, "throttled": 3, "waited": 1.5},
+        "au10001": {"rate": 1.0, "requests": 0, "throttled": 0, "waited": 0.0},
+    }
+
+    assert rate_limit_delta(before, after) == {
+        "ka10099": {"requests": 6, "throttled": 2, "waited": 1.0}
+    }
+
+
+def test_render_prometheus_emits_gauges_and_escapes_labels():
+    document = SyncMetrics().document(
+        4,
+        {
+            "raw_count_total": 5,
+            "normalized_unique": 4,
+            "push_result": "upsert_error_status_500",
+            "quality": {
+                "listed_date_parsed": "3/4",
+                "category_l1_missing": "1/4",
+                "per_market_counts": {'K"OSPI': 4},
+            },
+        },
+        rate_limits={"ka10099": {"requests": 3, "throttled": 1, "waited": 0.25}},
+    )
+
+    text = render_prometheus(document)
+
+    assert "# TYPE bridge_sync_exit_code gauge\nbridge_sync_exit_code 4\n" in text
+    assert 'bridge_sync_phase_duration_seconds{phase="total"}' in text
+    assert 'bridge_sync_rate_limit_throttled{api_id="ka10099"} 1\n' in text
+    assert 'bridge_sync_records{stage="normalized"} 4\n' in text
+    assert 'bridge_sync_market_records{market="K\\"OSPI"} 4\n' in text
+    assert "bridge_sync_listed_date_parsed_ratio 0.75\n" in text
+    assert "bridge_sync_category_l1_missing 1\n" in text
+    assert "bridge_sync_upsert_items" not in text
+    assert text.endswith("\n")
+
+
+def _set_required_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("BACKEND_API_BASE", "http://localhost:8000")
+    monkeypatch.setenv("BRIDGE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: requests.Session())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+
+    def fake_stock_list_pages(*args, **kwargs):
+        mrkt_tp = args[-1]
+        yield [{"code": f"C{mrkt_tp}{i}", "name": f"Name{i}"} for i in range(3)]
+
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", fake_stock_list_pages)
+
+
+def test_sync_writes_metrics_json_and_textfile(monkeypatch, tmp_path):
+    _set_required_env(monkeypatch, tmp_path)
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+    monkeypatch.setattr(
+        sync,
+        "_post_json",
+        lambda session, url, headers, body, timeout: {
+            "received": len(body["items"]),
+            "inserted": len(body["items"]),
+        },
+    )
+    json_path = tmp_path / "metrics" / "sync.json"
+    prom_path = tmp_path / "textfile" / "bridge_sync.prom"
+
+    code = sync.sync_stocks(
+        dry_run=False,
+        limit=None,
+        chunk_size=4,
+        metrics_json=str(json_path),
+        metrics_textfile=prom_path,
+    )
+
+    assert code == 0
+    document = json.loads(json_path.read_text(encoding="utf-8"))
+    assert document["exit_code"] == 0
+    assert set(document["phases"]) == {
+        "token",
+        "fetch",
+        "normalize",
+        "health_check",
+        "upsert",
+        "total",
+    }
+    assert document["phases"]["fetch"]["records"] == 9
+    assert document["phases"]["normalize"]["records"] == 9
+    assert document["phases"]["upsert"]["records"] == 9
+    assert document["summary"]["push_result"]["inserted"] == 9
+    assert document["summary"]["quality"]["per_market_counts"] == {
+        "KOSPI": 3,
+        "KOSDAQ": 3,
+        "KONEX": 3,
+    }
+    text = prom_path.read_text(encoding="utf-8")
+    assert 'bridge_sync_upsert_items{result="inserted"} 9\n' in text
+    assert stat.S_IMODE(prom_path.stat().st_mode) == 0o644
+    assert not [path for path in prom_path.parent.iterdir() if path != prom_path]
+
+
+def test_sync_writes_metrics_for_failed_runs(monkeypatch, tmp_path):
+    _set_required_env(monkeypatch, tmp_path)
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: False)
+    json_path = tmp_path / "sync.json"
+
+    assert sync.sync_stocks(dry_run=False, limit=None, metrics_json=json_path) == 3
+
+    document = json.loads(json_path.read_text(encoding="utf-8"))
+    assert document["exit_code"] == 3
+    assert document["summary"]["push_result"] == "health_check_failed"
+    assert "upsert" not in document["phases"]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+
+from bridge import cli, sync
+from bridge.microbench import (
+    CaseResult,
+    compare_results,
+    format_rows,
+    generate_pages,
+    run_microbench,
+)
+
+
+def test_generated_pages_are_deterministic_and_messy():
+    pages = generate_pages(2000, seed=7)
+    records = [(mrkt_tp, record) for mrkt_tp, page in pages for record in page]
+
+    assert len(records) == 2000
+    assert pages == generate_pages(2000, seed=7)
+    assert {mrkt_tp for mrkt_tp, _ in pages} == {"0", "10", "50"}
+    codes = [str(record.get("code") or record.get("stk_cd")).strip() for _, record in records]
+    assert len(set(codes)) < len(codes)
+    assert any("stk_cd" in record for _, record in records)
+    assert any(record["regDay"] == "" for _, record in records)
+    unique = sync._normalize_and_dedup(pages)
+    assert len(unique) < len(records)
+    assert any(item["listed_date"] is None for item in unique)
+
+
+def test_run_microbench_times_every_case():
+    results = run_microbench([300], repeat=1)
+
+    assert [result.case for result in results] == [
+        "normalize_ka10099_item",
+        "normalize_item",
+        "normalize_and_dedup",
+        "compute_change_summary",
+    ]
+    assert all(result.size == 300 and result.ns_per_record > 0 for result in results)
+    dedup = next(result for result in results if result.case == "normalize_and_dedup")
+    assert dedup.peak_kib > 0
+
+
+def test_compare_results_flags_regressions_beyond_tolerance():
+    results = [
+        CaseResult("normalize_item", 1000, 0.002, 2000.0, 1.0),
+        CaseResult("normalize_and_dedup", 1000, 0.01, 10000.0, 500.0),
+        CaseResult("compute_change_summary", 1000, 0.001, 500.0, 1.0),
+    ]
+    baseline = {
+        "results": [
+            {"case": "normalize_item", "size": 1000, "ns_per_record": 1000.0},
+            {"case": "normalize_and_dedup", "size": 1000, "ns_per_record": 9000.0},
+        ]
+    }
+
+    rows = compare_results(results, baseline, tolerance=0.25)
+
+    assert [row.get("regressed") for row in rows] == [True, False, None]
+    assert rows[0]["ratio"] == 2.0
+    assert "REGRESSED" in format_rows(rows)[1]
+
+
+def test_cli_microbench_saves_and_compares(tmp_path, capsys):
+    path = tmp_path / "baseline.json"
+    args = ["microbench", "--sizes", "200", "--repeat", "1", "--case", "normalize_item"]
+
+    assert cli.main([*args, "--save", str(path)]) == 0
+    document = json.loads(path.read_text(encoding="utf-8"))
+    assert document["results"][0]["case"] == "normalize_item"
+    assert "python" in document["meta"]
+
+    document["results"][0]["ns_per_record"] = 0.001
+    path.write_text(json.dumps(document), encoding="utf-8")
+    assert cli.main([*args, "--baseline", str(path)]) == 1
+    assert "REGRESSED" in capsys.readouterr().out
+
+    assert cli.main(["microbench", "--sizes", "0"]) == 2
+    assert cli.main([*args, "--baseline", str(tmp_path / "missing.json")]) == 2
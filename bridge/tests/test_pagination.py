@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import threading
+
+import pytest
+
+from bridge import kiwoom, sync
+from bridge.kiwoom import PageStats, continuation_key, iter_continuation_pages
+
+
+class PagedResponse:
+    def __init__(self, records, next_key=None):
+        self.status_code = 200
+        self.ok = True
+        self.text = ""
+        self.content = json.dumps({"return_code": 0, "list": records}).encode("utf-8")
+        self.headers = {"cont-yn": "Y", "next-key": next_key} if next_key else {"cont-yn": "N"}
+
+    def iter_content(self, chunk_size=1):
+        # Tiny chunks so records straddle chunk boundaries.
+        for start in range(0, len(self.content), 7):
+            yield self.content[start : start + 7]
+
+    def close(self):
+        pass
+
+
+class TokenResponse:
+    status_code = 200
+    ok = True
+    text = ""
+
+    def json(self):
+        return {"token_type": "Bearer", "token": "t"}
+
+
+class PagedSession:
+    """Serves pages keyed by the request's next-key header (None for the first page)."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
+        if url.endswith("/oauth2/token"):
+            return TokenResponse()
+        self.calls.append(dict(headers))
+        return self.pages[headers.get("next-key")]
+
+
+def _pages():
+    return {
+        None: PagedResponse([{"code": "000001", "name": "A"}], next_key="k2"),
+        "k2": PagedResponse([{"code": "000002", "name": "B"}], next_key="k3"),
+        "k3": PagedResponse([{"code": "000003", "name": "C"}]),
+    }
+
+
+def test_continuation_key_requires_cont_yn():
+    assert continuation_key({"cont-yn": "Y", "next-key": "abc"}) == "abc"
+    assert continuation_key({"cont-yn": "N", "next-key": "abc"}) is None
+    assert continuation_key({"cont-yn": "Y", "next-key": ""}) is None
+    assert continuation_key(None) is None
+
+
+def test_fetch_stock_list_follows_continuation_headers():
+    session = PagedSession(_pages())
+    client = kiwoom.KiwoomClient("https://k", "k", "s", session=session)
+    client.token = lambda: ("Bearer", "t")
+
+    items = client.fetch_stock_list("0")
+
+    assert [item["code"] for item in items] == ["000001", "000002", "000003"]
+    assert [call.get("next-key") for call in session.calls] == [None, "k2", "k3"]
+    assert [call.get("cont-yn") for call in session.calls] == [None, "Y", "Y"]
+
+
+def test_iter_pages_prefetches_next_page_while_caller_processes():
+    second_requested = threading.Event()
+
+    def fetch_page(next_key):
+        if next_key is None:
+            return [{"page": 1}], "k2", 10
+        second_requested.set()
+        return [{"page": 2}], None, 20
+
+    stats = PageStats()
+    pages = iter_continuation_pages(fetch_page, stats=stats)
+
+    assert next(pages) == [{"page": 1}]
+    # Page 2 is already in flight before page 1 has been consumed.
+    assert second_requested.wait(timeout=5)
+    assert list(pages) == [[{"page": 2}]]
+    assert (stats.pages, stats.bytes) == (2, 30)
+
+
+def test_iter_pages_rejects_repeated_continuation_key():
+    def fetch_page(next_key):
+        return [{"page": next_key}], "same", 1
+
+    with pytest.raises(RuntimeError, match="continuation key repeated"):
+        list(iter_continuation_pages(fetch_page))
+
+
+def test_kiwoom_client_iterates_continuation_pages():
+    pages = _pages()
+    calls = []
+
+    class Session:
+        def post(self, url, json=None, headers=None, timeout=None, stream=False):
+            if url.endswith("/oauth2/token"):
+                return TokenResponse()
+            calls.append(headers.get("next-key"))
+            return pages[headers.get("next-key")]
+
+    client = kiwoom.KiwoomClient("https://kiwoom.example", "k", "s", session=Session())
+    stats = PageStats()
+
+    pages_seen = list(client.iter_stock_list_pages("0", stats=stats))
+
+    assert [[item["code"] for item in page] for page in pages_seen] == [
+        ["000001"],
+        ["000002"],
+        ["000003"],
+    ]
+    assert calls == [None, "k2", "k3"]
+    assert stats.pages == 3
+    assert len(client.fetch_stock_list("0")) == 3
+
+
+def test_verbose_market_line_reports_pages_and_bytes(monkeypatch, capsys):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: PagedSession(_pages()))
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+
+    assert sync.sync_stocks(dry_run=True, limit=None, verbose=True) == 0
+
+    out = capsys.readouterr().out
+    expected_bytes = sum(len(response.content) for response in _pages().values())
+    assert "mrkt_tp=0 received=3 elapsed_ms=" in out
+    assert f"pages=3 bytes={expected_bytes}" in out
+    assert "total=3" in out
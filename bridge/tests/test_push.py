@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from bridge import sync
+from bridge.kiwoom import PoolSettings, create_session
+from bridge.push import UpsertCheckpoint, chunk_digest, iter_chunks, push_in_chunks
+from bridge.standin import StandInConfig, StandInServer
+
+
+def _items(count):
+    return [{"code": f"A{i:05d}", "name_kr": f"종목{i}"} for i in range(count)]
+
+
+def _ok(chunk):
+    return {"received": len(chunk), "inserted": len(chunk), "updated": 0, "unchanged": 0}
+
+
+def test_iter_chunks_splits_with_remainder():
+    sizes = [len(chunk) for chunk in iter_chunks(_items(7), 3)]
+    assert sizes == [3, 3, 1]
+
+
+def test_push_in_chunks_aggregates_counts():
+    sent = []
+
+    def post(chunk):
+        sent.append(len(chunk))
+        return _ok(chunk)
+
+    totals = push_in_chunks(_items(5), post=post, chunk_size=2)
+
+    assert sent == [2, 2, 1]
+    assert totals == {
+        "received": 5,
+        "inserted": 5,
+        "updated": 0,
+        "unchanged": 0,
+        "chunks": 3,
+        "resumed_chunks": 0,
+    }
+
+
+def test_push_in_chunks_bounds_in_flight_requests():
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def post(chunk):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return _ok(chunk)
+
+    totals = push_in_chunks(_items(40), post=post, chunk_size=4, max_in_flight=3)
+
+    assert totals["received"] == 40
+    assert 1 < state["peak"] <= 3
+
+
+def test_failed_push_checkpoints_acked_chunks_and_resumes(tmp_path):
+    checkpoint = UpsertCheckpoint(tmp_path / "checkpoint.json")
+    items = _items(6)
+    chunks = list(iter_chunks(items, 2))
+
+    def flaky(chunk):
+        if chunk == chunks[1]:
+            raise requests.Timeout("slow backend")
+        return _ok(chunk)
+
+    with pytest.raises(requests.Timeout):
+        push_in_chunks(items, post=flaky, chunk_size=2, checkpoint=checkpoint)
+
+    reloaded = UpsertCheckpoint(tmp_path / "checkpoint.json").load()
+    assert set(reloaded.acked) == {chunk_digest(chunks[0])}
+
+    sent = []
+
+    def post(chunk):
+        sent.append(chunk)
+        return _ok(chunk)
+
+    totals = push_in_chunks(items, post=post, chunk_size=2, checkpoint=reloaded)
+
+    assert sent == chunks[1:]
+    assert totals["received"] == 6
+    assert totals["resumed_chunks"] == 1
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_checkpoint_ignores_stale_file(tmp_path):
+    from datetime import datetime, timedelta, timezone
+
+    path = tmp_path / "checkpoint.json"
+    old = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    UpsertCheckpoint(path, clock=lambda: old).ack("digest", {"received": 1})
+
+    later = UpsertCheckpoint(path, clock=lambda: old + timedelta(days=2)).load()
+    assert later.acked == {}
+
+
+def test_sync_pushes_chunks_and_reports_aggregate(monkeypatch, capsys):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("BACKEND_API_BASE", "http://localhost:8000")
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: object())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+    monkeypatch.setattr(
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter(
+            [[{"code": f"{args[-1]}-{i}", "name": f"N{i}"} for i in range(5)]]
+        ),
+    )
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+    bodies = []
+    keys = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        bodies.append(body)
+        keys.append(headers[sync.IDEMPOTENCY_HEADER])
+        return _ok(body["items"])
+
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    code = sync.sync_stocks(
+        dry_run=False, limit=None, verbose=True, chunk_size=4, push_concurrency=2
+    )
+
+    assert code == 0
+    assert sorted(len(body["items"]) for body in bodies) == [3, 4, 4, 4]
+    assert len(set(keys)) == 4
+    out = capsys.readouterr().out
+    assert "chunk=1 size=4 received=4 inserted=4 updated=0 unchanged=0 elapsed_ms=" in out
+    assert '"chunks": 4' in out
+    assert "'received': 15" in out
+
+
+class ConflictingBackend:
+    """Backend answering the first attempt of chunk 2 with 409, as while its key is in use."""
+
+    def __init__(self) -> None:
+        self.attempts: list[tuple[str, str, int]] = []
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(200, {"status": "ok"})
+
+            def do_POST(self):
+                items = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["items"]
+                first_code = items[0]["code"] if items else ""
+                chunks = sorted({code for code, _, _ in backend.attempts} - {""})
+                conflict = first_code not in chunks and len(chunks) == 1
+                status = 409 if conflict else 200
+                backend.attempts.append((first_code, self.headers["Idempotency-Key"], status))
+                if conflict:
+                    return self._reply(409, {"detail": "in progress"})
+                self._reply(200, {"received": len(items), "inserted": len(items)})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> ConflictingBackend:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.mark.parametrize("engine", sync.ENGINES)
+def test_retried_chunk_reuses_its_idempotency_key(monkeypatch, capsys, engine):
+    if engine == "asyncio":
+        pytest.importorskip("aiohttp")
+    config = StandInConfig(market_sizes={"0": 8, "10": 0, "50": 0}, page_size=4)
+    with StandInServer(config) as server, ConflictingBackend() as backend:
+        monkeypatch.setenv("KIWOOM_HOST_URL", server.url)
+        monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+        monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+        monkeypatch.setenv("BACKEND_API_BASE", backend.url)
+        code = sync.sync_stocks(dry_run=False, limit=None, chunk_size=4, engine=engine)
+
+    assert code == 0, capsys.readouterr().out
+    # The 409 was retried with the same key; the two chunks have different keys.
+    (first, _, _), (second, key, status), (retried, retry_key, retry_status) = backend.attempts
+    assert (status, retry_status) == (409, 200)
+    assert retried == second and retry_key == key
+    assert len({key for _, key, _ in backend.attempts}) == 2
+
+
+class ConflictOnce:
+    """Answers the first POST to each path with 409 and every later one with 200."""
+
+    def __init__(self) -> None:
+        self.paths: list[str] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status = 200 if self.path in server.paths else 409
+                server.paths.append(self.path)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> ConflictOnce:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def test_only_backend_calls_retry_409():
+    with ConflictOnce() as server:
+        session = create_session()
+        backend = sync.BackendTarget(f"{server.url}/backend", "key")
+        sync.mount_backend_retries(session, backend, PoolSettings())
+        kiwoom = session.post(f"{server.url}/oauth2/token", timeout=5)
+        upsert = session.post(backend.upsert_url, timeout=5)
+
+    # A Kiwoom 409 comes straight back; the backend's is retried.
+    assert (kiwoom.status_code, upsert.status_code) == (409, 200)
+    assert server.paths == ["/oauth2/token"] + ["/backend/api/internal/stocks:upsert"] * 2
+
+
+def test_async_session_retries_409_only_for_backend_calls():
+    pytest.importorskip("aiohttp")
+    from bridge.aio import AsyncSession
+
+    async def run(url):
+        async with AsyncSession() as session:
+            kiwoom = await session.request("POST", f"{url}/oauth2/token", timeout=5)
+            backend = await session.request(
+                "POST", f"{url}/backend", timeout=5, retry_statuses=sync.BACKEND_RETRY_STATUSES
+            )
+            return kiwoom.status_code, backend.status_code
+
+    with ConflictOnce() as server:
+        assert asyncio.run(run(server.url)) == (409, 200)
+    assert server.paths == ["/oauth2/token", "/backend", "/backend"]
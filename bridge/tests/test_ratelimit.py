@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timezone
+
+import pytest
+
+from bridge import kiwoom
+from bridge.ratelimit import RateLimiter, parse_retry_after, resolve_rate_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+class Response:
+    def __init__(self, status_code=200, headers=None, data=None):
+        self.status_code = status_code
+        self.ok = 200 <= status_code < 300
+        self.headers = headers or {}
+        self.text = ""
+        self.closed = False
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+    def close(self):
+        self.closed = True
+
+
+def _limiter(rates, clock):
+    return RateLimiter(rates, clock=clock, sleep=clock.sleep)
+
+
+def test_resolve_rate_limits_parses_overrides_and_rejects_garbage():
+    rates = resolve_rate_limits({"KIWOOM_RATE_LIMITS": "default=3, ka10099=2.5"})
+
+    assert rates["default"] == 3.0
+    assert rates["ka10099"] == 2.5
+    assert rates["au10001"] == 1.0
+    for bad in ("ka10099", "ka10099=0", "=2", "ka10099=fast"):
+        with pytest.raises(ValueError, match="KIWOOM_RATE_LIMITS"):
+            resolve_rate_limits({"KIWOOM_RATE_LIMITS": bad})
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    now = datetime(2026, 3, 2, 9, 0, 0, tzinfo=timezone.utc)
+
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Mon, 02 Mar 2026 09:00:05 GMT", now=now) == 5.0
+    assert parse_retry_after("Mon, 02 Mar 2026 08:59:00 GMT", now=now) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_bucket_paces_requests_per_api_id():
+    clock = FakeClock()
+    limiter = _limiter({"default": 2.0, "ka10099": 4.0}, clock)
+
+    for _ in range(8):
+        limiter.acquire("ka10099")
+    limiter.acquire("au10001")
+
+    # A burst of one second (4 requests), then one request every 0.25s; other api-ids
+    # have their own bucket.
+    assert clock.now == pytest.approx(1.0)
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+    assert limiter.stats()["ka10099"]["requests"] == 8
+    assert limiter.stats()["au10001"]["requests"] == 1
+
+
+def test_429_honours_retry_after_halves_rate_and_recovers():
+    clock = FakeClock()
+    limiter = _limiter({"default": 4.0}, clock)
+    responses = iter([Response(429, {"Retry-After": "3"}), Response(200)])
+    throttled = []
+
+    def request():
+        response = next(responses)
+        if response.status_code == 429:
+            throttled.append(response)
+        return response
+
+    result = limiter.send("ka10099", request)
+
+    assert result.status_code == 200
+    assert throttled[0].closed is True
+    assert clock.now == pytest.approx(3.0)
+    stats = limiter.stats()["ka10099"]
+    assert stats["throttled"] == 1
+    assert stats["rate"] == pytest.approx(2.0 + 4.0 * 0.05)
+
+    for _ in range(40):
+        limiter.observe("ka10099", Response(200))
+    assert limiter.stats()["ka10099"]["rate"] == 4.0
+
+
+def test_send_gives_up_after_max_attempts_and_returns_last_response():
+    clock = FakeClock()
+    limiter = _limiter({"default": 1.0}, clock)
+    calls = []
+
+    def request():
+        calls.append(clock.now)
+        return Response(429)
+
+    result = limiter.send("ka10099", request, max_attempts=3)
+
+    assert result.status_code == 429
+    assert len(calls) == 3
+    # Without Retry-After each 429 waits one interval at the reduced rate.
+    assert calls == sorted(calls) and calls[-1] > calls[0]
+    assert limiter.stats()["ka10099"]["rate"] == pytest.approx(0.2)
+
+
+def test_kiwoom_client_defaults_to_the_shared_limiter(monkeypatch):
+    clock = FakeClock()
+    limiter = _limiter({"default": 5.0}, clock)
+    api_ids = []
+    original_send = limiter.send
+
+    def recording_send(api_id, request, **kwargs):
+        api_ids.append(api_id)
+        return original_send(api_id, request, **kwargs)
+
+    monkeypatch.setattr(limiter, "send", recording_send)
+    monkeypatch.setattr(kiwoom, "shared_rate_limiter", lambda: limiter)
+    statuses = iter([429, 200])
+
+    class Session:
+        def post(self, url, headers=None, json=None, timeout=None, stream=False):
+            if "oauth2" in url:
+                return Response(200, data={"token_type": "Bearer", "token": "t"})
+            response = Response(next(statuses), {"Retry-After": "1"})
+            response.iter_content = lambda chunk_size=1: iter([b'{"list": [{"code": "A"}]}'])
+            return response
+
+    client = kiwoom.KiwoomClient("https://k", "key", "secret", session=Session())
+
+    assert client.token() == ("Bearer", "t")
+    assert client.fetch_stock_list("0") == [{"code": "A"}]
+    assert api_ids == ["au10001", "ka10099"]
+    assert limiter.stats()["ka10099"]["throttled"] == 1
+    assert clock.now >= 1.0
+
+
+def test_kiwoom_client_uses_its_limiter_for_token_and_pages():
+    clock = FakeClock()
+    limiter = _limiter({"default": 100.0}, clock)
+
+    class Session:
+        def post(self, url, json=None, headers=None, timeout=None, stream=False):
+            if "oauth2" in url:
+                return Response(200, data={"token_type": "Bearer", "token": "t"})
+            response = Response(200)
+            response.iter_content = lambda chunk_size=1: iter([b'{"list": [{"code": "A"}]}'])
+            return response
+
+    client = kiwoom.KiwoomClient(
+        "https://k", "key", "secret", rate_limiter=limiter, session=Session()
+    )
+
+    assert client.fetch_stock_list("0") == [{"code": "A"}]
+    assert set(limiter.stats()) == {"au10001", "ka10099"}
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import json
+
+from bridge import sync
+from bridge.snapshot import SnapshotStore, item_digest, market_rollups, reconcile_entries
+
+
+def _item(code, name, market="KOSPI"):
+    return {"code": code, "name_kr": name, "market": market}
+
+
+def test_item_digest_ignores_key_order():
+    assert item_digest({"a": 1, "b": 2}) == item_digest({"b": 2, "a": 1})
+
+
+def test_item_digest_matches_backend_manifest_encoding():
+    item = sync._normalize_ka10099_item(
+        {"code": "005930", "name": "삼성전자", "marketCode": "0", "regDay": "19750611"}, "0"
+    )
+    expected = "\x1f".join(
+        [
+            "005930",
+            "삼성전자",
+            "\x1e",
+            "KOSPI",
+            item["security_type"],
+            "0",
+            "0",
+            "\x1e" if item["category_l1"] is None else item["category_l1"],
+            "\x1e" if item["category_l2"] is None else item["category_l2"],
+            "true",
+            "1975-06-11",
+            "\x1e",
+        ]
+    )
+    assert item_digest(item) == hashlib.md5(expected.encode("utf-8")).hexdigest()
+
+
+def test_reconcile_fetches_only_differing_markets():
+    items = [_item("A1", "one"), _item("A2", "two"), _item("K1", "k", market="KOSDAQ")]
+    backend = market_rollups(items)
+    backend["KOSDAQ"] = {"count": 2, "hash": "stale"}
+    requested = []
+
+    def fetch_codes(markets):
+        requested.append(markets)
+        return {"KOSDAQ": {"K1": item_digest(items[2]), "K2": "other"}}
+
+    entries, differing = reconcile_entries(items, backend, fetch_codes)
+
+    assert differing == ["KOSDAQ"]
+    assert requested == [["KOSDAQ"]]
+    assert entries["A1"] == {"hash": item_digest(items[0]), "market": "KOSPI"}
+    assert entries["K2"] == {"hash": "other", "market": "KOSDAQ"}
+
+
+def test_diff_pushes_only_new_or_changed(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json")
+    store.commit([_item("A1", "one"), _item("A2", "two")], [])
+
+    reloaded = SnapshotStore(tmp_path / "snapshot.json").load()
+    delta = reloaded.diff([_item("A1", "one"), _item("A2", "two!"), _item("A3", "three")])
+
+    assert [item["code"] for item in delta.changed] == ["A2", "A3"]
+    assert delta.unchanged == 1
+    assert delta.removed_codes == []
+
+
+def test_diff_full_resends_everything(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json")
+    store.commit([_item("A1", "one")], [])
+
+    delta = store.diff([_item("A1", "one")], full=True)
+    assert [item["code"] for item in delta.changed] == ["A1"]
+
+
+def test_diff_reports_removals_only_for_complete_markets(tmp_path):
+    store = SnapshotStore(tmp_path / "snapshot.json")
+    store.commit([_item("A1", "one"), _item("K1", "k", market="KOSDAQ")], [])
+
+    partial = store.diff([], complete_markets=["KOSPI"])
+    assert partial.removed_codes == ["A1"]
+
+    none = store.diff([])
+    assert none.removed_codes == []
+
+    store.commit([], partial.removed_codes)
+    assert set(SnapshotStore(store.path).load().entries) == {"K1"}
+
+
+def _set_env(monkeypatch):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("BACKEND_API_BASE", "http://localhost:8000")
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: object())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+
+
+def test_second_sync_sends_only_delta_and_removed_codes(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    universe = {
+        "0": [{"code": "005930", "name": "삼성전자"}, {"code": "000660", "name": "SK하이닉스"}],
+        "10": [{"code": "035420", "name": "NAVER"}],
+        "50": [],
+    }
+    monkeypatch.setattr(
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([universe[args[-1]]]),
+    )
+    bodies = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        bodies.append(body)
+        return {
+            "received": len(body["items"]),
+            "inserted": len(body["items"]),
+            "deactivated": len(body.get("removed_codes", [])),
+        }
+
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None) == 0
+    assert [len(body["items"]) for body in bodies] == [3]
+
+    bodies.clear()
+    capsys.readouterr()
+    universe["0"] = [{"code": "005930", "name": "삼성전자(변경)"}]
+    assert sync.sync_stocks(dry_run=False, limit=None, verbose=True) == 0
+
+    assert [item["code"] for item in bodies[0]["items"]] == ["005930"]
+    assert bodies[1] == {"items": [], "removed_codes": ["000660"]}
+    out = capsys.readouterr().out
+    assert "delta changed=1 unchanged=1 removed=1 full=False" in out
+    result_line = next(line for line in out.splitlines() if line.startswith('{"received"'))
+    result = json.loads(result_line)
+    assert result["skipped_unchanged"] == 1
+    assert result["deactivated"] == 1
+
+    bodies.clear()
+    assert sync.sync_stocks(dry_run=False, limit=None) == 0
+    assert bodies == []
+
+    assert sync.sync_stocks(dry_run=False, limit=None, full=True) == 0
+    assert [len(body["items"]) for body in bodies] == [2]
+
+
+def test_full_snapshot_sends_listed_codes_of_complete_markets(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    universe = {
+        "0": [{"code": "005930", "name": "삼성전자"}, {"code": "000660", "name": "SK하이닉스"}],
+        "10": [{"code": "035420", "name": "NAVER"}],
+        "50": [],
+    }
+    monkeypatch.setattr(
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([universe[args[-1]]]),
+    )
+    bodies = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        bodies.append(body)
+        if "snapshot" not in body:
+            return {"received": len(body["items"])}
+        snapshot = {
+            market: {"listed": len(codes), "deactivated": 1}
+            for market, codes in body["snapshot"].items()
+        }
+        return {"received": 0, "deactivated": len(snapshot), "snapshot": snapshot}
+
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, full_snapshot=True) == 0
+    # Unchanged codes are not pushed again but are still listed in the snapshot.
+    universe["0"] = [{"code": "005930", "name": "삼성전자"}]
+    bodies.clear()
+    capsys.readouterr()
+    assert sync.sync_stocks(dry_run=False, limit=None, full_snapshot=True) == 0
+
+    assert bodies == [
+        {
+            "items": [],
+            "removed_codes": ["000660"],
+            "snapshot": {"KOSDAQ": ["035420"], "KOSPI": ["005930"]},
+        }
+    ]
+    result = json.loads(
+        next(line for line in capsys.readouterr().out.splitlines() if line.startswith("{"))
+    )
+    assert result["deactivated"] == 2
+    assert result["snapshot"]["KOSPI"] == {"listed": 1, "deactivated": 1}
+
+    # A --limit run never claims to know a market's full list.
+    bodies.clear()
+    assert sync.sync_stocks(dry_run=False, limit=1, full_snapshot=True, full=True) == 0
+    assert all("snapshot" not in body for body in bodies)
+
+
+def test_reconcile_rebuilds_snapshot_from_backend_manifest(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    universe = {
+        "0": [{"code": "005930", "name": "삼성전자"}, {"code": "000660", "name": "SK하이닉스"}],
+        "10": [{"code": "035420", "name": "NAVER"}],
+        "50": [],
+    }
+    monkeypatch.setattr(
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([universe[args[-1]]]),
+    )
+    records = [(mrkt_tp, universe[mrkt_tp]) for mrkt_tp in sync.MARKET_TYPES]
+    items = sync._normalize_and_dedup(records)
+    # Backend holds KOSPI as-is plus a stale KOSDAQ row that is no longer listed.
+    stored = {item["code"]: item_digest(item) for item in items}
+    stored_kosdaq = {"035420": "stale", "091990": "gone"}
+    gets = []
+
+    def fake_get_json(session, url, headers, params, timeout):
+        gets.append(params)
+        rollups = market_rollups(item for item in items if item["market"] == "KOSPI")
+        rollups["KOSDAQ"] = {"count": 2, "hash": "differs"}
+        if params is None:
+            return {"algorithm": "md5-v1", "markets": rollups}
+        return {"algorithm": "md5-v1", "markets": rollups, "codes": {"KOSDAQ": stored_kosdaq}}
+
+    bodies = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        bodies.append(body)
+        return {"received": len(body["items"]), "deactivated": len(body.get("removed_codes", []))}
+
+    monkeypatch.setattr(sync, "_get_json", fake_get_json)
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, verbose=True, reconcile=True) == 0
+
+    assert gets == [None, {"markets": ["KOSDAQ"], "codes": "1"}]
+    assert [item["code"] for item in bodies[0]["items"]] == ["035420"]
+    assert bodies[1] == {"items": [], "removed_codes": ["091990"]}
+    assert "reconcile differing_markets=KOSDAQ" in capsys.readouterr().out
+    assert (
+        stored["005930"]
+        == SnapshotStore.for_target(
+            sync.resolve_bridge_cache_dir(), "http://localhost:8000/api/internal/stocks:upsert"
+        )
+        .load()
+        .entries["005930"]["hash"]
+    )
+
+
+def test_reconcile_reports_manifest_failure(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    monkeypatch.setattr(
+        sync.KiwoomClient, "iter_stock_list_pages", lambda *args, **kwargs: iter([[]])
+    )
+
+    class _Response:
+        status_code = 401
+
+    def failing_get_json(*args, **kwargs):
+        raise sync.requests.HTTPError("unauthorized", response=_Response())
+
+    monkeypatch.setattr(sync, "_get_json", failing_get_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, reconcile=True) == 4
+    out = capsys.readouterr().out
+    assert "Backend manifest failed" in out
+    assert "push_result=manifest_error_status_401" in out
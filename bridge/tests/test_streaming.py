@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+
+import requests
+
+from bridge import sync
+
+
+def _set_env(monkeypatch):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("BACKEND_API_BASE", "http://localhost:8000")
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: object())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
+
+
+def _install_pages(monkeypatch, pages_per_market, page_size, fetched):
+    def fake_stock_list_pages(*args, **kwargs):
+        mrkt_tp = args[-1]
+        for page in range(pages_per_market):
+            fetched.append((mrkt_tp, page))
+            yield [{"code": f"{mrkt_tp}-{page}-{i}", "name": f"N{i}"} for i in range(page_size)]
+
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", fake_stock_list_pages)
+
+
+def test_limit_stops_fetching_once_enough_unique_items(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    fetched = []
+    _install_pages(monkeypatch, pages_per_market=5, page_size=3, fetched=fetched)
+
+    assert sync.sync_stocks(dry_run=True, limit=4, verbose=False) == 0
+
+    # Two pages of the first market cover the limit; nothing else is requested.
+    assert fetched == [("0", 0), ("0", 1)]
+    out = capsys.readouterr().out
+    assert "total=4" in out
+    assert "raw_count_total=6" in out
+
+
+def test_chunks_are_pushed_while_later_pages_are_fetched(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    fetched = []
+    _install_pages(monkeypatch, pages_per_market=4, page_size=5, fetched=fetched)
+    pages_fetched_at_post = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        pages_fetched_at_post.append(len(fetched))
+        return {"received": len(body["items"]), "inserted": len(body["items"])}
+
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, chunk_size=5) == 0
+
+    assert len(fetched) == 12
+    assert pages_fetched_at_post[0] < len(fetched)
+    assert '"received": 60' in capsys.readouterr().out
+
+
+def test_parallel_stream_keeps_market_order_and_stops_producers(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    fetched = []
+    lock = threading.Lock()
+
+    def fake_stock_list_pages(*args, **kwargs):
+        mrkt_tp = args[-1]
+        for page in range(50):
+            with lock:
+                fetched.append((mrkt_tp, page))
+            yield [{"code": f"{mrkt_tp}-{page}", "name": "N"}]
+
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", fake_stock_list_pages)
+
+    assert sync.sync_stocks(dry_run=True, limit=60, verbose=True, workers=3) == 0
+
+    out = capsys.readouterr().out
+    assert "total=60" in out
+    assert "mrkt_tp=0 received=50" in out
+    # Later markets only ran ahead by their bounded queue, not through all 50 pages.
+    assert sum(1 for mrkt_tp, _ in fetched if mrkt_tp == "50") < 50
+
+
+def test_kiwoom_failure_mid_stream_returns_1_after_checkpointing(monkeypatch, capsys):
+    _set_env(monkeypatch)
+
+    def failing_pages(*args, **kwargs):
+        yield [{"code": f"A{i}", "name": "N"} for i in range(4)]
+        raise requests.ConnectionError("kiwoom reset")
+
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", failing_pages)
+    posted = []
+
+    def fake_post_json(session, url, headers, body, timeout):
+        posted.append(len(body["items"]))
+        return {"received": len(body["items"])}
+
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    assert sync.sync_stocks(dry_run=False, limit=None, chunk_size=2) == 1
+
+    assert posted == [2, 2]
+    out = capsys.readouterr().out
+    assert "Failed to fetch Kiwoom stock list: kiwoom reset" in out
+    assert "push_result=fetch_failed" in out
+
+
+def test_ndjson_wire_posts_gzip_lines(monkeypatch, capsys):
+    _set_env(monkeypatch)
+    _install_pages(monkeypatch, pages_per_market=1, page_size=3, fetched=[])
+    bodies = []
+
+    class FakeResponse:
+        ok = True
+        status_code = 200
+
+        def __init__(self, lines):
+            self.lines = lines
+
+        def json(self):
+            return {"received": len(self.lines), "inserted": len(self.lines)}
+
+    class FakeSession:
+        def post(self, url, headers=None, data=None, json=None, timeout=None):
+            assert headers["Content-Type"] == "application/x-ndjson"
+            assert headers["Content-Encoding"] == "gzip"
+            lines = gzip.decompress(data).decode("utf-8").splitlines()
+            bodies.append(lines)
+            return FakeResponse(lines)
+
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: FakeSession())
+
+    assert sync.sync_stocks(dry_run=False, limit=None, chunk_size=4, wire="ndjson") == 0
+
+    assert [len(lines) for lines in bodies] == [4, 4, 1]
+    first = json.loads(bodies[0][0])
+    assert first["code"] == "0-0-0"
+    assert " " not in bodies[0][0]
+    assert '"received": 9' in capsys.readouterr().out
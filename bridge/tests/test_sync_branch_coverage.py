@@ -1,7 +1,9 @@
+import json
+
 import pytest
 import requests
 
-from bridge import sync
+from bridge import kiwoom, sync
 
 
 class FakeResponse:
@@ -10,6 +12,7 @@ class FakeResponse:
         self._json_data = {} if json_data is None else json_data
         self.text = text
         self.ok = 200 <= status_code < 300
+        self.headers = {}
         self._raise_on_json = raise_on_json
 
     def json(self):
@@ -17,6 +20,12 @@ class FakeResponse:
             raise ValueError("invalid json")
         return self._json_data
 
+    def iter_content(self, chunk_size=1):
+        yield json.dumps(self._json_data).encode("utf-8")
+
+    def close(self):
+        pass
+
 
 class FakeSession:
     def __init__(self, response):
@@ -24,7 +33,7 @@ class FakeSession:
         self.calls = []
         self.mounted = {}
 
-    def post(self, url, headers=None, json=None, timeout=None):
+    def post(self, url, headers=None, json=None, timeout=None, stream=False):
         self.calls.append(
             {
                 "url": url,
@@ -61,11 +70,30 @@ def test_load_dotenv_handles_missing_package(monkeypatch):
     sync._load_dotenv_if_available()
 
 
-def test_create_retry_session_mounts_http_and_https():
-    session = sync._create_retry_session()
+def test_create_session_mounts_pooled_adapters_for_http_and_https():
+    session = kiwoom.create_session(kiwoom.PoolSettings(hosts=2, per_host=6))
     assert isinstance(session, requests.Session)
-    assert "http://" in session.adapters
-    assert "https://" in session.adapters
+    adapter = session.adapters["https://"]
+    assert session.adapters["http://"] is adapter
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 6
+
+
+def test_resolve_pool_settings_reads_env_and_grows_for_concurrency():
+    env = {"BRIDGE_HTTP_POOL_HOSTS": "3", "BRIDGE_HTTP_POOL_PER_HOST": "4"}
+    pool = kiwoom.resolve_pool_settings(env)
+    assert pool == kiwoom.PoolSettings(hosts=3, per_host=4)
+    assert pool.at_least(6).per_host == 6
+    blocking = kiwoom.resolve_pool_settings({**env, "BRIDGE_HTTP_POOL_BLOCK": "1"})
+    assert blocking.at_least(6).per_host == 4
+    with pytest.raises(ValueError, match="BRIDGE_HTTP_POOL_PER_HOST"):
+        kiwoom.resolve_pool_settings({"BRIDGE_HTTP_POOL_PER_HOST": "0"})
+
+
+def _client(session):
+    client = kiwoom.KiwoomClient("https://k", "k", "s", session=session)
+    client.token = lambda: ("Bearer", "t")
+    return client
 
 
 def test_safe_response_snippet_handles_text_access_error():
@@ -97,18 +125,18 @@ def test_fetch_token_non_json_http_error_includes_snippet():
     session = FakeSession(response)
 
     with pytest.raises(RuntimeError, match="Kiwoom token HTTP error: status=401"):
-        sync._fetch_token(session, "https://kiwoom.example", "k", "s")
+        kiwoom.KiwoomClient("https://kiwoom.example", "k", "s", session=session).token()
 
 
-def test_fetch_market_list_prefers_explicit_fallback_keys(monkeypatch):
-    monkeypatch.setattr(sync, "_post_json", lambda *args, **kwargs: {"items": [{"code": "A"}]})
-    items = sync._fetch_market_list(FakeSession(FakeResponse()), "https://k", "Bearer", "t", "0")
+def test_fetch_market_list_prefers_explicit_fallback_keys():
+    session = FakeSession(FakeResponse(json_data={"items": [{"code": "A"}]}))
+    items = _client(session).fetch_stock_list("0")
     assert items == [{"code": "A"}]
 
 
-def test_fetch_market_list_returns_empty_when_no_list_found(monkeypatch):
-    monkeypatch.setattr(sync, "_post_json", lambda *args, **kwargs: {"meta": {"ok": True}})
-    items = sync._fetch_market_list(FakeSession(FakeResponse()), "https://k", "Bearer", "t", "0")
+def test_fetch_market_list_returns_empty_when_no_list_found():
+    session = FakeSession(FakeResponse(json_data={"meta": {"ok": True}}))
+    items = _client(session).fetch_stock_list("0")
     assert items == []
 
 
@@ -162,12 +190,12 @@ def test_sync_stocks_missing_base_url_returns_2(monkeypatch, capsys):
 
 def test_sync_stocks_token_failure_returns_1(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: FakeSession(FakeResponse()))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: FakeSession(FakeResponse()))
 
     def fail_token(*args, **kwargs):
         raise RuntimeError("bad")
 
-    monkeypatch.setattr(sync, "_fetch_token", fail_token)
+    monkeypatch.setattr(sync.KiwoomClient, "token", fail_token)
     code = sync.sync_stocks(dry_run=True, limit=None, verbose=False)
     assert code == 1
     assert "Failed to fetch Kiwoom token: bad" in capsys.readouterr().out
@@ -175,12 +203,12 @@ def test_sync_stocks_token_failure_returns_1(monkeypatch, capsys):
 
 def test_sync_stocks_non_dry_run_success_prints_result(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: FakeSession(FakeResponse()))
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: FakeSession(FakeResponse()))
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
     monkeypatch.setattr(
-        sync,
-        "_fetch_market_list",
-        lambda *args, **kwargs: [{"code": "005930", "name": "삼성전자"}],
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([[{"code": "005930", "name": "삼성전자"}]]),
     )
     monkeypatch.setattr(sync, "_check_backend_health", lambda *args, **kwargs: True)
     monkeypatch.setattr(sync, "_post_json", lambda *args, **kwargs: {"received": 1, "inserted": 1})
@@ -188,5 +216,5 @@ def test_sync_stocks_non_dry_run_success_prints_result(monkeypatch, capsys):
     code = sync.sync_stocks(dry_run=False, limit=1, verbose=False)
     assert code == 0
     out = capsys.readouterr().out
-    assert '{"received": 1, "inserted": 1}' in out
+    assert '{"received": 1, "inserted": 1, "updated": 0, "unchanged": 0, "chunks": 1' in out
     assert "summary fetched_markets=3" in out
@@ -53,16 +53,25 @@ def test_compute_change_summary_counts_are_deterministic():
 
 def test_sync_dry_run_skips_backend_write_paths(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: DummySession())
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
     monkeypatch.setattr(
-        sync,
-        "_fetch_market_list",
-        lambda *args, **kwargs: [
-            {"code": "005930", "name": "삼성전자", "regDay": "19750611", "upName": "전기전자"},
-            {"code": "005930", "name": "삼성전자"},  # duplicate
-            {"code": "000660", "name": "SK하이닉스"},
-        ],
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter(
+            [
+                [
+                    {
+                        "code": "005930",
+                        "name": "삼성전자",
+                        "regDay": "19750611",
+                        "upName": "전기전자",
+                    },
+                    {"code": "005930", "name": "삼성전자"},  # duplicate
+                    {"code": "000660", "name": "SK하이닉스"},
+                ]
+            ]
+        ),
     )
 
     def fail_health(*args, **kwargs):
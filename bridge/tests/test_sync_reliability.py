@@ -1,6 +1,8 @@
+import json
+
 import requests
 
-from bridge import sync
+from bridge import kiwoom, sync
 
 
 def _set_required_env(monkeypatch):
@@ -22,19 +24,26 @@ class FakeResponse:
         self._json_data = {} if json_data is None else json_data
         self.text = text
         self.ok = 200 <= status_code < 300
+        self.headers = {}
 
     def json(self):
         return self._json_data
 
+    def iter_content(self, chunk_size=1):
+        yield json.dumps(self._json_data).encode("utf-8")
+
+    def close(self):
+        pass
+
 
 def test_health_check_failure_returns_3(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: DummySession())
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
     monkeypatch.setattr(
-        sync,
-        "_fetch_market_list",
-        lambda *args, **kwargs: [{"code": "005930", "name": "삼성전자"}],
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([[{"code": "005930", "name": "삼성전자"}]]),
     )
     monkeypatch.setattr(sync, "_check_backend_health", lambda base: False)
 
@@ -48,12 +57,12 @@ def test_health_check_failure_returns_3(monkeypatch, capsys):
 
 def test_upsert_network_failure_returns_4(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: DummySession())
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
     monkeypatch.setattr(
-        sync,
-        "_fetch_market_list",
-        lambda *args, **kwargs: [{"code": "005930", "name": "삼성전자"}],
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([[{"code": "005930", "name": "삼성전자"}]]),
     )
     monkeypatch.setattr(sync, "_check_backend_health", lambda base: True)
 
@@ -72,14 +81,14 @@ def test_upsert_network_failure_returns_4(monkeypatch, capsys):
 
 def test_verbose_and_summary_output(monkeypatch, capsys):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: DummySession())
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
 
-    def fake_fetch_market_list(*args, **kwargs):
+    def fake_stock_list_pages(*args, **kwargs):
         mrkt_tp = args[-1]
-        return [{"code": f"C{mrkt_tp}", "name": f"Name{mrkt_tp}"}]
+        yield [{"code": f"C{mrkt_tp}", "name": f"Name{mrkt_tp}"}]
 
-    monkeypatch.setattr(sync, "_fetch_market_list", fake_fetch_market_list)
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", fake_stock_list_pages)
 
     code = sync.sync_stocks(dry_run=True, limit=2, verbose=True)
 
@@ -100,7 +109,8 @@ def test_token_parsing_accepts_access_token_variant():
                 json_data={"access_token": "abc123"},
             )
 
-    token_type, token = sync._fetch_token(Session(), "https://kiwoom.example", "k", "s")
+    client = kiwoom.KiwoomClient("https://kiwoom.example", "k", "s", session=Session())
+    token_type, token = client.token()
     assert token_type == "Bearer"
     assert token == "abc123"
 
@@ -117,7 +127,7 @@ def test_token_parsing_missing_token_raises_runtime_error():
     import pytest
 
     with pytest.raises(RuntimeError) as excinfo:
-        sync._fetch_token(Session(), "https://kiwoom.example", "k", "s")
+        kiwoom.KiwoomClient("https://kiwoom.example", "k", "s", session=Session()).token()
 
     message = str(excinfo.value)
     assert "missing token field" in message
@@ -130,31 +140,25 @@ def test_list_response_unexpected_keys_scans_first_list():
         "other": "value",
     }
 
-    monkeypatch_calls = {}
-
-    def fake_post_json(*args, **kwargs):
-        monkeypatch_calls["called"] = True
-        return payload
+    class StreamSession:
+        @staticmethod
+        def post(*args, **kwargs):
+            return FakeResponse(status_code=200, json_data=payload)
 
-    original = sync._post_json
-    sync._post_json = fake_post_json
-    try:
-        items = sync._fetch_market_list(
-            DummySession(), "https://kiwoom.example", "Bearer", "t", "0"
-        )
-        assert items == [{"code": "005930", "name": "삼성전자"}]
-    finally:
-        sync._post_json = original
+    client = kiwoom.KiwoomClient("https://kiwoom.example", "k", "s", session=StreamSession())
+    client.token = lambda: ("Bearer", "t")
+    items = client.fetch_stock_list("0")
+    assert items == [{"code": "005930", "name": "삼성전자"}]
 
 
 def test_dry_run_never_calls_backend(monkeypatch):
     _set_required_env(monkeypatch)
-    monkeypatch.setattr(sync, "_create_retry_session", lambda: DummySession())
-    monkeypatch.setattr(sync, "_fetch_token", lambda *args, **kwargs: ("Bearer", "token"))
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
     monkeypatch.setattr(
-        sync,
-        "_fetch_market_list",
-        lambda *args, **kwargs: [{"code": "005930", "name": "삼성전자"}],
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([[{"code": "005930", "name": "삼성전자"}]]),
     )
 
     def fail_health(*args, **kwargs):
@@ -168,3 +172,58 @@ def test_dry_run_never_calls_backend(monkeypatch):
 
     code = sync.sync_stocks(dry_run=True, limit=1, verbose=False)
     assert code == 0
+
+
+def test_concurrent_fetch_overlaps_markets_and_health_check(monkeypatch, capsys):
+    import threading
+
+    _set_required_env(monkeypatch)
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+
+    # Every market fetch and the health probe must be in flight at the same time.
+    barrier = threading.Barrier(len(sync.MARKET_TYPES) + 1, timeout=5)
+
+    def fake_stock_list_pages(*args, **kwargs):
+        mrkt_tp = args[-1]
+        barrier.wait()
+        yield [{"code": f"C{mrkt_tp}", "name": f"Name{mrkt_tp}"}]
+
+    def fake_health(base):
+        barrier.wait()
+        return True
+
+    posted = {}
+
+    def fake_post_json(session, url, headers, body, timeout):
+        posted["codes"] = [item["code"] for item in body["items"]]
+        return {"received": len(body["items"])}
+
+    monkeypatch.setattr(sync.KiwoomClient, "iter_stock_list_pages", fake_stock_list_pages)
+    monkeypatch.setattr(sync, "_check_backend_health", fake_health)
+    monkeypatch.setattr(sync, "_post_json", fake_post_json)
+
+    code = sync.sync_stocks(dry_run=False, limit=None, verbose=True, workers=8)
+
+    assert code == 0
+    assert posted["codes"] == ["C0", "C10", "C50"]
+    out = capsys.readouterr().out
+    assert "mrkt_tp=0 received=1 elapsed_ms=" in out
+    assert "fetch workers=3 elapsed_ms=" in out
+
+
+def test_concurrent_fetch_health_failure_returns_3(monkeypatch, capsys):
+    _set_required_env(monkeypatch)
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: DummySession())
+    monkeypatch.setattr(sync.KiwoomClient, "token", lambda self: ("Bearer", "token"))
+    monkeypatch.setattr(
+        sync.KiwoomClient,
+        "iter_stock_list_pages",
+        lambda *args, **kwargs: iter([[{"code": "005930", "name": "삼성전자"}]]),
+    )
+    monkeypatch.setattr(sync, "_check_backend_health", lambda base: False)
+
+    code = sync.sync_stocks(dry_run=False, limit=None, verbose=False, workers=2)
+
+    assert code == 3
+    assert "Backend not running at http://localhost:8000" in capsys.readouterr().out
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import json
+import stat
+from datetime import datetime, timedelta, timezone
+
+from bridge import kiwoom, sync
+from bridge.token_cache import TokenCache, parse_token_expiry, resolve_token_cache_dir
+
+NOW = datetime(2026, 3, 2, 0, 0, 0, tzinfo=timezone.utc)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, json_data=None, text=""):
+        self.status_code = status_code
+        self._json_data = {} if json_data is None else json_data
+        self.text = text
+        self.ok = 200 <= status_code < 300
+        self.headers = {}
+
+    def json(self):
+        return self._json_data
+
+    def iter_content(self, chunk_size=1):
+        yield json.dumps(self._json_data).encode("utf-8")
+
+    def close(self):
+        pass
+
+
+class TokenSession:
+    def __init__(self, json_data):
+        self.json_data = json_data
+        self.calls = 0
+
+    def post(self, *args, **kwargs):
+        self.calls += 1
+        return FakeResponse(status_code=200, json_data=self.json_data)
+
+
+def _cache(tmp_path, now=NOW):
+    return TokenCache("paper", "app-key", tmp_path / "cache", clock=lambda: now)
+
+
+def test_parse_token_expiry_reads_kst_expires_dt():
+    # 2026-03-02 18:00:00 KST == 09:00:00 UTC
+    expiry = parse_token_expiry({"expires_dt": "20260302180000"}, NOW)
+    assert expiry == datetime(2026, 3, 2, 9, 0, 0, tzinfo=timezone.utc)
+
+
+def test_parse_token_expiry_falls_back_to_expires_in_and_unknown():
+    assert parse_token_expiry({"expires_in": 60}, NOW) == NOW + timedelta(seconds=60)
+    assert parse_token_expiry({"expires_dt": "garbage"}, NOW) is None
+    assert parse_token_expiry({}, NOW) is None
+
+
+def test_resolve_token_cache_dir_env_overrides(tmp_path):
+    assert resolve_token_cache_dir({"KIWOOM_TOKEN_CACHE": "0"}) is None
+    assert resolve_token_cache_dir({"KIWOOM_TOKEN_CACHE_DIR": str(tmp_path)}) == tmp_path
+    assert resolve_token_cache_dir({"XDG_CACHE_HOME": str(tmp_path)}) == tmp_path / "myquant-bridge"
+
+
+def test_store_then_load_round_trip_with_restrictive_permissions(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store("Bearer", "tok", {"expires_dt": "20260303000000"})
+
+    loaded = cache.load()
+    assert loaded is not None
+    assert (loaded.token_type, loaded.token) == ("Bearer", "tok")
+    assert "app-key" not in cache.path.name
+    assert stat.S_IMODE(cache.path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(cache.path.parent.stat().st_mode) == 0o700
+
+
+def test_load_refreshes_proactively_inside_margin(tmp_path):
+    cache = _cache(tmp_path)
+    # Expires in 3 minutes, inside the 5 minute refresh margin.
+    cache.store("Bearer", "tok", {"expires_in": 180})
+    assert cache.load() is None
+
+
+def test_cache_is_keyed_by_mode_and_app_key(tmp_path):
+    paper = TokenCache("paper", "k1", tmp_path)
+    real = TokenCache("real", "k1", tmp_path)
+    other = TokenCache("paper", "k2", tmp_path)
+    assert len({paper.path, real.path, other.path}) == 3
+
+
+def test_store_without_expiry_is_not_cached(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.store("Bearer", "tok", {}) is None
+    assert cache.load() is None
+
+
+def test_client_token_uses_cache_and_skips_network(tmp_path):
+    cache = _cache(tmp_path)
+    session = TokenSession({"token_type": "Bearer", "token": "t1", "expires_in": 86400})
+
+    first = kiwoom.KiwoomClient(
+        "https://kiwoom.example", "k", "s", token_cache=cache, session=session
+    )
+    second = kiwoom.KiwoomClient(
+        "https://kiwoom.example", "k", "s", token_cache=cache, session=session
+    )
+
+    assert first.token() == first.token() == second.token() == ("Bearer", "t1")
+    assert session.calls == 1
+
+
+def test_sync_retries_once_with_fresh_token_on_401(monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("KIWOOM_BASE_URL", "https://kiwoom.example")
+    monkeypatch.setenv("KIWOOM_APP_KEY", "key")
+    monkeypatch.setenv("KIWOOM_APP_SECRET", "secret")
+    monkeypatch.setenv("KIWOOM_TOKEN_CACHE_DIR", str(tmp_path))
+    issued = iter(["stale", "fresh"])
+    invalidated = []
+    monkeypatch.setattr(sync.TokenCache, "invalidate", lambda self: invalidated.append(self))
+
+    class Session:
+        def post(self, url, headers=None, json=None, timeout=None, stream=False):
+            if url.endswith("/oauth2/token"):
+                return FakeResponse(json_data={"token_type": "Bearer", "token": next(issued)})
+            if headers["authorization"] == "Bearer stale":
+                return FakeResponse(status_code=401, text="expired")
+            mrkt_tp = json["mrkt_tp"]
+            return FakeResponse(json_data={"list": [{"code": f"C{mrkt_tp}", "name": "N"}]})
+
+    monkeypatch.setattr(sync, "create_session", lambda *args, **kwargs: Session())
+
+    code = sync.sync_stocks(dry_run=True, limit=None, verbose=False)
+
+    assert code == 0
+    assert len(invalidated) == 1
+    assert "total=3" in capsys.readouterr().out
+
+
+def test_kiwoom_client_shares_cache_and_reissues_on_401(tmp_path):
+    cache = _cache(tmp_path)
+    cache.store("Bearer", "cached", {"expires_in": 86400})
+    calls = []
+
+    class Session:
+        def post(self, url, json=None, headers=None, timeout=None, stream=False):
+            calls.append((url, headers.get("authorization")))
+            if url.endswith("/oauth2/token"):
+                return FakeResponse(
+                    json_data={"token_type": "Bearer", "token": "new", "expires_in": 86400}
+                )
+            if headers["authorization"] == "Bearer cached":
+                return FakeResponse(status_code=401, text="expired")
+            return FakeResponse(json_data={"list": [{"code": "005930"}]})
+
+    client = kiwoom.KiwoomClient(
+        "https://kiwoom.example", "k", "s", token_cache=cache, session=Session()
+    )
+
+    assert client.issue_token()["token"] == "cached"
+    items = client.fetch_stock_list("0")
+
+    assert items == [{"code": "005930"}]
+    assert [auth for _, auth in calls] == ["Bearer cached", None, "Bearer new"]
+    assert cache.load().token == "new"
+    assert client.token() == ("Bearer", "new")